@@ -0,0 +1,544 @@
+"""Long-lived local analysis service.
+
+Answers the analysis endpoints of server.js with the same request and
+response shapes:
+
+    POST /api/analysis/centrality   {mode?, pivots?, seed?}
+    POST /api/analysis/communities  {algorithm?, seed?}
+    POST /api/analysis/pathways     {sourceId, targetId, k?, maxDepth?}
+    GET  /api/search?q=&limit=      top node matches by id prefix or name, ranked by degree
+    GET  /api/lod/level?level=      one level of the level-of-detail hierarchy
+    GET  /api/lod/expand?level=&node=  children of a super-node
+    GET  /api/projection?id=&kind=&limit=  top co-investors / co-funded companies of a node
+    GET  /api/similar?id=&limit=&bands=&candidates=  investors with the most similar portfolios
+    GET  /api/node/<id>?hops=&fanout=&sample=&types=&from=&to=  sampled k-hop ego network of a node
+    GET  /api/health
+
+The analysis endpoints also take the /api/network filters fundingType,
+nodeType and timePeriod, in the body or the query string. The analysis then
+runs on the subgraph the filter index selects for them.
+
+The graph bundle is memory-mapped once per process instead of being parsed
+per request. Encoded responses are kept in an LRU bounded by total bytes and
+keyed by (bundle build_id, endpoint, filters, params), so repeated queries are served
+without recomputation. When the prepare scripts publish a new bundle its
+manifest changes, the service reloads and drops every cached result.
+Computations run in a process pool so the event loop keeps serving; identical
+requests arriving while one is computing share its result.
+
+Only the standard library is needed on top of the analysis modules.
+"""
+import argparse
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote
+
+from centrality import DEFAULT_PIVOTS, centrality_payload, compute_centrality
+from communities import ALGORITHMS, communities_payload, detect_communities
+from ego_network import DEFAULT_FANOUT, DEFAULT_HOPS, MAX_HOPS, SAMPLES, EgoIndex
+from filter_index import TIME_PERIODS, FilterIndex, period_start
+from graph_bundle import BUNDLE_DIR, load_bundle, subgraph
+from json_export import dumps
+from lod import LodIndex
+from pathways import DEFAULT_K, MAX_DEPTH, PathEngine, pathways_payload
+from projection import DEFAULT_TOP_K, KINDS, Projection
+from search_index import DEFAULT_LIMIT, SearchIndex
+from similarity import DEFAULT_CANDIDATES, SimilarityIndex
+
+HOST = '127.0.0.1'
+PORT = 5001
+CACHE_BYTES = 256 * 1024 * 1024
+MAX_BODY = 1024 * 1024
+MAX_SEARCH_LIMIT = 100
+MAX_CANDIDATES = 10000
+MAX_FANOUT = 200
+
+ENDPOINTS = ('centrality', 'communities', 'pathways')
+FILTERS = ('fundingType', 'nodeType', 'timePeriod')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _int_param(body, name, default, minimum=0):
+    value = body.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise BadRequest(f'{name} must be an integer >= {minimum}')
+    return value
+
+
+def _query_int(args, name, default, minimum=0):
+    # Query-string counterpart of _int_param; a default of None makes the parameter required
+    value = args.get(name)
+    if value is None and default is not None:
+        return default
+    if value is None or not value.isdigit() or int(value) < minimum:
+        raise BadRequest(f'{name} must be an integer >= {minimum}')
+    return int(value)
+
+
+def normalize_params(endpoint, body):
+    """Validated params as a sorted tuple, used both as cache key and job input."""
+    if endpoint == 'centrality':
+        mode = body.get('mode', 'exact')
+        if mode not in ('exact', 'sampled'):
+            raise BadRequest('mode must be exact or sampled')
+        params = {'mode': mode, 'seed': _int_param(body, 'seed', 42)}
+        if mode == 'sampled':
+            params['pivots'] = _int_param(body, 'pivots', DEFAULT_PIVOTS, minimum=1)
+    elif endpoint == 'communities':
+        algorithm = body.get('algorithm', 'louvain')
+        if algorithm not in ALGORITHMS:
+            raise BadRequest(f"algorithm must be one of {', '.join(ALGORITHMS)}")
+        params = {'algorithm': algorithm, 'seed': _int_param(body, 'seed', 42)}
+    else:
+        source, target = body.get('sourceId'), body.get('targetId')
+        if not source or not target:
+            raise BadRequest('sourceId and targetId required')
+        params = {
+            'sourceId': str(source),
+            'targetId': str(target),
+            'k': _int_param(body, 'k', DEFAULT_K, minimum=1),
+            'maxDepth': _int_param(body, 'maxDepth', MAX_DEPTH, minimum=1),
+        }
+    return tuple(sorted(params.items()))
+
+
+def normalize_filters(body):
+    """Validated /api/network filters as a sorted tuple; 'all' and empty values are no filter.
+
+    timePeriod becomes the first year it keeps, so the cache key follows the
+    calendar as server.js does.
+    """
+    filters = {}
+    for name in FILTERS:
+        value = body.get(name)
+        if value is None or value in ('', 'all'):
+            continue
+        if not isinstance(value, str):
+            raise BadRequest(f'{name} must be a string')
+        filters[name] = value
+    if 'timePeriod' in filters:
+        time_period = filters.pop('timePeriod')
+        if time_period not in TIME_PERIODS:
+            raise BadRequest(f"timePeriod must be one of all, {', '.join(TIME_PERIODS)}")
+        filters['yearFrom'] = period_start(time_period)
+    return tuple(sorted(filters.items()))
+
+
+# Per-worker-process state, reloaded when the job names a different dataset version
+_worker = {}
+
+
+def _worker_state(bundle_path, nodes_path, version):
+    if 'bundle' not in _worker or _worker['version'] != version:
+        _worker.clear()
+        bundle = load_bundle(bundle_path)
+        nodes = None
+        if nodes_path and os.path.exists(nodes_path):
+            with open(nodes_path) as f:
+                nodes = json.load(f)['nodes']
+        _worker.update(version=version, bundle=bundle, nodes=nodes)
+    return _worker
+
+
+def _filtered(state, filters):
+    # The latest filtered subgraph is kept: analyses of one filter tend to arrive together
+    if state.get('view_filters') != filters:
+        if 'filter_index' not in state:
+            state['filter_index'] = FilterIndex(state['bundle'])
+        chosen = dict(filters)
+        nodes, edges = state['filter_index'].query(chosen.get('nodeType'), chosen.get('fundingType'),
+                                                   chosen.get('yearFrom'))
+        state.update(view_filters=filters, view=subgraph(state['bundle'], nodes, edges), view_engine=None)
+    return state['view']
+
+
+def run_job(bundle_path, nodes_path, version, endpoint, params, filters=()):
+    """Compute one endpoint, on the subgraph selected by filters, and return the encoded body."""
+    state = _worker_state(bundle_path, nodes_path, version)
+    bundle, nodes = state['bundle'], state['nodes']
+    if filters:
+        bundle = _filtered(state, filters)
+    params = dict(params)
+
+    if endpoint == 'centrality':
+        # The service pool already provides the parallelism
+        degree, closeness, betweenness = compute_centrality(
+            bundle, params['mode'], params.get('pivots', DEFAULT_PIVOTS), workers=1, seed=params['seed'])
+        data = centrality_payload(bundle, degree, closeness, betweenness, nodes)
+    elif endpoint == 'communities':
+        membership = detect_communities(bundle, params['algorithm'], params['seed'])
+        data = communities_payload(bundle, membership, nodes)
+    else:
+        engine = 'view_engine' if filters else 'engine'
+        if state.get(engine) is None:
+            state[engine] = PathEngine.from_bundle(bundle)
+        data = pathways_payload(bundle, params['sourceId'], params['targetId'],
+                                params['k'], params['maxDepth'], engine=state[engine])
+
+    return dumps({'success': True, 'data': data}).encode('utf-8')
+
+
+class ResultCache:
+    """LRU of encoded responses, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.bytes -= len(self._entries.pop(key))
+        self._entries[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class AnalysisService:
+    def __init__(self, bundle_path=BUNDLE_DIR, nodes_path='network_data.json',
+                 workers=None, cache_bytes=CACHE_BYTES):
+        self.bundle_path = bundle_path
+        self.nodes_path = nodes_path
+        self.manifest_path = os.path.join(bundle_path, 'manifest.json')
+        self.cache = ResultCache(cache_bytes)
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.bundle = None
+        self.search_index = None
+        self.lod_index = None
+        self.projection_index = None
+        self.similarity_index = None
+        self.ego_index = None
+        self.filter_index = None
+        self._signature = None
+        self._pending = {}
+        self.refresh()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Reload the bundle if its manifest changed; returns True on reload."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        self.bundle = load_bundle(self.bundle_path) if signature else None
+        self.search_index = None
+        self.lod_index = None
+        self.projection_index = None
+        self.similarity_index = None
+        self.ego_index = None
+        self.filter_index = None
+        self.cache.clear()
+        self._pending.clear()
+        return True
+
+    @property
+    def version(self):
+        if self.bundle is None:
+            return None
+        # Bundles written before build_id existed fall back to the manifest stat
+        return self.bundle.build_id or f'{self._signature[0]}-{self._signature[1]}'
+
+    async def analyze(self, endpoint, body):
+        self.refresh()
+        if self.bundle is None:
+            raise BadRequest('Network data not loaded')
+        params = normalize_params(endpoint, body)
+        filters = normalize_filters(body)
+        if filters:
+            # Fail here with a 400 rather than in the worker
+            self._index('filter_index', FilterIndex, 'Filter index')
+        key = (self.version, endpoint, filters, params)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        if key in self._pending:
+            return await asyncio.shield(self._pending[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, run_job, self.bundle_path, self.nodes_path,
+                                      self.version, endpoint, params, filters)
+        self._pending[key] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        # A result computed against a bundle that was replaced meanwhile is not cached
+        if key[0] == self.version:
+            self.cache.put(key, result)
+        return result
+
+    def _index(self, attribute, index_class, description, script=None):
+        # Secondary indexes are opened on first use and dropped with the bundle.
+        # `script` builds an index the prepare scripts do not write by default
+        self.refresh()
+        if self.bundle is None:
+            raise BadRequest('Network data not loaded')
+        if getattr(self, attribute) is None:
+            try:
+                setattr(self, attribute, index_class(self.bundle))
+            except FileNotFoundError as exc:
+                if script:
+                    raise BadRequest(f'{description} not built for {self.bundle_path}; '
+                                     f'run python {script} --bundle {self.bundle_path}')
+                raise BadRequest(f'{description} not available: {exc}')
+            except ValueError as exc:
+                raise BadRequest(f'{description} not available: {exc}')
+        return getattr(self, attribute)
+
+    # Index lookups are answered inline: they are far cheaper than a trip through the pool
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        return self._index('search_index', SearchIndex, 'Search index').search(query, limit)
+
+    def lod_level(self, level):
+        try:
+            return self._index('lod_index', LodIndex, 'LOD hierarchy').level_graph(level)
+        except ValueError as exc:
+            raise BadRequest(str(exc))
+
+    def lod_expand(self, level, node):
+        try:
+            return self._index('lod_index', LodIndex, 'LOD hierarchy').expand(level, node)
+        except ValueError as exc:
+            raise BadRequest(str(exc))
+
+    def projection(self, node_id, kind=None, limit=None):
+        if kind is not None and kind not in KINDS:
+            raise BadRequest(f"kind must be one of {', '.join(KINDS)}")
+        try:
+            return self._index('projection_index', Projection, 'Projections', 'projection.py').neighbors(
+                node_id, kind, limit)
+        except ValueError as exc:
+            raise BadRequest(str(exc))
+
+    def similar(self, node_id, limit=DEFAULT_LIMIT, bands=None, candidates=DEFAULT_CANDIDATES):
+        try:
+            return self._index('similarity_index', SimilarityIndex, 'Similarity index', 'similarity.py').similar(
+                node_id, limit, bands, candidates)
+        except ValueError as exc:
+            raise BadRequest(str(exc))
+
+    def node(self, node_id, hops=DEFAULT_HOPS, fanout=DEFAULT_FANOUT, sample='degree',
+             funding_types=None, date_from=None, date_to=None):
+        """Encoded ego-network response; hot nodes are served from the result cache."""
+        if sample not in SAMPLES:
+            raise BadRequest(f"sample must be one of {', '.join(SAMPLES)}")
+        ego_index = self._index('ego_index', EgoIndex, 'Ego index')
+        funding_types = tuple(sorted(set(funding_types))) if funding_types else None
+        key = (self.version, 'node', (node_id, hops, fanout, sample, funding_types, date_from, date_to))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            data = ego_index.ego(node_id, hops, fanout, sample, funding_types, date_from, date_to)
+        except ValueError as exc:
+            raise BadRequest(str(exc))
+        result = dumps({'success': True, 'data': data}).encode('utf-8')
+        self.cache.put(key, result)
+        return result
+
+    def health(self):
+        return {
+            'success': True,
+            'message': 'Analysis service is running',
+            'dataset': self.version,
+            'nodes': self.bundle.node_count if self.bundle else 0,
+            'edges': self.bundle.edge_count if self.bundle else 0,
+            'cache': self.cache.stats(),
+        }
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def _response(status, body, keep_alive):
+    reason = HTTPStatus(status).phrase
+    head = [
+        f'HTTP/1.1 {status} {reason}',
+        'Content-Type: application/json',
+        f'Content-Length: {len(body)}',
+        'Access-Control-Allow-Origin: *',
+        'Access-Control-Allow-Headers: Content-Type',
+        'Access-Control-Allow-Methods: GET, POST, OPTIONS',
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+def _error(message):
+    return dumps({'success': False, 'error': message}).encode('utf-8')
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise BadRequest('Malformed request line')
+    method, target, version = parts
+    headers = {}
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = header.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY:
+        raise BadRequest('Request body too large')
+    body = await reader.readexactly(length) if length else b''
+    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+    return method, target, body, keep_alive
+
+
+async def _dispatch(service, method, target, body):
+    path, _, query = target.partition('?')
+    if method == 'OPTIONS':
+        return 204, b''
+    if path == '/api/health' and method == 'GET':
+        service.refresh()
+        return 200, dumps(service.health()).encode('utf-8')
+    if method == 'GET' and path in ('/api/search', '/api/lod/level', '/api/lod/expand', '/api/projection',
+                                       '/api/similar'):
+        args = {name: values[-1] for name, values in parse_qs(query).items()}
+        if path == '/api/search':
+            limit = _query_int(args, 'limit', DEFAULT_LIMIT, minimum=1)
+            data = service.search(args.get('q', ''), min(limit, MAX_SEARCH_LIMIT))
+        elif path == '/api/lod/level':
+            data = service.lod_level(_query_int(args, 'level', 1, minimum=1))
+        elif path == '/api/projection':
+            limit = _query_int(args, 'limit', DEFAULT_TOP_K, minimum=1)
+            data = service.projection(args.get('id', ''), args.get('kind'), limit)
+        elif path == '/api/similar':
+            limit = _query_int(args, 'limit', DEFAULT_LIMIT, minimum=1)
+            data = service.similar(args.get('id', ''), min(limit, MAX_SEARCH_LIMIT), _query_int(args, 'bands', 0),
+                                   min(_query_int(args, 'candidates', DEFAULT_CANDIDATES, minimum=1), MAX_CANDIDATES))
+        else:
+            data = service.lod_expand(_query_int(args, 'level', None, minimum=1), _query_int(args, 'node', None))
+        return 200, dumps({'success': True, 'data': data}).encode('utf-8')
+    if method == 'GET' and path.startswith('/api/node/') and len(path) > len('/api/node/'):
+        args = {name: values[-1] for name, values in parse_qs(query).items()}
+        hops = _query_int(args, 'hops', DEFAULT_HOPS, minimum=1)
+        if hops > MAX_HOPS:
+            raise BadRequest(f'hops must be at most {MAX_HOPS}')
+        fanout = min(_query_int(args, 'fanout', DEFAULT_FANOUT, minimum=1), MAX_FANOUT)
+        types = [t for t in args.get('types', '').split(',') if t]
+        return 200, service.node(unquote(path[len('/api/node/'):]), hops, fanout, args.get('sample', 'degree'),
+                                 types, args.get('from'), args.get('to'))
+    prefix = '/api/analysis/'
+    if path.startswith(prefix) and path[len(prefix):] in ENDPOINTS:
+        if method != 'POST':
+            return 405, _error('Use POST')
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise BadRequest('Body must be JSON')
+        if not isinstance(payload, dict):
+            raise BadRequest('Body must be a JSON object')
+        # Filters may come as in /api/network; the body wins
+        for name, values in parse_qs(query).items():
+            if name in FILTERS:
+                payload.setdefault(name, values[-1])
+        return 200, await service.analyze(path[len(prefix):], payload)
+    return 404, _error('Not found')
+
+
+def make_handler(service):
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (BadRequest, ValueError) as exc:
+                    writer.write(_response(400, _error(str(exc)), False))
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                try:
+                    status, payload = await _dispatch(service, method, target, body)
+                except BadRequest as exc:
+                    status, payload = 400, _error(str(exc))
+                except Exception as exc:
+                    status, payload = 500, _error(str(exc))
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(service, host=HOST, port=PORT):
+    server = await asyncio.start_server(make_handler(service), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the analysis endpoints from the graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--nodes', default='network_data.json', help='node attributes for responses')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-mb', type=int, default=CACHE_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+
+    service = AnalysisService(args.bundle, args.nodes, args.workers, args.cache_mb * 1024 * 1024)
+    print(f"[OK] Analysis service on http://{args.host}:{args.port}")
+    print(f"  - Dataset: {service.version}")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
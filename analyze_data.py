@@ -1,36 +1,67 @@
-import pandas as pd
-import json
+import argparse
 import os
 
-os.chdir(r'c:\PROJECT SNA')
-
-# Load datasets
-investments = pd.read_csv('A kaggle dataset/investments.csv')
-people = pd.read_csv('A kaggle dataset/people.csv')
-funding_rounds = pd.read_csv('A kaggle dataset/funding_rounds.csv')
-
-print("Investments shape:", investments.shape)
-print("Investments columns:", investments.columns.tolist())
-print("\nPeople shape:", people.shape)
-print("People columns:", people.columns.tolist())
-print("\nFunding Rounds columns:", funding_rounds.columns.tolist())
-print("\nFunding Rounds sample:")
-print(funding_rounds.head(3))
-
-# Sample 400 investments
-sample_400 = investments.sample(n=400, random_state=42)
-print("\n400 Sample investments:")
-print(sample_400.head())
-
-# Get unique company and investor IDs
-companies = sample_400['funded_object_id'].unique()
-investors = sample_400['investor_object_id'].unique()
-
-print(f"\nTotal companies: {len(companies)}")
-print(f"Total investors: {len(investors)}")
-
-# Get funding round details
-fr_merged = funding_rounds[funding_rounds['id'].isin(sample_400['funding_round_id'].unique())]
-print(f"\nFunding rounds in sample: {len(fr_merged)}")
-print("\nFunding round types:")
-print(fr_merged['funding_round_type'].value_counts())
+from ingest import read_table
+from instrumentation import add_arguments, configure_from_args, finish, stage
+
+BASE_PATH = r'c:\PROJECT SNA'
+
+
+def main(base_path=BASE_PATH):
+    os.chdir(base_path)
+
+    # Load datasets
+    with stage('load_investments') as s:
+        investments = read_table('A kaggle dataset/investments.csv')
+        s.rows = len(investments)
+    with stage('load_people') as s:
+        people = read_table('A kaggle dataset/people.csv')
+        s.rows = len(people)
+    with stage('load_funding_rounds') as s:
+        funding_rounds = read_table('A kaggle dataset/funding_rounds.csv')
+        s.rows = len(funding_rounds)
+
+    print("Investments shape:", investments.shape)
+    print("Investments columns:", investments.columns.tolist())
+    print("\nPeople shape:", people.shape)
+    print("People columns:", people.columns.tolist())
+    print("\nFunding Rounds columns:", funding_rounds.columns.tolist())
+    print("\nFunding Rounds sample:")
+    print(funding_rounds.head(3))
+
+    # Sample 400 investments
+    with stage('sample') as s:
+        sample_400 = investments.sample(n=400, random_state=42)
+        s.rows = len(sample_400)
+    print("\n400 Sample investments:")
+    print(sample_400.head())
+
+    # Get unique company and investor IDs
+    companies = sample_400['funded_object_id'].unique()
+    investors = sample_400['investor_object_id'].unique()
+
+    print(f"\nTotal companies: {len(companies)}")
+    print(f"Total investors: {len(investors)}")
+
+    # Get funding round details
+    with stage('match_funding_rounds') as s:
+        fr_merged = funding_rounds[funding_rounds['id'].isin(sample_400['funding_round_id'].unique())]
+        s.rows = len(fr_merged)
+    print(f"\nFunding rounds in sample: {len(fr_merged)}")
+    print("\nFunding round types:")
+    print(fr_merged['funding_round_type'].value_counts())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect the Kaggle Crunchbase tables')
+    parser.add_argument('--base-path', default=BASE_PATH)
+    add_arguments(parser)
+    args = parser.parse_args()
+    # main() changes directory, so pin output paths first
+    if args.metrics:
+        args.metrics = os.path.abspath(args.metrics)
+    if args.profile_dir:
+        args.profile_dir = os.path.abspath(args.profile_dir)
+    configure_from_args(args)
+    main(args.base_path)
+    finish(args)
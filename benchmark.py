@@ -0,0 +1,286 @@
+"""Benchmark the prepare pipeline on synthetic Crunchbase-shaped data.
+
+Generates investments.csv, funding_rounds.csv and objects.csv with
+power-law (Zipf) company, investor and round popularity, then times every
+stage of prepare_backend_data.py and prepare_network_data.py. Each
+(size, script) pair runs in its own subprocess so peak RSS is measured in
+isolation. Results can be saved as a baseline and later runs compared
+against it; a stage slower than the baseline by more than the threshold is a
+regression and makes the run exit non-zero.
+
+Runs offline and never touches the real Kaggle files. Generated datasets are
+kept under .benchmark_data/ and reused by later runs.
+
+Timings only compare on the same machine, so no baseline is committed:
+benchmark_baseline.json is local (and gitignored, like the results file).
+Record one on a clean checkout before changing anything, then compare later
+runs at the same sizes. After an intended speed-up or slow-down, save again
+so the new timings become the reference.
+
+    python benchmark.py --sizes 10k 100k --save-baseline   # once per machine
+    python benchmark.py --sizes 10k 100k --threshold 0.25  # after a change
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingest import read_table
+from instrumentation import configure, peak_rss_mb, records, stage
+
+DATA_DIR = '.benchmark_data'
+BASELINE_PATH = 'benchmark_baseline.json'
+RESULTS_PATH = 'benchmark_results.json'
+SCRIPTS = ('backend', 'network')
+DEFAULT_SIZES = ('10k', '100k')
+THRESHOLD = 0.25
+MIN_DELTA = 0.05
+CHUNK_ROWS = 1_000_000
+
+FUNDING_TYPES = ['angel', 'series-a', 'series-b', 'series-c+', 'venture', 'private-equity',
+                 'crowdfunding', 'post-ipo', 'other']
+FUNDING_WEIGHTS = [0.22, 0.2, 0.12, 0.08, 0.2, 0.06, 0.03, 0.02, 0.07]
+CATEGORIES = ['web', 'software', 'mobile', 'enterprise', 'biotech', 'ecommerce', 'advertising', 'games_video']
+
+
+def parse_size(text):
+    text = text.lower().replace('_', '')
+    for suffix, factor in (('k', 1_000), ('m', 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def zipf_choice(rng, n, size, alpha=1.0):
+    """Draw `size` values in 0..n-1 where rank r has weight 1 / (r + 1) ** alpha."""
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** alpha)
+    return np.searchsorted(cdf, rng.random(size) * cdf[-1])
+
+
+def _write_chunks(path, total, make_chunk):
+    # Chunked so the 10M-row tables never sit in memory as one frame
+    for start in range(0, total, CHUNK_ROWS):
+        frame = make_chunk(start, min(total, start + CHUNK_ROWS))
+        frame.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+
+def generate_dataset(base_path, rows, seed=42):
+    """Write a synthetic 'A kaggle dataset' directory with `rows` investments."""
+    data_dir = os.path.join(base_path, 'A kaggle dataset')
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    n_companies = max(100, rows // 4)
+    n_investors = max(50, rows // 10)
+    n_rounds = max(50, rows // 3)
+
+    # Investors are mostly financial orgs, then companies and people, as in Crunchbase
+    kinds = rng.choice(['f', 'c', 'p'], size=n_investors, p=[0.6, 0.25, 0.15])
+    investor_ids = np.array([f'{k}:{n_companies + i + 1}' if k == 'c' else f'{k}:{i + 1}'
+                             for i, k in enumerate(kinds)], dtype=object)
+    company_ids = np.array([f'c:{i + 1}' for i in range(n_companies)], dtype=object)
+    # Popularity rank -> id, so the hubs are not simply the lowest ids
+    company_rank = rng.permutation(n_companies)
+    investor_rank = rng.permutation(n_investors)
+
+    round_company = company_ids[company_rank[zipf_choice(rng, n_companies, n_rounds, alpha=0.9)]]
+    round_ids = np.arange(1, n_rounds + 1)
+    day = rng.integers(0, 20 * 365, size=n_rounds)
+    funded_at = (np.datetime64('1995-01-01') + day.astype('timedelta64[D]')).astype(str)
+    raised = np.round(rng.lognormal(15, 1.5, size=n_rounds), -3)
+    rounds = pd.DataFrame({
+        'id': round_ids,
+        'funding_round_id': round_ids,
+        'object_id': round_company,
+        'funded_at': funded_at,
+        'funding_round_type': rng.choice(FUNDING_TYPES, size=n_rounds, p=FUNDING_WEIGHTS),
+        'funding_round_code': 'a',
+        'raised_amount_usd': raised,
+        'raised_amount': raised,
+        'pre_money_valuation_usd': raised * 4,
+        'post_money_valuation_usd': raised * 5,
+        'created_at': '2010-01-01 00:00:00',
+        'updated_at': '2012-01-01 00:00:00',
+    })
+    # A few rounds referenced by investments are missing, like in the real export
+    rounds = rounds[rng.random(n_rounds) > 0.03]
+    rounds.to_csv(os.path.join(data_dir, 'funding_rounds.csv'), index=False)
+
+    def investments(start, end):
+        size = end - start
+        round_index = zipf_choice(rng, n_rounds, size, alpha=0.6)
+        return pd.DataFrame({
+            'id': np.arange(start + 1, end + 1),
+            'funding_round_id': round_ids[round_index],
+            'funded_object_id': round_company[round_index],
+            'investor_object_id': investor_ids[investor_rank[zipf_choice(rng, n_investors, size, alpha=1.1)]],
+            'created_at': '2011-05-05 01:42:41',
+            'updated_at': '2011-05-05 01:42:41',
+        })
+    _write_chunks(os.path.join(data_dir, 'investments.csv'), rows, investments)
+
+    object_ids = np.concatenate([company_ids, investor_ids])
+    entity_types = {'c': 'Company', 'f': 'FinancialOrg', 'p': 'Person'}
+
+    def objects(start, end):
+        ids = object_ids[start:end]
+        names = pd.Series([f'Name {i}' for i in ids], dtype=object)
+        names[rng.random(len(ids)) < 0.05] = None
+        return pd.DataFrame({
+            'id': ids,
+            'entity_type': [entity_types[i[0]] for i in ids],
+            'entity_id': np.arange(start, end),
+            'parent_id': None,
+            'name': names,
+            'normalized_name': names.str.lower(),
+            'category_code': rng.choice(CATEGORIES, size=len(ids)),
+            'status': 'operating',
+            'country_code': 'USA',
+            'created_at': '2010-01-01',
+            'updated_at': '2011-01-01',
+        })
+    _write_chunks(os.path.join(data_dir, 'objects.csv'), len(object_ids), objects)
+    return data_dir
+
+
+def dataset_path(size_label, seed=42, root=DATA_DIR):
+    base_path = os.path.join(root, f'{size_label}-{seed}')
+    if not os.path.exists(os.path.join(base_path, 'A kaggle dataset', 'objects.csv')):
+        print(f'Generating {size_label} synthetic rows in {base_path}...')
+        generate_dataset(base_path, parse_size(size_label), seed)
+    return base_path
+
+
+def run_backend(base_path):
+    import prepare_backend_data as backend
+
+    investments, funding_rounds = backend.load_tables(base_path)
+    ids, edge_table = backend.build_edge_table(investments, funding_rounds)
+    graph = backend.build_graph(ids, backend.sample_edges(edge_table))
+    backend.write_outputs(graph, base_path)
+
+
+def run_network(base_path):
+    import prepare_network_data as network
+
+    data_dir = os.path.join(base_path, 'A kaggle dataset')
+    with stage('load_investments') as s:
+        investments = read_table(os.path.join(data_dir, 'investments.csv'))
+        s.rows = len(investments)
+    sample = network.sample_investments(investments)
+    wanted = set(sample['funded_object_id'].astype(str)) | set(sample['investor_object_id'].astype(str))
+    names = network.load_names(os.path.join(data_dir, 'objects.csv'), wanted)
+    ids, nodes, edges = network.build_network(sample, names)
+    nodes, edges = network.limit_nodes(nodes, edges)
+    network.write_outputs({'sample': sample, 'ids': ids, 'nodes': nodes, 'edges': edges}, base_path)
+
+
+_RUNNERS = {'backend': run_backend, 'network': run_network}
+
+
+def worker(script, base_path):
+    """Run one script's stages in this process and print the result as JSON."""
+    configure(True)
+    start = time.perf_counter()
+    _RUNNERS[script](base_path)
+    print(json.dumps({
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_mb(),
+        # Stages of the scripts themselves; nested helpers are left out of the comparison
+        'stages': [r for r in records() if r['depth'] == 0],
+    }))
+
+
+def run_suite(sizes, scripts=SCRIPTS, seed=42, root=DATA_DIR):
+    results = {}
+    for size_label in sizes:
+        base_path = dataset_path(size_label, seed, root)
+        for script in scripts:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', script, '--base-path', base_path],
+                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if completed.returncode != 0:
+                raise RuntimeError(f'{script} benchmark failed at {size_label}:\n{completed.stderr}')
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results[f'{size_label}/{script}'] = result
+            print(f"  {size_label:>6} {script:<8} {result['seconds']:8.2f}s  peak {result['peak_rss_mb'] or 0:8.1f} MB")
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """Regressions of `results` against `baseline`, as a list of messages."""
+    regressions = []
+
+    def check(label, current, previous, unit, floor):
+        if current is None or previous is None:
+            return
+        if current > previous * (1 + threshold) and current - previous > floor:
+            regressions.append(f'{label}: {previous:.2f}{unit} -> {current:.2f}{unit} (+{(current / previous - 1) * 100:.0f}%)')
+
+    for run, result in results.items():
+        previous = baseline.get(run)
+        if previous is None:
+            continue
+        check(f'{run} total', result['seconds'], previous['seconds'], 's', min_delta)
+        check(f'{run} peak RSS', result['peak_rss_mb'], previous['peak_rss_mb'], ' MB', 1.0)
+        previous_stages = {s['name']: s for s in previous['stages']}
+        for stage in result['stages']:
+            if stage['name'] in previous_stages:
+                check(f"{run} {stage['name']}", stage['seconds'], previous_stages[stage['name']]['seconds'], 's', min_delta)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prepare scripts on synthetic data')
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help='investment rows, e.g. 10k 100k 1m 10m')
+    parser.add_argument('--scripts', nargs='+', choices=SCRIPTS, default=list(SCRIPTS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='allowed slowdown ratio, 0.25 = 25%%')
+    parser.add_argument('--out', default=RESULTS_PATH)
+    parser.add_argument('--worker', choices=SCRIPTS, help=argparse.SUPPRESS)
+    parser.add_argument('--base-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.base_path)
+        return
+
+    results = run_suite(args.sizes, args.scripts, args.seed, args.data_dir)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'[OK] Results written to {args.out}')
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'[OK] Baseline updated in {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; run with --save-baseline on this machine to create one')
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f'[FAIL] {len(regressions)} regression(s) over {args.threshold:.0%}:')
+        for message in regressions:
+            print(f'  - {message}')
+        sys.exit(1)
+    print(f'[OK] No regressions over {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
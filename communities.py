@@ -0,0 +1,322 @@
+"""Community detection (Louvain, label propagation) over the CSR graph bundle.
+
+Replaces the type-based grouping of /api/analysis/communities. Membership is
+kept as one int array indexed by bundle node, so internal-edge counts and
+modularity are a couple of bincounts instead of per-edge membership scans.
+
+    python communities.py --algorithm louvain --out communities.json
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from graph_bundle import BUNDLE_DIR, load_bundle
+
+ALGORITHMS = ('louvain', 'label_propagation')
+MAX_PASSES = 50
+COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E2']
+
+
+def weighted_csr(src, dst, node_count, weights=None):
+    """Undirected weighted CSR with parallel edges merged (self-loops kept once per end)."""
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weights = np.ones(len(src)) if weights is None else np.asarray(weights, dtype=np.float64)
+    rows = np.concatenate([src, dst])
+    cols = np.concatenate([dst, src])
+    keys, inverse = np.unique(rows * node_count + cols, return_inverse=True)
+    merged = np.bincount(inverse, weights=np.concatenate([weights, weights]))
+    rows, cols = keys // node_count, keys % node_count
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=node_count), out=indptr[1:])
+    return indptr, cols, merged
+
+
+def modularity(src, dst, membership, weights=None):
+    """Newman modularity of `membership` on the (multi)graph given by src/dst."""
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weights = np.ones(len(src)) if weights is None else np.asarray(weights, dtype=np.float64)
+    m = weights.sum()
+    if m == 0:
+        return 0.0
+    count = int(membership.max()) + 1 if len(membership) else 0
+    same = membership[src] == membership[dst]
+    internal = np.bincount(membership[src][same], weights=weights[same], minlength=count)
+    degree = np.bincount(src, weights=weights, minlength=len(membership)) + \
+        np.bincount(dst, weights=weights, minlength=len(membership))
+    totals = np.bincount(membership, weights=degree, minlength=count)
+    return float((internal / m - (totals / (2 * m)) ** 2).sum())
+
+
+def _renumber(labels):
+    # Dense 0..k-1 ids ordered by first appearance
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    return order[inverse].astype(np.int64)
+
+
+def _node_slots(indptr, nodes):
+    # CSR slots of `nodes`, concatenated in order, without a per-node loop
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+def _local_moving(indptr, indices, weights, rng, tolerance, max_passes=MAX_PASSES, update_fraction=0.5):
+    """Louvain phase one, batched: every pass scores the moves of all active nodes at once.
+
+    A node's links to its neighbouring communities are one grouped bincount
+    over (node, community) keys. The modularity gain of joining c is
+    links[c] - tot[c] * k_i / 2m, with tot excluding the node itself. A node
+    that gains more elsewhere than by staying wants to move, and a random
+    `update_fraction` of those move together. A singleton only joins another
+    singleton with a lower id, so two nodes never swap places. A pass that
+    does not raise modularity is undone and retried with half the fraction.
+
+    As in Leiden's fast local moving, only moved nodes, their neighbours and
+    the nodes still waiting to move are scored in the next pass. So a pass
+    costs whole-array operations over the slots of that active set, and
+    there are at most max_passes of them.
+    """
+    node_count = len(indptr) - 1
+    rows = np.repeat(np.arange(node_count), np.diff(indptr))
+    # Self-loop slots already carry twice the internal weight, as k_i requires
+    k = np.bincount(rows, weights=weights, minlength=node_count)
+    m2 = k.sum()
+    membership = np.arange(node_count)
+    if m2 == 0:
+        return membership, False
+
+    def quality(labels):
+        totals = np.bincount(labels, weights=k, minlength=node_count)
+        return weights[labels[rows] == labels[indices]].sum() / m2 - ((totals / m2) ** 2).sum()
+
+    current = quality(membership)
+    improved = False
+    active = np.arange(node_count)
+    for _ in range(max_passes):
+        slots = _node_slots(indptr, active)
+        slots = slots[rows[slots] != indices[slots]]
+        if not len(slots):
+            break
+        totals = np.bincount(membership, weights=k, minlength=node_count)
+        sizes = np.bincount(membership, minlength=node_count)
+        # Keys sort by node, then community, so each node's candidates form one segment
+        keys, inverse = np.unique(rows[slots] * node_count + membership[indices[slots]], return_inverse=True)
+        links = np.bincount(inverse, weights=weights[slots])
+        node, community = keys // node_count, keys % node_count
+        own = membership[node] == community
+        gain = links - (totals[community] - np.where(own, k[node], 0)) * k[node] / m2
+        stay = -(totals[membership] - k) * k / m2
+        stay[node[own]] += links[own]
+
+        # Best community per node: highest gain, ties to the lowest id
+        starts = np.flatnonzero(np.concatenate([[True], node[1:] != node[:-1]]))
+        segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(node))))
+        best = np.flatnonzero(gain == np.maximum.reduceat(gain, starts)[segment])
+        best = best[np.concatenate([[True], segment[best][1:] != segment[best][:-1]])]
+        node, community, gain = node[best], community[best], gain[best]
+        want = (gain > stay[node] + tolerance) & (community != membership[node])
+        want &= ~((sizes[membership[node]] == 1) & (sizes[community] == 1) & (community > membership[node]))
+        node, community = node[want], community[want]
+        if not len(node):
+            break
+
+        fraction = update_fraction
+        while fraction * len(node) >= 1:
+            move = rng.random(len(node)) < fraction
+            candidate = membership.copy()
+            candidate[node[move]] = community[move]
+            score = quality(candidate)
+            if score > current + tolerance:
+                membership, current, improved = candidate, score, True
+                break
+            fraction /= 2
+        else:
+            break
+        moved = node[move]
+        # A mask rather than np.unique: the active set is rebuilt every pass
+        mask = np.zeros(node_count, dtype=bool)
+        mask[node[~move]] = True
+        mask[moved] = True
+        mask[indices[_node_slots(indptr, moved)]] = True
+        active = np.flatnonzero(mask)
+
+    return membership, improved
+
+
+def louvain_levels(src, dst, node_count, weights=None, seed=42, tolerance=1e-10, max_levels=10):
+    """Louvain as a hierarchy: one membership array per level.
+
+    Level i maps the nodes of level i - 1 (the original nodes for i = 0) to
+    dense community ids; the last level is the final partition of the
+    super-nodes before it.
+    """
+    rng = np.random.default_rng(seed)
+    level_src = np.asarray(src, dtype=np.int64)
+    level_dst = np.asarray(dst, dtype=np.int64)
+    level_weights = np.ones(len(level_src)) if weights is None else np.asarray(weights, dtype=np.float64)
+    level_count = node_count
+    levels = []
+
+    for _ in range(max_levels):
+        indptr, indices, merged = weighted_csr(level_src, level_dst, level_count, level_weights)
+        level_membership, improved = _local_moving(indptr, indices, merged, rng, tolerance)
+        if not improved:
+            break
+        level_membership = _renumber(level_membership)
+        levels.append(level_membership)
+
+        # Phase two: collapse communities into super-nodes with summed edge weights
+        level_count = int(level_membership.max()) + 1
+        pair_src = level_membership[level_src]
+        pair_dst = level_membership[level_dst]
+        low, high = np.minimum(pair_src, pair_dst), np.maximum(pair_src, pair_dst)
+        keys, inverse = np.unique(low * level_count + high, return_inverse=True)
+        level_weights = np.bincount(inverse, weights=level_weights)
+        level_src, level_dst = keys // level_count, keys % level_count
+
+    return levels
+
+
+def louvain(src, dst, node_count, weights=None, seed=42, tolerance=1e-10, max_levels=10):
+    """Multi-level Louvain; returns a membership int array over the original nodes."""
+    membership = np.arange(node_count, dtype=np.int64)
+    for level_membership in louvain_levels(src, dst, node_count, weights, seed, tolerance, max_levels):
+        membership = level_membership[membership]
+    return _renumber(membership)
+
+
+def label_propagation(src, dst, node_count, seed=42, max_iter=50, update_fraction=0.5):
+    """Vectorized semi-synchronous label propagation.
+
+    Each round computes every node's heaviest neighbor label in bulk, then
+    moves only a random fraction of the nodes that want to change; this damps
+    the oscillation synchronous updates show on bipartite graphs.
+    """
+    rng = np.random.default_rng(seed)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    rows = np.concatenate([src, dst, np.arange(node_count)])
+    cols = np.concatenate([dst, src, np.arange(node_count)])
+    labels = np.arange(node_count, dtype=np.int64)
+
+    for _ in range(max_iter):
+        keys, inverse = np.unique(rows * node_count + labels[cols], return_inverse=True)
+        score = np.bincount(inverse) + rng.random(len(keys)) * 1e-3
+        owner, candidate = keys // node_count, keys % node_count
+        score[candidate == labels[owner]] += 0.5e-3  # prefer keeping the current label on ties
+        order = np.lexsort((-score, owner))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = owner[order][1:] != owner[order][:-1]
+        best = np.empty(node_count, dtype=np.int64)
+        best[owner[order][first]] = candidate[order][first]
+
+        changing = np.flatnonzero(best != labels)
+        if not len(changing):
+            break
+        move = changing[rng.random(len(changing)) < update_fraction]
+        if not len(move):
+            move = changing
+        labels[move] = best[move]
+
+    return _renumber(labels)
+
+
+def detect_communities(bundle, algorithm='louvain', seed=42):
+    src = np.asarray(bundle.edge_src, dtype=np.int64)
+    dst = np.asarray(bundle.edge_dst, dtype=np.int64)
+    if algorithm == 'louvain':
+        return louvain(src, dst, bundle.node_count, seed=seed)
+    if algorithm == 'label_propagation':
+        return label_propagation(src, dst, bundle.node_count, seed=seed)
+    raise ValueError(f"Unknown community algorithm: {algorithm}")
+
+
+def generate_color(key):
+    # Same palette and string hash as generateColor in server.js
+    hash_value = 0
+    for ch in key:
+        hash_value = ((hash_value << 5) - hash_value + ord(ch)) & 0xFFFFFFFF
+    if hash_value >= 2 ** 31:
+        hash_value -= 2 ** 32
+    return COLORS[abs(hash_value) % len(COLORS)]
+
+
+def communities_payload(bundle, membership, nodes=None):
+    """Shape results like /api/analysis/communities: communities, communityCount, stats."""
+    src = np.asarray(bundle.edge_src, dtype=np.int64)
+    dst = np.asarray(bundle.edge_dst, dtype=np.int64)
+    count = int(membership.max()) + 1 if len(membership) else 0
+
+    sizes = np.bincount(membership, minlength=count)
+    same = membership[src] == membership[dst]
+    internal = np.bincount(membership[src][same], minlength=count)
+    degree = np.diff(np.asarray(bundle.indptr))
+
+    # Hub of each community: its highest-degree member
+    order = np.lexsort((-degree, membership))
+    starts = np.searchsorted(membership[order], np.arange(count))
+    hubs = order[starts] if count else np.array([], dtype=np.int64)
+
+    node_types = bundle.manifest['node_types']
+    attributes = {n['id']: n for n in nodes} if nodes else {}
+
+    def describe(i):
+        node_id = bundle.node_id(i)
+        return attributes.get(node_id, {'id': node_id, 'type': node_types[bundle.node_type[i]]})
+
+    members = np.split(order, starts[1:]) if count else []
+    communities = []
+    for c in np.argsort(-sizes, kind='stable'):
+        hub = describe(hubs[c])
+        name = f"{hub.get('name', hub['id'])} community"
+        communities.append({
+            'name': name,
+            'nodes': [describe(i) for i in members[c]],
+            'nodeCount': int(sizes[c]),
+            'internalEdges': int(internal[c]),
+            'color': generate_color(name),
+        })
+
+    return {
+        'communities': communities,
+        'communityCount': count,
+        'stats': {
+            'largestCommunity': int(sizes.max()) if count else 0,
+            'avgCommunitySize': bundle.node_count / count if count else 0,
+            'modularity': modularity(src, dst, membership),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect communities in the graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--nodes', default='network_data.json', help='node attributes for members')
+    parser.add_argument('--algorithm', choices=ALGORITHMS, default='louvain')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default='communities.json')
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle)
+    nodes = None
+    if args.nodes and os.path.exists(args.nodes):
+        with open(args.nodes) as f:
+            nodes = json.load(f)['nodes']
+
+    membership = detect_communities(bundle, args.algorithm, args.seed)
+    payload = communities_payload(bundle, membership, nodes)
+    with open(args.out, 'w') as f:
+        json.dump(payload, f)
+
+    print(f"[OK] Communities ({args.algorithm}) written to {args.out}")
+    print(f"  - Communities: {payload['communityCount']}")
+    print(f"  - Modularity: {payload['stats']['modularity']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
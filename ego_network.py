@@ -0,0 +1,251 @@
+"""k-hop ego networks around a node, extracted from the bundle's CSR adjacency.
+
+The bundle's CSR lists each node's neighbours in edge order, so the first
+slots of a hub say nothing about which of its neighbours matter. The ego
+index reorders each node's CSR slots once per sampling mode, so that the
+sample is a prefix:
+
+    ego_degree.npy  int32  CSR slots per node, best-connected neighbour first
+    ego_amount.npy  int32  CSR slots per node, neighbour with the largest raised amount first
+
+Parallel edges (several rounds between the same pair) are adjacent in both
+orders, led by the pair's latest round (degree) or its largest (amount).
+Both orders share the bundle's indptr. ego.json is written last and records
+the bundle build_id.
+
+An extraction grows the frontier one hop at a time. Each frontier node
+contributes its first `fanout` neighbours in sampling order, with every edge
+to them that passes the funding type and date filters. The slots are scanned
+in doubling chunks until the next neighbour would exceed the cap. So a top
+VC costs a few chunks, not its whole edge list. A pair's rounds collapse into
+the edge that leads them, with their count in `rounds`, as the exports keep
+one edge record per pair.
+
+    python ego_network.py --hops 2 --fanout 25 f:1234
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from graph_bundle import BUNDLE_DIR, load_bundle, retract_manifest, save_array, write_manifest
+
+EGO_VERSION = 1
+SAMPLES = ('degree', 'amount')
+DEFAULT_HOPS = 1
+MAX_HOPS = 3
+DEFAULT_FANOUT = 25
+SCAN_CHUNK = 256
+
+
+def write_ego_index(bundle_path=BUNDLE_DIR):
+    bundle = load_bundle(bundle_path)
+    degree = bundle.degree()
+    rows = np.repeat(np.arange(bundle.node_count), degree)
+    slots = np.arange(len(rows))
+    neighbors = np.asarray(bundle.indices)
+    amounts = np.asarray(bundle.edge_amount)[np.asarray(bundle.edge_ids)]
+    # A neighbour ranks by its largest round with the node; missing amounts sort last
+    pair_max = pd.Series(amounts).groupby(rows.astype(np.int64) * bundle.node_count + neighbors).transform('max')
+    keys = {
+        'degree': (-slots, -degree[neighbors]),
+        'amount': (np.where(np.isnan(amounts), np.inf, -amounts), np.nan_to_num(-pair_max.to_numpy(), nan=np.inf)),
+    }
+    retract_manifest(os.path.join(bundle_path, 'ego.json'))
+    for sample, (edge_key, neighbor_key) in keys.items():
+        # Rows stay grouped as in the CSR and a neighbour's parallel edges stay together, leading edge first
+        order = np.lexsort((slots, edge_key, neighbors, neighbor_key, rows))
+        save_array(os.path.join(bundle_path, f'ego_{sample}.npy'), order.astype(np.int32))
+
+    manifest = {'version': EGO_VERSION, 'build_id': bundle.build_id, 'samples': list(SAMPLES)}
+    write_manifest(os.path.join(bundle_path, 'ego.json'), manifest)
+    return manifest
+
+
+def date_key(value, end=False):
+    """YYYYMMDD int for 'YYYY' or 'YYYY-MM-DD'; a bare year covers the whole year."""
+    text = str(value).strip()
+    parts = text.split('-')
+    if len(parts) == 1 and len(text) == 4 and text.isdigit():
+        return int(text) * 10000 + (1231 if end else 101)
+    if len(parts) == 3 and all(p.isdigit() for p in parts):
+        year, month, day = map(int, parts)
+        return year * 10000 + month * 100 + day
+    raise ValueError(f'Dates must be YYYY or YYYY-MM-DD, got {value!r}')
+
+
+def _format_date(value):
+    return f'{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}' if value else None
+
+
+class EgoIndex:
+    """Sampled, filtered k-hop neighbourhoods of bundle nodes."""
+
+    def __init__(self, bundle, mmap_mode='r'):
+        self.bundle = bundle
+        with open(os.path.join(bundle.path, 'ego.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('build_id') != bundle.build_id:
+            raise ValueError(f'Ego index in {bundle.path} is stale; rebuild it with ego_network.py')
+        self.orders = {sample: np.load(os.path.join(bundle.path, f'ego_{sample}.npy'), mmap_mode=mmap_mode)
+                       for sample in self.manifest['samples']}
+        self.degree = bundle.degree()
+
+    def _filter(self, funding_types=None, date_from=None, date_to=None):
+        """Edge-row predicate for the filters, or None when there are none."""
+        if not funding_types and date_from is None and date_to is None:
+            return None
+        bundle = self.bundle
+        codes = [bundle.funding_types.index(t) for t in funding_types or () if t in bundle.funding_types]
+        low = date_key(date_from) if date_from is not None else None
+        high = date_key(date_to, end=True) if date_to is not None else None
+
+        def accept(edges):
+            keep = np.ones(len(edges), dtype=bool)
+            if funding_types:
+                keep &= np.isin(bundle.edge_type[edges], codes)
+            if low is not None or high is not None:
+                # An edge without a date never matches a date range
+                dates = bundle.edge_date[edges]
+                keep &= dates > 0
+                if low is not None:
+                    keep &= dates >= low
+                if high is not None:
+                    keep &= dates <= high
+            return keep
+        return accept
+
+    def _sample(self, node, order, fanout, accept):
+        """(accepted CSR slots to the first fanout neighbours of node in sampling order, whether more exist)."""
+        start, end = int(self.bundle.indptr[node]), int(self.bundle.indptr[node + 1])
+        picked, seen, last, chunk = [], 0, -1, max(SCAN_CHUNK, fanout)
+        while start < end:
+            slots = np.asarray(order[start:min(end, start + chunk)])
+            start += len(slots)
+            chunk *= 2
+            if accept is not None:
+                slots = slots[accept(np.asarray(self.bundle.edge_ids[slots]))]
+            if not len(slots):
+                continue
+            # Parallel edges are adjacent, so a change of neighbour starts the next one
+            neighbors = np.asarray(self.bundle.indices[slots])
+            starts = np.empty(len(neighbors), dtype=bool)
+            starts[0] = neighbors[0] != last
+            starts[1:] = neighbors[1:] != neighbors[:-1]
+            rank = seen + np.cumsum(starts)
+            keep = rank <= fanout
+            picked.append(slots[keep])
+            if not keep.all():
+                return np.concatenate(picked), True
+            seen, last = int(rank[-1]), int(neighbors[-1])
+        return (np.concatenate(picked) if picked else np.array([], dtype=np.int32)), False
+
+    def ego(self, node_id, hops=DEFAULT_HOPS, fanout=DEFAULT_FANOUT, sample='degree',
+            funding_types=None, date_from=None, date_to=None):
+        """{node, connected_nodes, connected_edges, truncated} for the sampled k-hop subgraph.
+
+        Nodes carry their hop distance and degree; edges carry the number of
+        matching rounds between their pair. truncated says whether the fan-out
+        cap left neighbours out.
+        """
+        if sample not in self.orders:
+            raise ValueError(f"sample must be one of {', '.join(self.orders)}")
+        if hops < 1 or fanout < 1:
+            raise ValueError('hops and fanout must be at least 1')
+        bundle = self.bundle
+        node = bundle.index_of(node_id)
+        if node < 0:
+            raise ValueError(f'Unknown node: {node_id}')
+        order = self.orders[sample]
+        accept = self._filter(funding_types, date_from, date_to)
+
+        # Insertion-ordered dicts keep nodes in discovery order and edges in the order they were sampled
+        hop_of = {node: 0}
+        edges = {}
+        truncated = False
+        frontier = [node]
+        for hop in range(1, hops + 1):
+            following = []
+            for current in frontier:
+                slots, more = self._sample(current, order, fanout, accept)
+                truncated |= more
+                if not len(slots):
+                    continue
+                # One edge per neighbour: the first of its accepted rounds, which both directions agree on
+                neighbors = np.asarray(bundle.indices[slots])
+                starts = np.flatnonzero(np.concatenate([[True], neighbors[1:] != neighbors[:-1]]))
+                rounds = np.diff(np.append(starts, len(slots)))
+                for edge, neighbor, count in zip(np.asarray(bundle.edge_ids[slots[starts]]).tolist(),
+                                                 neighbors[starts].tolist(), rounds.tolist()):
+                    edges.setdefault(edge, count)
+                    if neighbor not in hop_of:
+                        hop_of[neighbor] = hop
+                        following.append(neighbor)
+            frontier = following
+
+        node_types = bundle.manifest['node_types']
+        funding = bundle.funding_types
+
+        ids = {index: bundle.node_id(index) for index in hop_of}
+
+        def describe(index):
+            return {'id': ids[index], 'type': node_types[bundle.node_type[index]],
+                    'degree': int(self.degree[index]), 'hop': hop_of[index]}
+
+        rows = np.fromiter(edges, dtype=np.int64, count=len(edges))
+        connected_edges = []
+        for src, dst, kind, amount, date, count in zip(
+                np.asarray(bundle.edge_src[rows]).tolist(), np.asarray(bundle.edge_dst[rows]).tolist(),
+                np.asarray(bundle.edge_type[rows]).tolist(), np.asarray(bundle.edge_amount[rows]).tolist(),
+                np.asarray(bundle.edge_date[rows]).tolist(), edges.values()):
+            source, target = ids[src], ids[dst]
+            connected_edges.append({
+                'id': f'{source}-{target}',
+                'source': source,
+                'target': target,
+                'funding_round_type': funding[kind] if kind >= 0 else None,
+                'raised_amount': amount if amount == amount else None,
+                'date': _format_date(date),
+                'rounds': count,
+            })
+        return {
+            'node': describe(node),
+            'connected_nodes': [describe(index) for index in list(hop_of)[1:]],
+            'connected_edges': connected_edges,
+            'truncated': truncated,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the ego index of a graph bundle or extract ego networks')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--no-build', action='store_true', help='query the existing index')
+    parser.add_argument('--hops', type=int, default=DEFAULT_HOPS)
+    parser.add_argument('--fanout', type=int, default=DEFAULT_FANOUT, help='neighbours kept per node and hop')
+    parser.add_argument('--sample', choices=SAMPLES, default='degree')
+    parser.add_argument('--funding-types', nargs='*', default=None)
+    parser.add_argument('--date-from', default=None, help='YYYY or YYYY-MM-DD')
+    parser.add_argument('--date-to', default=None, help='YYYY or YYYY-MM-DD')
+    parser.add_argument('node_id', nargs='*')
+    args = parser.parse_args()
+
+    if not args.no_build:
+        write_ego_index(args.bundle)
+        print(f"[OK] Ego index written to {args.bundle}")
+
+    index = EgoIndex(load_bundle(args.bundle))
+    for node_id in args.node_id:
+        started = time.perf_counter()
+        result = index.ego(node_id, args.hops, args.fanout, args.sample,
+                           args.funding_types, args.date_from, args.date_to)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{node_id} (degree {result['node']['degree']}): {len(result['connected_nodes'])} nodes, "
+              f"{len(result['connected_edges'])} edges within {args.hops} hops in {elapsed:.2f} ms"
+              f"{' (fan-out capped)' if result['truncated'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
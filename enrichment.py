@@ -0,0 +1,175 @@
+"""Graph enrichment from the acquisitions, IPO and fund tables.
+
+    acquisitions.csv  acquiring_object_id -> acquired_object_id edges, with price_amount
+    ipos.csv          valuation_amount / public_at / stock_symbol on the company node
+    funds.csv         fund-raise events attached to the investor node
+
+Only the needed columns are read and object ids are loaded as categoricals.
+A join looks up each distinct id of a table in the graph's node index once,
+then gathers by integer code, so no per-row string keys are materialized.
+A missing table simply contributes nothing.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline_cache import PipelineCache
+
+EVENT_TABLES = {
+    'acquisitions': (
+        ['acquiring_object_id', 'acquired_object_id', 'price_amount', 'price_currency_code', 'acquired_at'],
+        {'acquiring_object_id': 'category', 'acquired_object_id': 'category',
+         'price_amount': 'float64', 'price_currency_code': 'category', 'acquired_at': 'str'},
+    ),
+    'ipos': (
+        ['object_id', 'valuation_amount', 'valuation_currency_code', 'public_at', 'stock_symbol'],
+        {'object_id': 'category', 'valuation_amount': 'float64', 'valuation_currency_code': 'category',
+         'public_at': 'str', 'stock_symbol': 'str'},
+    ),
+    'funds': (
+        ['object_id', 'name', 'funded_at', 'raised_amount', 'raised_currency_code'],
+        {'object_id': 'category', 'name': 'str', 'funded_at': 'str', 'raised_amount': 'float64',
+         'raised_currency_code': 'category'},
+    ),
+}
+
+ACQUISITION_TYPE = 'acquisition'
+
+
+def table_path(base_path, table):
+    return os.path.join(base_path, 'A kaggle dataset', f'{table}.csv')
+
+
+def has_events(base_path):
+    return any(os.path.exists(table_path(base_path, table)) for table in EVENT_TABLES)
+
+
+def events_key(cache, base_path):
+    """Cache key over the event tables that exist under base_path."""
+    parts = {}
+    for table, (usecols, dtype) in EVENT_TABLES.items():
+        path = table_path(base_path, table)
+        parts[table] = cache.raw_key(path, usecols, dtype) if os.path.exists(path) else None
+    return cache.key('events', **parts)
+
+
+def load_events(base_path, cache=None):
+    cache = cache or PipelineCache(enabled=False)
+    events = {}
+    for table, (usecols, dtype) in EVENT_TABLES.items():
+        path = table_path(base_path, table)
+        if os.path.exists(path):
+            frame = cache.cached_read_csv(path, usecols=usecols, dtype=dtype)
+        else:
+            frame = pd.DataFrame({c: pd.Series(dtype=dtype[c]) for c in usecols})
+        events[table] = frame
+    return events
+
+
+def locate(index, ids):
+    """Position of each id in `index` (-1 when absent), hashing only distinct values."""
+    ids = ids if isinstance(ids.dtype, pd.CategoricalDtype) else ids.astype('category')
+    codes = ids.cat.codes.to_numpy()
+    positions = index.get_indexer(ids.cat.categories.astype(str))
+    # Missing ids have code -1; the appended -1 maps them to "absent"
+    return np.append(positions, -1)[codes]
+
+
+def _date(values):
+    return pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d')
+
+
+def acquisition_edges(acquisitions, node_ids, touching=True):
+    """Acquisition rows shaped like the backend edge table.
+
+    touching=True keeps every acquisition with at least one endpoint in
+    node_ids (bringing the other company in), False only those between nodes
+    already present.
+    """
+    index = pd.Index(pd.unique(np.asarray(node_ids, dtype=object)))
+    source_in = locate(index, acquisitions['acquiring_object_id']) >= 0
+    target_in = locate(index, acquisitions['acquired_object_id']) >= 0
+    keep = (source_in | target_in) if touching else (source_in & target_in)
+    rows = acquisitions[keep & acquisitions['acquiring_object_id'].notna().to_numpy()
+                        & acquisitions['acquired_object_id'].notna().to_numpy()]
+
+    source = rows['acquiring_object_id'].astype(str).reset_index(drop=True)
+    target = rows['acquired_object_id'].astype(str).reset_index(drop=True)
+    return pd.DataFrame({
+        'source': source,
+        'target': target,
+        'id': source + '-' + target,
+        'funding_round_type': ACQUISITION_TYPE,
+        'raised_amount': rows['price_amount'].astype('float64').reset_index(drop=True),
+        'date': _date(rows['acquired_at']).reset_index(drop=True),
+        'post_money_valuation': np.nan,
+    })
+
+
+def _clean(record):
+    # Drop missing values so unmatched fields do not bloat every node
+    return {k: v for k, v in record.items() if v is not None and v == v}
+
+
+def ipo_attributes(ipos, node_ids):
+    """{node position: {valuation_amount, public_at, stock_symbol}} for nodes that went public.
+
+    A company with several IPO rows keeps its earliest.
+    """
+    positions = locate(pd.Index(node_ids), ipos['object_id'])
+    matched = ipos.assign(position=positions, public_at=_date(ipos['public_at']))
+    matched = matched[matched['position'] >= 0].sort_values(['position', 'public_at'], na_position='last')
+    matched = matched.drop_duplicates('position', keep='first')
+    return {
+        int(position): _clean({'valuation_amount': valuation, 'public_at': public_at, 'stock_symbol': symbol})
+        for position, valuation, public_at, symbol in zip(
+            matched['position'], matched['valuation_amount'].tolist(),
+            matched['public_at'].tolist(), matched['stock_symbol'].tolist())
+    }
+
+
+def fund_attributes(funds, node_ids):
+    """{node position: {fund_count, funds_raised_usd, last_fund_at, funds}} for investors that raised funds."""
+    positions = locate(pd.Index(node_ids), funds['object_id'])
+    matched = funds.assign(position=positions, funded_at=_date(funds['funded_at']))
+    matched = matched[matched['position'] >= 0].sort_values(['position', 'funded_at'], na_position='last')
+
+    attributes = {}
+    for position, name, funded_at, amount, currency in zip(
+            matched['position'].tolist(), matched['name'].tolist(), matched['funded_at'].tolist(),
+            matched['raised_amount'].tolist(), matched['raised_currency_code'].astype(object).tolist()):
+        entry = attributes.setdefault(position, {'fund_count': 0, 'funds_raised_usd': 0.0, 'funds': []})
+        entry['fund_count'] += 1
+        # Amounts are not converted, so only USD raises are totalled
+        if amount == amount and currency == 'USD':
+            entry['funds_raised_usd'] += amount
+        if funded_at == funded_at and funded_at is not None:
+            entry['last_fund_at'] = funded_at
+        entry['funds'].append(_clean({'name': name, 'funded_at': funded_at,
+                                      'raised_amount': amount, 'currency': currency}))
+    return attributes
+
+
+def node_attributes(events, node_ids):
+    """IPO and fund attributes per node position, merged."""
+    attributes = {}
+    for table in (ipo_attributes(events['ipos'], node_ids), fund_attributes(events['funds'], node_ids)):
+        for position, values in table.items():
+            attributes.setdefault(position, {}).update(values)
+    return attributes
+
+
+def attribute_rows(node_ids, events):
+    """IPO/fund attributes keyed by position in node_ids; the first position wins for duplicate ids."""
+    node_ids = pd.Series(np.asarray(node_ids, dtype=object), dtype=object).drop_duplicates()
+    first = node_ids.index.to_numpy()
+    return {int(first[position]): values
+            for position, values in node_attributes(events, node_ids.to_numpy()).items()}
+
+
+def attribute_counts(rows):
+    """(nodes with an IPO attribute, nodes with a fund attribute) among attribute_rows() values."""
+    ipo_nodes = sum('public_at' in values or 'valuation_amount' in values for values in rows.values())
+    fund_nodes = sum('fund_count' in values for values in rows.values())
+    return ipo_nodes, fund_nodes
@@ -0,0 +1,221 @@
+"""Precomputed filter indexes (posting lists) over a graph bundle.
+
+Each index maps a key to a sorted int32 array of edge or node indexes of
+the bundle, stored CSR-style so it can be memory-mapped:
+
+    filter_<name>_offsets.npy  int64  key k owns ids[offsets[k]:offsets[k + 1]]
+    filter_<name>_ids.npy      int32  sorted ids per key
+
+    funding  funding_round_type -> edge ids (keys: manifest funding_types)
+    year     funded year        -> edge ids (keys: filters.json years)
+    type     node type          -> node ids (keys: manifest node_types)
+    node     node index         -> incident edge ids
+
+filters.json is written last and records the bundle build_id it was built
+from. A combined query intersects the posting lists, so its cost follows the
+size of the lists it touches rather than the size of the graph.
+"""
+import argparse
+import datetime
+import json
+import os
+
+import numpy as np
+
+from graph_bundle import BUNDLE_DIR, load_bundle, retract_manifest, save_array, write_manifest
+
+INDEX_VERSION = 1
+INDEXES = ('funding', 'year', 'type', 'node')
+# /api/network timePeriod -> years before the current one; server.js keeps edges from that year on
+TIME_PERIODS = {'2024': 0, '2023': 1, '2022': 2, 'last-12-months': 1, 'last-6-months': 0}
+
+
+def postings(keys, key_count):
+    """(offsets, ids) grouping positions 0..len(keys)-1 by key; negative keys are left out."""
+    keys = np.asarray(keys, dtype=np.int64)
+    ids = np.flatnonzero(keys >= 0)
+    # Stable sort keeps ids ascending within each key
+    ids = ids[np.argsort(keys[ids], kind='stable')]
+    offsets = np.zeros(key_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys[ids], minlength=key_count), out=offsets[1:])
+    return offsets, ids.astype(np.int32)
+
+
+def write_filter_index(bundle_path=BUNDLE_DIR):
+    bundle = load_bundle(bundle_path)
+    years = np.asarray(bundle.edge_date) // 10000
+    year_keys = np.unique(years[years > 0])
+    year_codes = np.where(years > 0, np.searchsorted(year_keys, years), -1)
+
+    # Node -> incident edges: the CSR edge_ids, sorted within each node and without self-loop repeats
+    degree = bundle.degree()
+    rows = np.repeat(np.arange(bundle.node_count), degree)
+    order = np.lexsort((np.asarray(bundle.edge_ids), rows))
+    rows, slots = rows[order], np.asarray(bundle.edge_ids)[order]
+    keep = np.ones(len(slots), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (slots[1:] != slots[:-1])
+    rows, slots = rows[keep], slots[keep]
+    node_offsets = np.zeros(bundle.node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=bundle.node_count), out=node_offsets[1:])
+
+    indexes = {
+        'funding': postings(bundle.edge_type, len(bundle.funding_types)),
+        'year': postings(year_codes, len(year_keys)),
+        'type': postings(bundle.node_type, len(bundle.manifest['node_types'])),
+        'node': (node_offsets, slots.astype(np.int32)),
+    }
+    retract_manifest(os.path.join(bundle_path, 'filters.json'))
+    for name, (offsets, ids) in indexes.items():
+        save_array(os.path.join(bundle_path, f'filter_{name}_offsets.npy'), offsets)
+        save_array(os.path.join(bundle_path, f'filter_{name}_ids.npy'), ids)
+
+    manifest = {
+        'version': INDEX_VERSION,
+        'build_id': bundle.build_id,
+        'years': [int(y) for y in year_keys],
+    }
+    write_manifest(os.path.join(bundle_path, 'filters.json'), manifest)
+    return manifest
+
+
+def period_start(time_period, year=None):
+    """First year kept by a /api/network timePeriod, or None when it keeps every edge."""
+    if time_period not in TIME_PERIODS:
+        return None
+    return (year or datetime.date.today().year) - TIME_PERIODS[time_period]
+
+
+def contains_sorted(posting, values):
+    """Membership mask of `values` in a sorted posting list, by binary search."""
+    if not len(posting):
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(posting, values)
+    positions[positions == len(posting)] = 0
+    return posting[positions] == values
+
+
+def intersect_sorted(a, b):
+    """Intersection of two sorted unique arrays: binary search of the smaller into the larger."""
+    if len(a) > len(b):
+        a, b = b, a
+    return a[contains_sorted(b, a)]
+
+
+class FilterIndex:
+    """Memory-mapped posting lists of a bundle plus the combined filter query."""
+
+    def __init__(self, bundle, mmap_mode='r'):
+        self.bundle = bundle
+        with open(os.path.join(bundle.path, 'filters.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('build_id') != bundle.build_id:
+            raise ValueError(f'Filter index in {bundle.path} is stale; rebuild it with filter_index.py')
+        self.years = self.manifest['years']
+        for name in INDEXES:
+            setattr(self, f'{name}_offsets', np.load(os.path.join(bundle.path, f'filter_{name}_offsets.npy'), mmap_mode=mmap_mode))
+            setattr(self, f'{name}_ids', np.load(os.path.join(bundle.path, f'filter_{name}_ids.npy'), mmap_mode=mmap_mode))
+
+    def posting(self, name, key):
+        offsets = getattr(self, f'{name}_offsets')
+        return np.asarray(getattr(self, f'{name}_ids')[offsets[key]:offsets[key + 1]])
+
+    def gather(self, name, keys):
+        """Sorted union of the posting lists of `keys`, gathered without a per-key loop."""
+        offsets = getattr(self, f'{name}_offsets')
+        keys = np.asarray(keys, dtype=np.int64)
+        starts, ends = offsets[keys], offsets[keys + 1]
+        counts = ends - starts
+        slots = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        ids = np.asarray(getattr(self, f'{name}_ids')[slots])
+        return ids if len(keys) <= 1 else np.unique(ids)
+
+    def funding_edges(self, funding_type):
+        # Same matching as server.js: case-insensitive substring of funding_round_type
+        needle = funding_type.lower()
+        return self.gather('funding', [k for k, name in enumerate(self.bundle.funding_types) if needle in name.lower()])
+
+    def year_edges(self, start=None, end=None):
+        return self.gather('year', [k for k, year in enumerate(self.years)
+                                    if (start is None or year >= start) and (end is None or year <= end)])
+
+    def type_nodes(self, node_type):
+        node_types = self.bundle.manifest['node_types']
+        if node_type not in node_types:
+            return np.array([], dtype=np.int32)
+        return self.posting('type', node_types.index(node_type))
+
+    def node_edges(self, node):
+        return self.posting('node', node)
+
+    def _endpoints(self, edges):
+        src = np.asarray(self.bundle.edge_src)[edges]
+        dst = np.asarray(self.bundle.edge_dst)[edges]
+        return np.unique(np.concatenate([src, dst])).astype(np.int32)
+
+    def query(self, node_type=None, funding_type=None, year_from=None, year_to=None, node_id=None):
+        """Evaluate a combined filter; returns (node indexes, edge ids), both sorted.
+
+        Mirrors the /api/network filters: edge filters keep only the nodes
+        their edges touch, and an edge survives only if both endpoints do.
+        `node_id` restricts the result to that node's incident edges.
+        """
+        edges = None
+
+        def narrow(current, posting):
+            return posting if current is None else intersect_sorted(current, posting)
+
+        if funding_type and funding_type != 'all':
+            edges = narrow(edges, self.funding_edges(funding_type))
+        if year_from is not None or year_to is not None:
+            edges = narrow(edges, self.year_edges(year_from, year_to))
+        if node_id is not None:
+            node = self.bundle.index_of(node_id)
+            edges = narrow(edges, self.node_edges(node) if node >= 0 else np.array([], dtype=np.int32))
+
+        type_filter = node_type and node_type != 'all'
+        if edges is None:
+            if not type_filter:
+                return np.arange(self.bundle.node_count, dtype=np.int32), np.arange(self.bundle.edge_count, dtype=np.int32)
+            nodes = self.type_nodes(node_type)
+            edges = self.gather('node', nodes)
+        else:
+            nodes = self._endpoints(edges)
+            if type_filter:
+                nodes = intersect_sorted(nodes, self.type_nodes(node_type))
+
+        if type_filter:
+            # Probe the candidate edges' endpoints against the sorted node list
+            # instead of allocating a node_count mask per query
+            src = np.asarray(self.bundle.edge_src)[edges]
+            dst = np.asarray(self.bundle.edge_dst)[edges]
+            edges = edges[contains_sorted(nodes, src) & contains_sorted(nodes, dst)]
+        return nodes, edges
+
+
+def load_filter_index(bundle=None):
+    return FilterIndex(bundle if bundle is not None else load_bundle(BUNDLE_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the filter indexes of a graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--build', action='store_true', help='(re)build the indexes before querying')
+    parser.add_argument('--node-type')
+    parser.add_argument('--funding-type')
+    parser.add_argument('--year-from', type=int)
+    parser.add_argument('--year-to', type=int)
+    parser.add_argument('--node', help='only edges incident to this node id')
+    args = parser.parse_args()
+
+    if args.build:
+        manifest = write_filter_index(args.bundle)
+        print(f"[OK] Filter indexes written to {args.bundle} ({len(manifest['years'])} years)")
+
+    index = load_filter_index(load_bundle(args.bundle))
+    nodes, edges = index.query(args.node_type, args.funding_type, args.year_from, args.year_to, args.node)
+    print(f"  - Nodes: {len(nodes)}")
+    print(f"  - Edges: {len(edges)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Binary CSR graph bundle written next to network_data.json.
+
+The bundle is a directory of plain .npy arrays plus a small manifest.json so
+analytics can np.load(..., mmap_mode='r') every array and get an adjacency
+structure without parsing JSON or building per-node Python objects.
+
+    node_ids.npy      S<n>   string id per node index ("c:26569")
+    node_order.npy    int32  argsort of node_ids, for binary-search lookup
+    node_type.npy     int8   index into manifest['node_types']
+    edge_src.npy      int32  investor node index per edge
+    edge_dst.npy      int32  company node index per edge
+    edge_type.npy     int16  index into manifest['funding_types'], -1 if missing
+    edge_amount.npy   float64 raised amount, NaN if missing
+    edge_date.npy     int32  funding date as YYYYMMDD, 0 if missing
+    indptr.npy        int64  CSR offsets, undirected (both edge directions)
+    indices.npy       int32  CSR neighbor node index
+    edge_ids.npy      int32  CSR slot -> edge row, for edge attributes
+
+Readers memory-map these files, so a republish never rewrites one in place.
+Each file is written to a temporary sibling and os.replace'd over the old
+one, which leaves an open map on the old file. A manifest is removed before
+the files it describes are replaced and written again last, so a directory
+with a manifest holds the arrays that manifest describes. The secondary
+indexes (filters, search, layout, ego, ...) publish the same way through
+save_array, write_manifest and retract_manifest.
+"""
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+BUNDLE_DIR = 'network_graph'
+BUNDLE_VERSION = 1
+NODE_TYPES = ['company', 'investor']
+
+_ARRAYS = [
+    'node_ids', 'node_order', 'node_type',
+    'edge_src', 'edge_dst', 'edge_type', 'edge_amount', 'edge_date',
+    'indptr', 'indices', 'edge_ids',
+]
+
+
+def _encode_dates(dates):
+    parsed = pd.to_datetime(pd.Series(dates, dtype=object), errors='coerce')
+    encoded = parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day
+    return encoded.fillna(0).to_numpy(dtype=np.int32)
+
+
+def build_csr(src, dst, node_count):
+    """Undirected CSR adjacency: (indptr, indices, edge_ids)."""
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    rows = np.concatenate([src, dst])
+    cols = np.concatenate([dst, src])
+    slots = np.concatenate([np.arange(len(src)), np.arange(len(src))])
+
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=node_count), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32), slots[order].astype(np.int32)
+
+
+def write_atomic(path, write, mode='wb'):
+    """Write path through write(file) on a temporary sibling, then os.replace it into place."""
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, mode) as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def save_array(path, array):
+    write_atomic(path, lambda f: np.save(f, array))
+
+
+def write_manifest(path, manifest):
+    write_atomic(path, lambda f: json.dump(manifest, f, indent=2), mode='w')
+
+
+def retract_manifest(path):
+    """Remove a manifest before the files it describes are replaced."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_bundle(path, node_ids, node_types, sources, targets,
+                 funding_types=None, amounts=None, dates=None):
+    """Write a bundle from column sequences.
+
+    node_ids/node_types describe nodes (duplicate ids keep their first type);
+    sources/targets are string ids per edge, the remaining edge columns are
+    optional and aligned with them.
+    """
+    node_frame = pd.DataFrame({'id': pd.Series(node_ids, dtype=object).astype(str),
+                               'type': pd.Series(node_types, dtype=object)})
+    node_frame = node_frame.drop_duplicates('id', keep='first').reset_index(drop=True)
+    ids = node_frame['id'].to_numpy(dtype=object)
+
+    index = pd.Index(ids)
+    src = index.get_indexer(pd.Series(sources, dtype=object).astype(str))
+    dst = index.get_indexer(pd.Series(targets, dtype=object).astype(str))
+    keep = (src >= 0) & (dst >= 0)
+    src, dst = src[keep], dst[keep]
+    edge_count = len(src)
+
+    if funding_types is not None:
+        codes, categories = pd.factorize(pd.Series(funding_types, dtype=object)[keep], sort=True)
+        edge_type = codes.astype(np.int16)
+        categories = [str(c) for c in categories]
+    else:
+        edge_type = np.full(edge_count, -1, dtype=np.int16)
+        categories = []
+
+    if amounts is not None:
+        edge_amount = pd.to_numeric(pd.Series(amounts, dtype=object)[keep], errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        edge_amount = np.full(edge_count, np.nan)
+
+    edge_date = _encode_dates(pd.Series(dates, dtype=object)[keep]) if dates is not None else np.zeros(edge_count, dtype=np.int32)
+
+    indptr, indices, edge_ids = build_csr(src, dst, len(ids))
+    encoded_ids = np.array([i.encode('utf-8') for i in ids], dtype=bytes) if len(ids) else np.array([], dtype='S1')
+
+    arrays = {
+        'node_ids': encoded_ids,
+        'node_order': np.argsort(encoded_ids, kind='stable').astype(np.int32),
+        'node_type': pd.Categorical(node_frame['type'], categories=NODE_TYPES).codes.astype(np.int8),
+        'edge_src': src.astype(np.int32),
+        'edge_dst': dst.astype(np.int32),
+        'edge_type': edge_type,
+        'edge_amount': edge_amount,
+        'edge_date': edge_date,
+        'indptr': indptr,
+        'indices': indices,
+        'edge_ids': edge_ids,
+    }
+
+    os.makedirs(path, exist_ok=True)
+    retract_manifest(os.path.join(path, 'manifest.json'))
+    for name, array in arrays.items():
+        save_array(os.path.join(path, f'{name}.npy'), array)
+
+    # The manifest is written last, so a bundle with a manifest is complete
+    manifest = {
+        'version': BUNDLE_VERSION,
+        'build_id': uuid.uuid4().hex,
+        'node_count': len(ids),
+        'edge_count': edge_count,
+        'node_types': NODE_TYPES,
+        'funding_types': categories,
+        'date_format': 'yyyymmdd',
+    }
+    write_manifest(os.path.join(path, 'manifest.json'), manifest)
+    return manifest
+
+
+class GraphBundle:
+    """Read-only view over a bundle directory; every array is memory-mapped."""
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode))
+
+    @property
+    def build_id(self):
+        return self.manifest.get('build_id')
+
+    @property
+    def node_count(self):
+        return self.manifest['node_count']
+
+    @property
+    def edge_count(self):
+        return self.manifest['edge_count']
+
+    @property
+    def funding_types(self):
+        return self.manifest['funding_types']
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def neighbors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def incident_edges(self, node):
+        return self.edge_ids[self.indptr[node]:self.indptr[node + 1]]
+
+    def index_of(self, node_id):
+        """Node index for a string id, or -1 when absent (binary search, no dict)."""
+        key = node_id.encode('utf-8') if isinstance(node_id, str) else node_id
+        if len(key) > self.node_ids.dtype.itemsize:
+            return -1
+        position = np.searchsorted(self.node_ids, key, sorter=self.node_order)
+        if position < self.node_count:
+            candidate = int(self.node_order[position])
+            if self.node_ids[candidate] == key:
+                return candidate
+        return -1
+
+    def node_id(self, node):
+        return self.node_ids[node].decode('utf-8')
+
+
+def subgraph(bundle, nodes, edges):
+    """In-memory GraphBundle over sorted node indexes and edge rows of bundle.
+
+    Nodes are renumbered in their original order and keep their ids, so
+    index_of and node_id work as on the full bundle. Every edge must join two
+    of `nodes`. The view has no path, so the on-disk indexes do not apply.
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    edges = np.asarray(edges, dtype=np.int64)
+    src = np.searchsorted(nodes, np.asarray(bundle.edge_src)[edges])
+    dst = np.searchsorted(nodes, np.asarray(bundle.edge_dst)[edges])
+    view = GraphBundle.__new__(GraphBundle)
+    view.path = None
+    view.manifest = {**bundle.manifest, 'node_count': len(nodes), 'edge_count': len(edges)}
+    view.node_ids = np.asarray(bundle.node_ids)[nodes]
+    view.node_order = np.argsort(view.node_ids, kind='stable').astype(np.int32)
+    view.node_type = np.asarray(bundle.node_type)[nodes]
+    view.edge_src = src.astype(np.int32)
+    view.edge_dst = dst.astype(np.int32)
+    for name in ('edge_type', 'edge_amount', 'edge_date'):
+        setattr(view, name, np.asarray(getattr(bundle, name))[edges])
+    view.indptr, view.indices, view.edge_ids = build_csr(src, dst, len(nodes))
+    return view
+
+
+def load_bundle(path=BUNDLE_DIR, mmap_mode='r'):
+    return GraphBundle(path, mmap_mode=mmap_mode)
@@ -0,0 +1,366 @@
+"""Incremental upsert ingest of the investment, funding round and acquisition tables.
+
+    python incremental.py --base-path "c:\\PROJECT SNA"
+    python prepare_backend_data.py --incremental
+
+The store under <base>/.incremental keeps the three tables upserted by row
+id, with endpoints interned in an IdTable. Investments and acquisitions
+are kept in id order, the order of the Kaggle export, so an edge table
+built from the store matches one built from the CSVs. The store also keeps
+the full-dataset aggregates that the metadata reports: companies,
+investors, the funding_types distribution and the date_range.
+
+For each table, the store records the highest updated_at it has seen (its
+watermark) and the size/mtime of the CSV. A refresh skips a table whose CSV
+is unchanged. Otherwise it reads only the rows with updated_at >= watermark.
+It uses a row-group filter on the ingested Parquet when ingest.py has
+converted the current CSV, and a streaming CSV scan that keeps only those
+rows otherwise.
+
+An edge's details come from the last row of its (source, target) pair. So
+the pairs an upsert can change are re-evaluated before and after the
+upsert, and only the difference is applied to the aggregates. These are the
+pairs of upserted rows, of rows on a changed funding round, and of the rows
+that were replaced. Upserting a row twice is harmless, so rows stamped
+exactly at the watermark are simply read again.
+
+The export has no tombstones, so rows are never deleted. Rows without an
+updated_at are only picked up by the first load.
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from enrichment import ACQUISITION_TYPE
+from ingest import HAS_PYARROW, TABLE_SCHEMAS, ingested_path, table_name
+from interning import IdTable
+
+STORE_DIR = '.incremental'
+STORE_VERSION = 1
+WATERMARK = 'updated_at'
+CHUNK_ROWS = 200_000
+_STATE = ('ids', 'tables', 'watermarks', 'company_refs', 'investor_refs', 'funding_types', 'date_counts')
+
+# Upsert key and columns read per table
+TABLES = {
+    'investments': ('id', ['id', 'funding_round_id', 'funded_object_id', 'investor_object_id']),
+    'funding_rounds': ('funding_round_id', ['funding_round_id', 'funding_round_type', 'funded_at',
+                                            'raised_amount_usd', 'post_money_valuation_usd']),
+    'acquisitions': ('acquisition_id', ['acquisition_id', 'acquiring_object_id', 'acquired_object_id',
+                                        'price_amount', 'acquired_at']),
+}
+
+
+def table_path(base_path, table):
+    return os.path.join(base_path, 'A kaggle dataset', f'{table}.csv')
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _date(values):
+    return pd.to_datetime(values, errors='coerce').dt.strftime('%Y-%m-%d')
+
+
+def _scan_csv(csv_path, columns, watermark):
+    # Batches are filtered as they are parsed, so only the delta is ever held in memory
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pv
+
+    schema = TABLE_SCHEMAS.get(table_name(csv_path), {})
+    reader = pv.open_csv(
+        csv_path,
+        parse_options=pv.ParseOptions(newlines_in_values=True),
+        convert_options=pv.ConvertOptions(
+            include_columns=columns, strings_can_be_null=True,
+            column_types={c: getattr(pa, schema[c])() for c in columns if c in schema}),
+    )
+    batches = []
+    for batch in reader:
+        if watermark is not None:
+            # A missing updated_at compares as null and the row is dropped
+            batch = batch.filter(pc.greater_equal(batch.column(WATERMARK), watermark))
+        batches.append(batch)
+    return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+
+def read_delta(csv_path, columns, watermark=None):
+    """Rows of csv_path with updated_at >= watermark (every row when watermark is None)."""
+    columns = list(columns) + [WATERMARK]
+    parquet = ingested_path(csv_path, columns)
+    if parquet is not None:
+        import pyarrow.parquet as pq
+        filters = [(WATERMARK, '>=', watermark)] if watermark is not None else None
+        return pq.read_table(parquet, columns=columns, filters=filters).to_pandas()
+    if HAS_PYARROW:
+        return _scan_csv(csv_path, columns, watermark)
+    chunks = pd.read_csv(csv_path, usecols=columns, chunksize=CHUNK_ROWS)
+    return pd.concat([chunk if watermark is None else chunk[chunk[WATERMARK].ge(watermark).fillna(False)]
+                      for chunk in chunks], ignore_index=True)
+
+
+def _lookup(keys, values):
+    """(positions, found): where each value sits in the sorted keys, and whether it is there."""
+    at = np.searchsorted(keys, values)
+    found = at < len(keys)
+    found[found] = keys[at[found]] == values[found]
+    return at, found
+
+
+def _upsert(table, rows, key):
+    """table with rows upserted by key; it stays sorted by key."""
+    at, found = _lookup(table[key].to_numpy(), rows[key].to_numpy())
+    kept = np.ones(len(table), dtype=bool)
+    kept[at[found]] = False
+    upserted = pd.concat([table[kept], rows], ignore_index=True)
+    # New Kaggle rows get higher ids, so a sort is only needed when an update lands in the middle
+    if not upserted[key].is_monotonic_increasing:
+        upserted = upserted.sort_values(key, kind='stable', ignore_index=True)
+    return upserted
+
+
+def _replaced(table, rows, key):
+    """The rows of table that an upsert of rows would replace."""
+    at, found = _lookup(table[key].to_numpy(), rows[key].to_numpy())
+    return table.iloc[at[found]]
+
+
+def _pair_keys(source, target):
+    # One int64 per (source, target) pair, as in the backend edge table
+    return (np.asarray(source, dtype=np.int64) << 32) | np.asarray(target, dtype=np.int64)
+
+
+def _grown(counts, size):
+    return np.concatenate([counts, np.zeros(size - len(counts), dtype=counts.dtype)]) if len(counts) < size else counts
+
+
+def _empty_tables():
+    return {
+        'investments': pd.DataFrame({'id': pd.Series(dtype='int64'), 'funding_round_id': pd.Series(dtype='float64'),
+                                     'source': pd.Series(dtype='int32'), 'target': pd.Series(dtype='int32')}),
+        'funding_rounds': pd.DataFrame({'funding_round_id': pd.Series(dtype='float64'),
+                                        'funding_round_type': pd.Series(dtype=object),
+                                        'date': pd.Series(dtype=object),
+                                        'raised_amount_usd': pd.Series(dtype='float64'),
+                                        'post_money_valuation_usd': pd.Series(dtype='float64')}),
+        'acquisitions': pd.DataFrame({'acquisition_id': pd.Series(dtype='int64'), 'source': pd.Series(dtype='int32'),
+                                      'target': pd.Series(dtype='int32'), 'raised_amount': pd.Series(dtype='float64'),
+                                      'date': pd.Series(dtype=object)}),
+    }
+
+
+class IncrementalStore:
+    """Upserted investment, funding round and acquisition tables plus their running aggregates."""
+
+    def __init__(self, base_path, root=None):
+        self.base_path = base_path
+        self.root = root or os.path.join(base_path, STORE_DIR)
+        self.ids = IdTable()
+        self.tables = _empty_tables()
+        self.watermarks = {}
+        # Rows referencing each code as a company / as an investor
+        self.company_refs = np.zeros(0, dtype=np.int64)
+        self.investor_refs = np.zeros(0, dtype=np.int64)
+        self.funding_types = {}
+        self.date_counts = Counter()
+
+        path = os.path.join(self.root, 'store.pkl')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') == STORE_VERSION:
+                for name in _STATE:
+                    setattr(self, name, state[name])
+
+    @property
+    def investments(self):
+        return self.tables['investments']
+
+    @property
+    def rounds(self):
+        return self.tables['funding_rounds']
+
+    @property
+    def acquisitions(self):
+        return self.tables['acquisitions']
+
+    def key(self):
+        """Changes whenever a refresh changed the stored rows."""
+        return json.dumps(self.watermarks, sort_keys=True)
+
+    def _normalized(self, table, frame):
+        # Delta rows in the stored layout, deduplicated by key (the last row wins, as in a full build)
+        key = TABLES[table][0]
+        frame = frame.dropna(subset=[key]).drop_duplicates(key, keep='last')
+        if table == 'funding_rounds':
+            return pd.DataFrame({
+                'funding_round_id': frame['funding_round_id'].astype('float64').to_numpy(),
+                'funding_round_type': frame['funding_round_type'].astype(object).to_numpy(),
+                'date': _date(frame['funded_at']).astype(object).to_numpy(),
+                'raised_amount_usd': frame['raised_amount_usd'].astype('float64').to_numpy(),
+                'post_money_valuation_usd': frame['post_money_valuation_usd'].astype('float64').to_numpy(),
+            }).sort_values(key, kind='stable', ignore_index=True)
+        if table == 'investments':
+            frame = frame.sort_values(key, kind='stable')
+            return pd.DataFrame({
+                'id': frame['id'].astype('int64').to_numpy(),
+                'funding_round_id': frame['funding_round_id'].astype('float64').to_numpy(),
+                'source': self.ids.encode(frame['investor_object_id'].astype(str)),
+                'target': self.ids.encode(frame['funded_object_id'].astype(str)),
+            })
+        # Acquisitions without both endpoints never become edges
+        frame = frame.dropna(subset=['acquiring_object_id', 'acquired_object_id']).sort_values(key, kind='stable')
+        return pd.DataFrame({
+            'acquisition_id': frame['acquisition_id'].astype('int64').to_numpy(),
+            'source': self.ids.encode(frame['acquiring_object_id'].astype(str)),
+            'target': self.ids.encode(frame['acquired_object_id'].astype(str)),
+            'raised_amount': frame['price_amount'].astype('float64').to_numpy(),
+            'date': _date(frame['acquired_at']).astype(object).to_numpy(),
+        })
+
+    def _details(self, keys):
+        """(funding type, date) of the detail row of each pair in keys that has rows."""
+        investments, acquisitions = self.investments, self.acquisitions
+        # Edge table order is investments then acquisitions, so the last row of a pair wins
+        all_keys = np.concatenate([_pair_keys(investments['source'], investments['target']),
+                                   _pair_keys(acquisitions['source'], acquisitions['target'])])
+        rows = np.flatnonzero(pd.Series(all_keys).isin(keys).to_numpy())[::-1]
+        winners = rows[~pd.Series(all_keys[rows]).duplicated().to_numpy()]
+        invested = winners[winners < len(investments)]
+        acquired = winners[winners >= len(investments)] - len(investments)
+
+        rounds = self.rounds
+        round_ids = investments['funding_round_id'].to_numpy()[invested]
+        at, matched = _lookup(rounds['funding_round_id'].to_numpy(), round_ids)
+        types = np.full(len(round_ids), 'unknown', dtype=object)
+        types[matched] = rounds['funding_round_type'].to_numpy()[at[matched]]
+        dates = np.full(len(round_ids), None, dtype=object)
+        dates[matched] = rounds['date'].to_numpy()[at[matched]]
+        return (pd.Series(np.concatenate([types, np.full(len(acquired), ACQUISITION_TYPE, dtype=object)]), dtype=object),
+                pd.Series(np.concatenate([dates, acquisitions['date'].to_numpy()[acquired]]), dtype=object))
+
+    def _apply_details(self, keys, sign):
+        types, dates = self._details(keys)
+        for value, count in types.value_counts(dropna=False, sort=False).items():
+            # A matched round without a type counts under None, like NaN in a full build
+            value = None if value is None or value != value else value
+            self.funding_types[value] = self.funding_types.get(value, 0) + sign * count
+        self.date_counts.update({d: sign * c for d, c in dates.value_counts(sort=False).items()})
+
+    def _apply_refs(self, investments, acquisitions, sign):
+        self.company_refs = _grown(self.company_refs, len(self.ids))
+        self.investor_refs = _grown(self.investor_refs, len(self.ids))
+        np.add.at(self.investor_refs, investments['source'].to_numpy(), sign)
+        np.add.at(self.company_refs, investments['target'].to_numpy(), sign)
+        np.add.at(self.company_refs, acquisitions['source'].to_numpy(), sign)
+        np.add.at(self.company_refs, acquisitions['target'].to_numpy(), sign)
+
+    def refresh(self):
+        """Upsert the rows changed since the last refresh; returns {table: rows read} for the tables read."""
+        deltas, marks = {}, {}
+        for table, (_, columns) in TABLES.items():
+            path = table_path(self.base_path, table)
+            if not os.path.exists(path):
+                continue
+            known = self.watermarks.get(table, {})
+            stat = _stat(path)
+            if known.get('stat') == stat:
+                continue
+            frame = read_delta(path, columns, known.get('watermark'))
+            stamps = frame[WATERMARK].dropna()
+            latest = stamps.max() if len(stamps) else None
+            marks[table] = {'watermark': max(filter(None, [known.get('watermark'), latest]), default=None),
+                            'stat': stat}
+            deltas[table] = self._normalized(table, frame)
+        if not deltas:
+            return {}
+
+        empty = _empty_tables()
+        investments = deltas.get('investments', empty['investments'])
+        rounds = deltas.get('funding_rounds', empty['funding_rounds'])
+        acquisitions = deltas.get('acquisitions', empty['acquisitions'])
+
+        # Rows about to be replaced, looked up before anything changes
+        old_investments = _replaced(self.investments, investments, 'id')
+        old_acquisitions = _replaced(self.acquisitions, acquisitions, 'acquisition_id')
+        on_rounds = self.investments[self.investments['funding_round_id'].isin(rounds['funding_round_id']).to_numpy()]
+        keys = pd.unique(np.concatenate([
+            _pair_keys(old_investments['source'], old_investments['target']),
+            _pair_keys(investments['source'], investments['target']),
+            _pair_keys(on_rounds['source'], on_rounds['target']),
+            _pair_keys(old_acquisitions['source'], old_acquisitions['target']),
+            _pair_keys(acquisitions['source'], acquisitions['target']),
+        ]))
+
+        self._apply_details(keys, -1)
+        self._apply_refs(old_investments, old_acquisitions, -1)
+        self.tables['investments'] = _upsert(self.investments, investments, 'id')
+        self.tables['funding_rounds'] = _upsert(self.rounds, rounds, 'funding_round_id')
+        self.tables['acquisitions'] = _upsert(self.acquisitions, acquisitions, 'acquisition_id')
+        self._apply_refs(investments, acquisitions, 1)
+        self._apply_details(keys, 1)
+
+        self.funding_types = {t: c for t, c in self.funding_types.items() if c}
+        self.date_counts = Counter({d: c for d, c in self.date_counts.items() if c})
+        self.watermarks.update(marks)
+        self.save()
+        return {table: len(frame) for table, frame in deltas.items()}
+
+    def metadata(self):
+        """Full-dataset counts, maintained by refresh()."""
+        dates = sorted(self.date_counts)
+        return {
+            'total_edges': len(self.investments) + len(self.acquisitions),
+            'companies': int(np.count_nonzero(self.company_refs)),
+            'investors': int(np.count_nonzero(self.investor_refs)),
+            'funding_types': dict(self.funding_types),
+            'date_range': {'min': dates[0] if dates else None, 'max': dates[-1] if dates else None},
+        }
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        state = {'version': STORE_VERSION, **{name: getattr(self, name) for name in _STATE}}
+        path = os.path.join(self.root, 'store.pkl')
+        with open(f'{path}.tmp', 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+        # A readable copy of the watermarks and aggregates; store.pkl is what gets loaded
+        with open(os.path.join(self.root, 'state.json'), 'w') as f:
+            json.dump({'watermarks': self.watermarks, 'rows': {t: len(f) for t, f in self.tables.items()},
+                       'metadata': self.metadata()}, f, indent=2, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upsert the rows changed since the last refresh into the store')
+    parser.add_argument('--base-path', default=r'c:\PROJECT SNA')
+    parser.add_argument('--rebuild', action='store_true', help='drop the store and load every row again')
+    args = parser.parse_args()
+
+    root = os.path.join(args.base_path, STORE_DIR)
+    if args.rebuild and os.path.isdir(root):
+        shutil.rmtree(root)
+    started = time.perf_counter()
+    store = IncrementalStore(args.base_path)
+    delta = store.refresh()
+    for table, rows in delta.items():
+        print(f"  - {table}: {rows} new or changed rows (watermark {store.watermarks[table]['watermark']})")
+    metadata = store.metadata()
+    print(f"[OK] Store refreshed in {time.perf_counter() - started:.2f}s"
+          f"{'' if delta else ' (no table changed)'}")
+    print(f"  - Edges: {metadata['total_edges']}, companies: {metadata['companies']}, "
+          f"investors: {metadata['investors']}")
+    print(f"  - Date Range: {metadata['date_range']['min']} to {metadata['date_range']['max']}")
+
+
+if __name__ == '__main__':
+    main()
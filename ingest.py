@@ -0,0 +1,242 @@
+"""One-time CSV -> Parquet ingest of the Kaggle tables.
+
+    python ingest.py --base-path "c:\\PROJECT SNA"
+
+Converts every CSV in the dataset directory to typed, column-pruned Parquet
+under "A kaggle dataset/parquet/", one table per worker process, with the
+pyarrow CSV reader. Known tables keep the columns the scripts read (plus ids,
+dates and updated_at) with explicit types; free text such as descriptions and
+source URLs is dropped. Other tables keep every column that is not free text.
+
+manifest.json records the size and mtime of each source CSV. read_ingested()
+returns the Parquet data only while that still matches and the requested
+columns were kept, so a changed CSV or an unknown column falls back to the
+CSV reader instead of returning stale or partial data.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+DATA_DIR = 'A kaggle dataset'
+PARQUET_DIR = 'parquet'
+# Row groups carry min/max statistics, so a filter on updated_at can skip most of a table
+ROW_GROUP_ROWS = 1 << 17
+
+# Kept columns and their Arrow types per known table; dates stay strings as in the CSV
+TABLE_SCHEMAS = {
+    'objects': {
+        'id': 'string', 'entity_type': 'string', 'entity_id': 'int64', 'parent_id': 'string',
+        'name': 'string', 'normalized_name': 'string', 'category_code': 'string', 'status': 'string',
+        'founded_at': 'string', 'closed_at': 'string', 'country_code': 'string', 'state_code': 'string',
+        'city': 'string', 'region': 'string', 'investment_rounds': 'float64', 'invested_companies': 'float64',
+        'funding_rounds': 'float64', 'funding_total_usd': 'float64', 'created_at': 'string', 'updated_at': 'string',
+    },
+    'people': {
+        'id': 'int64', 'object_id': 'string', 'first_name': 'string', 'last_name': 'string',
+        'birthplace': 'string', 'affiliation_name': 'string',
+    },
+    'investments': {
+        'id': 'int64', 'funding_round_id': 'int64', 'funded_object_id': 'string', 'investor_object_id': 'string',
+        'created_at': 'string', 'updated_at': 'string',
+    },
+    'funding_rounds': {
+        'id': 'int64', 'funding_round_id': 'int64', 'object_id': 'string', 'funded_at': 'string',
+        'funding_round_type': 'string', 'funding_round_code': 'string', 'raised_amount_usd': 'float64',
+        'raised_amount': 'float64', 'raised_currency_code': 'string', 'pre_money_valuation_usd': 'float64',
+        'post_money_valuation_usd': 'float64', 'participants': 'float64', 'created_at': 'string',
+        'updated_at': 'string',
+    },
+    'acquisitions': {
+        'id': 'int64', 'acquisition_id': 'int64', 'acquiring_object_id': 'string', 'acquired_object_id': 'string',
+        'term_code': 'string', 'price_amount': 'float64', 'price_currency_code': 'string', 'acquired_at': 'string',
+        'created_at': 'string', 'updated_at': 'string',
+    },
+    'ipos': {
+        'id': 'int64', 'ipo_id': 'int64', 'object_id': 'string', 'valuation_amount': 'float64',
+        'valuation_currency_code': 'string', 'raised_amount': 'float64', 'raised_currency_code': 'string',
+        'public_at': 'string', 'stock_symbol': 'string', 'created_at': 'string', 'updated_at': 'string',
+    },
+    'funds': {
+        'id': 'int64', 'fund_id': 'int64', 'object_id': 'string', 'name': 'string', 'funded_at': 'string',
+        'raised_amount': 'float64', 'raised_currency_code': 'string', 'created_at': 'string', 'updated_at': 'string',
+    },
+}
+
+FREE_TEXT = {'description', 'overview', 'short_description', 'tag_list', 'source_url', 'source_description',
+             'homepage_url', 'logo_url', 'twitter_username', 'permalink', 'domain'}
+
+
+def dataset_dir(base_path):
+    return os.path.join(base_path, DATA_DIR)
+
+
+def parquet_dir(csv_path):
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), PARQUET_DIR)
+
+
+def table_name(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def ingest_table(csv_path, out_dir):
+    """Convert one CSV; runs in a worker process. Returns its manifest entry."""
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    started = time.perf_counter()
+    table = table_name(csv_path)
+    stat = _stat(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    schema = TABLE_SCHEMAS.get(table)
+    if schema is not None:
+        columns = [c for c in header if c in schema]
+        types = {c: getattr(pa, schema[c])() for c in columns}
+    else:
+        columns = [c for c in header if c not in FREE_TEXT]
+        # Dates are kept as text, as the CSV readers of the scripts see them
+        types = {c: pa.string() for c in columns if c.endswith('_at')}
+
+    data = pv.read_csv(
+        csv_path,
+        parse_options=pv.ParseOptions(newlines_in_values=True),
+        convert_options=pv.ConvertOptions(include_columns=columns, column_types=types, strings_can_be_null=True),
+    )
+    path = os.path.join(out_dir, f'{table}.parquet')
+    tmp = f'{path}.tmp'
+    pq.write_table(data, tmp, compression='zstd', row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp, path)
+    return {
+        'table': table,
+        'source': os.path.basename(csv_path),
+        'stat': stat,
+        'rows': data.num_rows,
+        'columns': columns,
+        'types': {field.name: str(field.type) for field in data.schema},
+        'bytes': os.path.getsize(path),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def _load_manifest(out_dir):
+    path = os.path.join(out_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def is_fresh(entry, csv_path):
+    return entry is not None and os.path.exists(csv_path) and entry['stat'] == _stat(csv_path)
+
+
+def ingest(base_path, tables=None, workers=None, force=False):
+    """Convert the dataset CSVs (or only `tables`) whose Parquet is missing or stale."""
+    if not HAS_PYARROW:
+        raise RuntimeError('pyarrow is required for the ingest')
+    source_dir = dataset_dir(base_path)
+    out_dir = os.path.join(source_dir, PARQUET_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest = _load_manifest(out_dir)
+    csv_paths = sorted(os.path.join(source_dir, name) for name in os.listdir(source_dir) if name.endswith('.csv'))
+    if tables:
+        csv_paths = [p for p in csv_paths if table_name(p) in tables]
+    pending = [p for p in csv_paths if force or not is_fresh(manifest.get(table_name(p)), p)]
+    # Largest first, so the biggest table does not start last
+    pending.sort(key=os.path.getsize, reverse=True)
+
+    done = []
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(ingest_table, path, out_dir) for path in pending]
+            for future in as_completed(futures):
+                entry = future.result()
+                manifest[entry['table']] = entry
+                done.append(entry)
+
+    # Tables whose CSV is gone are dropped from the manifest along with their Parquet
+    present = {table_name(p) for p in csv_paths} if not tables else set(manifest)
+    for table in [t for t in manifest if t not in present]:
+        stale = os.path.join(out_dir, f'{table}.parquet')
+        if os.path.exists(stale):
+            os.remove(stale)
+        del manifest[table]
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return done, manifest
+
+
+def _fresh_entry(csv_path, columns=None):
+    entry = _load_manifest(parquet_dir(csv_path)).get(table_name(csv_path))
+    if not is_fresh(entry, csv_path) or not set(columns or ()) <= set(entry['columns']):
+        return None
+    return entry
+
+
+def ingested_path(csv_path, columns=None):
+    """Path of the ingested Parquet of csv_path, or None when it is missing, stale or lacks one of `columns`."""
+    entry = _fresh_entry(csv_path, columns) if HAS_PYARROW else None
+    return os.path.join(parquet_dir(csv_path), f'{entry["table"]}.parquet') if entry else None
+
+
+def read_ingested(csv_path, usecols=None, dtype=None):
+    """The ingested Parquet of csv_path as a DataFrame, or None when it is missing, stale or lacks a column.
+
+    Mirrors pd.read_csv(csv_path, usecols=usecols, dtype=dtype): columns come
+    in file order and dtype is applied on top of the stored types.
+    """
+    if not HAS_PYARROW:
+        return None
+    entry = _fresh_entry(csv_path, usecols)
+    if entry is None:
+        return None
+    columns = None if usecols is None else [c for c in entry['columns'] if c in set(usecols)]
+    frame = pd.read_parquet(os.path.join(parquet_dir(csv_path), f'{entry["table"]}.parquet'), columns=columns)
+    for column, kind in (dtype or {}).items():
+        if column in frame.columns:
+            frame[column] = frame[column].astype(kind)
+    return frame
+
+
+def read_table(csv_path, usecols=None, dtype=None):
+    """Ingested Parquet when available, the CSV otherwise."""
+    frame = read_ingested(csv_path, usecols, dtype)
+    if frame is None:
+        frame = pd.read_csv(csv_path, usecols=usecols, dtype=dtype)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the Kaggle CSVs to typed, column-pruned Parquet')
+    parser.add_argument('--base-path', default=r'c:\PROJECT SNA')
+    parser.add_argument('--tables', nargs='*', help='only these tables (file names without .csv)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='convert even when the Parquet is up to date')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    done, manifest = ingest(args.base_path, args.tables, args.workers, args.force)
+    for entry in sorted(done, key=lambda e: e['table']):
+        print(f"  - {entry['table']}: {entry['rows']} rows, {len(entry['columns'])} columns, "
+              f"{entry['bytes'] / (1024 * 1024):.1f} MB in {entry['seconds']}s")
+    skipped = len(manifest) - len(done)
+    print(f"[OK] Ingested {len(done)} tables in {time.perf_counter() - started:.1f}s"
+          f"{f' ({skipped} up to date)' if skipped else ''}")
+
+
+if __name__ == '__main__':
+    main()
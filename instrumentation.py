@@ -0,0 +1,246 @@
+"""Stage timing and memory instrumentation for the data scripts.
+
+    from instrumentation import instrumented, stage
+
+    @instrumented(rows=len)
+    def build_edge_table(...): ...
+
+    with stage('load_investments') as s:
+        investments = pd.read_csv(path)
+        s.rows = len(investments)
+
+Instrumentation is off by default: stage() then hands back a shared no-op
+context and instrumented() functions cost one flag check per call. When
+enabled, each stage records wall and CPU time, rows, RSS, and with
+trace_memory also the tracemalloc allocation delta and peak. Stages nest; a
+record names its parent. With a profile directory every top-level stage
+also runs under cProfile and dumps <n>-<stage>.prof.
+
+Scripts expose this through add_arguments()/configure_from_args():
+--metrics PATH writes the report, --trace-memory and --profile-dir add to it.
+"""
+import cProfile
+import functools
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+HAS_RESOURCE = importlib.util.find_spec('resource') is not None
+HAS_PSUTIL = importlib.util.find_spec('psutil') is not None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None when it cannot be measured."""
+    if HAS_RESOURCE:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if HAS_PSUTIL:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    return None
+
+
+def rss_mb():
+    """Current resident set size, or None when it cannot be measured."""
+    if HAS_PSUTIL:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _NullStage:
+    # Shared by every stage while instrumentation is off; attribute writes are dropped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self.rows = None
+        self.record = None
+
+    def __enter__(self):
+        recorder = self.recorder
+        self.parent = recorder.stack[-1].name if recorder.stack else None
+        self.depth = len(recorder.stack)
+        recorder.stack.append(self)
+        self.profile = None
+        if recorder.profile_dir and self.depth == 0:
+            self.profile = cProfile.Profile()
+        if recorder.trace_memory:
+            self.child_peak = 0
+            current, peak = tracemalloc.get_traced_memory()
+            # Resetting the peak would hide the parent's peak so far, so hand it up first
+            if self.depth:
+                parent = recorder.stack[-2]
+                parent.child_peak = max(parent.child_peak, peak)
+            self.traced = current
+            tracemalloc.reset_peak()
+        self.rss = rss_mb()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        if self.profile:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile:
+            self.profile.disable()
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        recorder = self.recorder
+        recorder.stack.pop()
+
+        record = {
+            'name': self.name,
+            'parent': self.parent,
+            'depth': self.depth,
+            'seconds': wall,
+            'cpu_seconds': cpu,
+            'rows': self.rows,
+        }
+        rss = rss_mb()
+        if rss is not None and self.rss is not None:
+            record['rss_mb'] = rss
+            record['rss_delta_mb'] = rss - self.rss
+        record['peak_rss_mb'] = peak_rss_mb()
+        if recorder.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self.child_peak)
+            if recorder.stack:
+                recorder.stack[-1].child_peak = max(recorder.stack[-1].child_peak, peak)
+            record['alloc_delta_mb'] = (current - self.traced) / (1024 * 1024)
+            record['alloc_peak_mb'] = (peak - self.traced) / (1024 * 1024)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        if self.profile:
+            os.makedirs(recorder.profile_dir, exist_ok=True)
+            slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.name)
+            path = os.path.join(recorder.profile_dir, f'{len(recorder.records):02d}-{slug}.prof')
+            self.profile.dump_stats(path)
+            record['profile'] = path
+
+        self.record = record
+        recorder.records.append(record)
+        return False
+
+
+class Recorder:
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.profile_dir = None
+        self.records = []
+        self.stack = []
+        self.started = None
+
+
+_recorder = Recorder()
+
+
+def configure(enabled=True, trace_memory=False, profile_dir=None):
+    """Turn instrumentation on (or off) for this process and clear earlier records."""
+    _recorder.enabled = enabled
+    _recorder.trace_memory = enabled and trace_memory
+    _recorder.profile_dir = profile_dir if enabled else None
+    _recorder.records = []
+    _recorder.stack = []
+    _recorder.started = time.perf_counter()
+    if _recorder.trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def enabled():
+    return _recorder.enabled
+
+
+def stage(name):
+    if not _recorder.enabled:
+        return _NULL_STAGE
+    return Stage(_recorder, name)
+
+
+def instrumented(name=None, rows=None):
+    """Decorator form of stage(); `rows` maps the return value to a row count."""
+    def decorate(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _recorder.enabled:
+                return fn(*args, **kwargs)
+            with Stage(_recorder, stage_name) as s:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    s.rows = rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def records():
+    return list(_recorder.records)
+
+
+def report(**extra):
+    """The metrics report of this run as a dict; stages are listed in completion order."""
+    return {
+        'script': os.path.basename(sys.argv[0]) if sys.argv else None,
+        'argv': sys.argv[1:],
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'seconds': time.perf_counter() - _recorder.started if _recorder.started is not None else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'trace_memory': _recorder.trace_memory,
+        'stages': records(),
+        **extra,
+    }
+
+
+def write_report(path, **extra):
+    data = report(**extra)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    return data
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics', metavar='PATH', help='write a stage timing/memory report to PATH')
+    parser.add_argument('--trace-memory', action='store_true', help='add tracemalloc deltas to the report (slower)')
+    parser.add_argument('--profile-dir', metavar='DIR', help='dump a cProfile file per top-level stage')
+
+
+def configure_from_args(args):
+    """Enable instrumentation when any of the add_arguments() flags is set."""
+    if args.metrics or args.trace_memory or args.profile_dir:
+        configure(True, args.trace_memory, args.profile_dir)
+
+
+def finish(args, **extra):
+    """Write the report requested on the command line, if any."""
+    if _recorder.enabled and args.metrics:
+        write_report(args.metrics, **extra)
+        print(f'[OK] Metrics written to {args.metrics}')
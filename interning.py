@@ -0,0 +1,111 @@
+"""Dense int32 codes for Crunchbase object ids.
+
+Object ids are "<prefix>:<number>" strings: "c:26569" (company), "f:316"
+(financial organization), "p:1017" (person). IdTable interns them into
+dense int32 codes in first-seen order. Each code is stored as a prefix enum
+(int8) and its number (int64), so the pipeline carries 4 bytes per endpoint
+instead of a Python string. Node and edge tables hold these codes, and
+decode() turns them back into strings only at export.
+
+Ids that do not follow the pattern (another separator, leading zeros, "nan")
+are kept verbatim in `extra` and still round-trip exactly.
+"""
+import numpy as np
+import pandas as pd
+
+PREFIXES = ('c', 'f', 'p')
+OTHER = -1
+_NUMBER_BITS = 48
+
+
+class IdTable:
+    """Append-only id <-> code mapping; codes are positions in first-seen order."""
+
+    __slots__ = ('prefixes', 'prefix', 'number', 'extra', '_keys')
+
+    def __init__(self):
+        self.prefixes = list(PREFIXES)
+        self.prefix = np.zeros(0, dtype=np.int8)
+        self.number = np.zeros(0, dtype=np.int64)
+        # Verbatim ids that are not <prefix>:<number>; their number is the position here
+        self.extra = []
+        self._keys = pd.Index(np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def _split(self, uniques, add=True):
+        # (prefix code, number) per distinct id; unknown prefixes are added when add=True
+        text = pd.Series(uniques)
+        if not pd.api.types.is_string_dtype(text.dtype):
+            text = text.astype(object)
+        # Only canonical decimals round-trip through int, so "c:007" stays verbatim.
+        # Regex replace and fullmatch run in Arrow on the str dtype, unlike str.partition
+        regular = text.str.fullmatch(r'[^:]+:(0|[1-9][0-9]{0,13})').fillna(False).astype(bool)
+        head = text.str.replace(r':.*', '', regex=True)
+        if add:
+            for name in pd.unique(head[regular]):
+                if name not in self.prefixes:
+                    self.prefixes.append(name)
+        prefix = np.where(regular, pd.Index(self.prefixes).get_indexer(head), OTHER)
+        regular &= prefix >= 0
+        prefix = np.where(regular, prefix, OTHER).astype(np.int8)
+        number = np.zeros(len(text), dtype=np.int64)
+        number[regular.to_numpy()] = text[regular].str.replace(r'^[^:]*:', '', regex=True).astype(np.int64).to_numpy()
+        return prefix, number, text[~regular].tolist(), np.flatnonzero(~regular.to_numpy())
+
+    def _lookup_keys(self, prefix, number, extra, extra_rows):
+        keys = (prefix.astype(np.int64) << _NUMBER_BITS) | number
+        if len(extra_rows):
+            # Verbatim ids get negative keys from their position in `extra`
+            known = pd.Index(self.extra, dtype=object).get_indexer(extra)
+            keys[extra_rows] = np.where(known >= 0, -1 - known, np.iinfo(np.int64).min)
+        return keys
+
+    def encode(self, ids):
+        """int32 code per id, interning ids not seen before (in first-seen order)."""
+        codes, uniques = pd.factorize(pd.Series(ids), use_na_sentinel=False)
+        prefix, number, extra, extra_rows = self._split(uniques)
+        keys = self._lookup_keys(prefix, number, extra, extra_rows)
+        positions = self._keys.get_indexer(keys)
+
+        new = np.flatnonzero(positions < 0)
+        if len(new):
+            is_extra = np.isin(new, extra_rows)
+            new_extra = [uniques[i] for i in new[is_extra]]
+            number[new[is_extra]] = len(self.extra) + np.arange(len(new_extra))
+            keys[new[is_extra]] = -1 - number[new[is_extra]]
+            self.extra.extend(new_extra)
+            positions[new] = len(self) + np.arange(len(new))
+            self.prefix = np.concatenate([self.prefix, prefix[new]])
+            self.number = np.concatenate([self.number, number[new]])
+            self._keys = self._keys.append(pd.Index(keys[new]))
+        return positions[codes].astype(np.int32)
+
+    def lookup(self, ids):
+        """int32 code per id, -1 for ids never interned; the table is not changed."""
+        codes, uniques = pd.factorize(pd.Series(ids), use_na_sentinel=False)
+        prefix, number, extra, extra_rows = self._split(uniques, add=False)
+        keys = self._lookup_keys(prefix, number, extra, extra_rows)
+        return self._keys.get_indexer(keys)[codes].astype(np.int32)
+
+    def kind(self, codes):
+        """Prefix enum per code (index into self.prefixes, OTHER for verbatim ids)."""
+        return self.prefix[np.asarray(codes)]
+
+    def decode(self, codes):
+        """Object array of id strings; each distinct code is formatted once."""
+        codes = np.asarray(codes, dtype=np.int64)
+        distinct, inverse = np.unique(codes, return_inverse=True)
+        prefix = self.prefix[distinct]
+        number = self.number[distinct]
+        names = np.array(self.prefixes + [''], dtype=object)
+        strings = (pd.Series(names[prefix], dtype=object) + ':' + pd.Series(number).astype(str).astype(object))
+        strings = strings.to_numpy(dtype=object, copy=True)
+        verbatim = np.flatnonzero(prefix == OTHER)
+        if len(verbatim):
+            strings[verbatim] = np.array(self.extra, dtype=object)[number[verbatim]]
+        return strings[inverse.reshape(-1)]
+
+    def nbytes(self):
+        return self.prefix.nbytes + self.number.nbytes + self._keys.nbytes
@@ -0,0 +1,145 @@
+"""JSON export stage for the prepare scripts.
+
+Writes compact JSON (no indentation), a columnar variant in which each node
+and edge field is one array instead of a key repeated on every record,
+edge shards partitioned by funding_round_type, and precompressed .gz/.br
+siblings that server.js serves directly when the browser accepts them.
+Brotli output needs the optional `brotli` package and is skipped without it.
+gzip runs at level 6: level 9 is a few percent smaller but several times
+slower, and compression dominated the export of a full build. The prepare
+scripts' --no-compress skips the siblings altogether.
+"""
+import gzip
+import importlib.util
+import json
+import os
+import re
+
+COLUMNAR_FORMAT = 'columnar-v1'
+SHARD_DIR = 'network_shards'
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 9
+
+HAS_BROTLI = importlib.util.find_spec('brotli') is not None
+
+
+class RawJSON(str):
+    """An already-encoded JSON fragment, spliced into a document as-is."""
+
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def dumps_document(items):
+    """Encode an ordered list of (key, value) pairs, passing RawJSON values through.
+
+    Lets a large array be encoded once and shared by several documents.
+    """
+    body = ','.join(f'{dumps(key)}:{value if isinstance(value, RawJSON) else dumps(value)}' for key, value in items)
+    return '{' + body + '}'
+
+
+def _atomic_write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def write_text(path, text, compress=True):
+    """Write `text` to `path` plus .gz (and .br when brotli is installed) siblings.
+
+    Siblings that are not written this time are removed, so server.js never
+    serves a compressed copy of an older export.
+    """
+    data = text.encode('utf-8')
+    _atomic_write(path, data)
+    written = [path]
+    if compress:
+        _atomic_write(f'{path}.gz', gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+        written.append(f'{path}.gz')
+        if HAS_BROTLI:
+            import brotli
+            _atomic_write(f'{path}.br', brotli.compress(data, quality=BROTLI_QUALITY))
+            written.append(f'{path}.br')
+    for sibling in (f'{path}.gz', f'{path}.br'):
+        if sibling not in written and os.path.exists(sibling):
+            os.remove(sibling)
+    return written
+
+
+def write_json(path, value, compress=True):
+    return write_text(path, value if isinstance(value, RawJSON) else dumps(value), compress)
+
+
+def columns(records):
+    """Column arrays for a list of dicts; fields missing from a record become null."""
+    fields = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                fields.append(key)
+    return {
+        'length': len(records),
+        'columns': {field: [record.get(field) for record in records] for field in fields},
+    }
+
+
+def columnar_document(nodes, edges, metadata=None):
+    return {
+        'format': COLUMNAR_FORMAT,
+        'nodes': columns(nodes),
+        'edges': columns(edges),
+        'metadata': metadata or {},
+    }
+
+
+def _slug(value):
+    return re.sub(r'[^a-z0-9]+', '-', str(value).lower()).strip('-') or 'unknown'
+
+
+def write_shards(directory, nodes, edges, key='funding_round_type', compress=True):
+    """Partition edges by `key` into self-contained columnar shards.
+
+    Each shard carries its edges and only the nodes they touch, so a
+    filtered view loads a single file. index.json lists the shards; once it
+    is written, any other file in `directory` (a shard of a value that is
+    gone, or a .gz/.br sibling no longer produced) is removed, since
+    server.js would still serve it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    partitions = {}
+    for edge in edges:
+        value = edge.get(key)
+        partitions.setdefault('unknown' if value is None else value, []).append(edge)
+
+    node_by_id = {}
+    for node in nodes:
+        node_by_id.setdefault(node['id'], node)
+    # Node position by id, so a shard picks its nodes in node order without rescanning them all
+    ordered = list(node_by_id.values())
+    position = {node_id: i for i, node_id in enumerate(node_by_id)}
+
+    index = {'format': COLUMNAR_FORMAT, 'key': key, 'shards': []}
+    written = set()
+    used = set()
+    for value, shard_edges in sorted(partitions.items(), key=lambda item: str(item[0])):
+        slug = _slug(value)
+        while slug in used:
+            slug += '_'
+        used.add(slug)
+        touched = {e['source'] for e in shard_edges} | {e['target'] for e in shard_edges}
+        shard_nodes = [ordered[i] for i in sorted(position[n] for n in touched if n in position)]
+        filename = f'{slug}.json'
+        written.update(write_json(os.path.join(directory, filename),
+                                  columnar_document(shard_nodes, shard_edges, {key: value}), compress))
+        index['shards'].append({'value': value, 'file': filename, 'nodes': len(shard_nodes), 'edges': len(shard_edges)})
+
+    written.update(write_json(os.path.join(directory, 'index.json'), index, compress))
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.path not in written:
+            os.remove(entry.path)
+    return index
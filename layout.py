@@ -0,0 +1,386 @@
+"""Offline force-directed layout of a graph bundle.
+
+Computes x/y per node so the explorer can draw the graph without running a
+simulation in the browser. Forces follow ForceAtlas2: repulsion
+m_i * m_j / d with mass = degree + 1, linear attraction along edges and a
+weak gravity toward the origin.
+
+Repulsion uses a vectorized Barnes-Hut approximation on a quadtree stored as
+one dense grid per level. At each level a node interacts with the centers of
+mass of the cells in its interaction list (children of its parent's
+neighbors that are not its own neighbors); at the finest level the nodes of
+the 3x3 neighboring cells are summed exactly. Every node does O(levels)
+work per iteration, and each level is a handful of whole-array operations.
+
+The initial placement is multilevel: the graph is coarsened by solar merging
+(an independent set of high-degree suns absorbs its neighbors) until it is
+small, the coarsest graph is laid out, then positions are pushed down one level at a
+time and refined. When a previous layout is present and covers most of the
+new nodes, that is skipped: known nodes keep their positions, new nodes start
+at the mean of their placed neighbors and a short low-temperature run
+settles them. Only a layout written for the same graph name is a warm start:
+both prepare scripts share the bundle directory, and one script's layout is
+no prior for the other's graph.
+
+An unchanged graph is not laid out again. layout.json records a content
+digest of the node ids and edges plus the seed and iteration count. When
+they all match, the stored positions are reused as they are. build_id cannot
+serve for this, because it changes on every write.
+
+    layout_ids.npy  S<n>     node ids the positions belong to (kept for the next warm start)
+    layout_xy.npy   float64  (n, 2) positions in bundle node order
+
+layout.json is written last and records the bundle build_id.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from graph_bundle import BUNDLE_DIR, load_bundle, retract_manifest, save_array, write_manifest
+from instrumentation import instrumented
+
+LAYOUT_VERSION = 1
+MAX_LEVELS = 10
+LEAF_SIZE = 4
+BLOCK = 65536
+COARSEST = 50
+ITERATIONS = 60
+COARSE_ITERATIONS = 250
+WARM_ITERATIONS = 30
+WARM_FRACTION = 0.5
+GRAVITY = 1.0
+SCALING = 2.0
+
+
+def _interaction_offsets():
+    # The interaction list depends only on the parity of a cell: children of the parent's
+    # 3x3 neighborhood (a 6x6 block) minus the cell's own 3x3 neighborhood, 27 cells
+    offsets = np.zeros((2, 2, 2, 27), dtype=np.int64)
+    for px in (0, 1):
+        for py in (0, 1):
+            cells = [(dx, dy) for dx in range(-2 - px, 4 - px) for dy in range(-2 - py, 4 - py)
+                     if max(abs(dx), abs(dy)) > 1]
+            offsets[:, px, py] = np.array(cells).T
+    return offsets
+
+
+_OFFSETS = _interaction_offsets()
+_PAD = 3
+
+
+def repulsion(pos, mass, scaling=SCALING):
+    """Approximate sum over j of scaling * m_i * m_j * (p_i - p_j) / |p_i - p_j|^2."""
+    n = len(pos)
+    force = np.zeros_like(pos)
+    if n < 2:
+        return force
+
+    lo = pos.min(axis=0)
+    span = max(float((pos.max(axis=0) - lo).max()), 1e-9)
+    unit = (pos - lo) / span * (1 - 1e-9)
+    levels = int(np.clip(np.ceil(np.log(max(n / LEAF_SIZE, 1)) / np.log(4)), 2, MAX_LEVELS))
+
+    for level in range(2, levels + 1):
+        side = 1 << level
+        cx = (unit[:, 0] * side).astype(np.int64)
+        cy = (unit[:, 1] * side).astype(np.int64)
+        cell = cx * side + cy
+
+        # Cell masses and centers on a grid padded with empty cells, so lists need no bounds checks
+        padded = side + 2 * _PAD
+        grid = (cx + _PAD) * padded + (cy + _PAD)
+        cell_mass = np.bincount(grid, mass, minlength=padded * padded)
+        occupied = cell_mass > 0
+        com_x = np.zeros(padded * padded)
+        com_y = np.zeros(padded * padded)
+        com_x[occupied] = np.bincount(grid, mass * pos[:, 0], minlength=padded * padded)[occupied] / cell_mass[occupied]
+        com_y[occupied] = np.bincount(grid, mass * pos[:, 1], minlength=padded * padded)[occupied] / cell_mass[occupied]
+        shifts = _OFFSETS[0] * padded + _OFFSETS[1]
+
+        for start in range(0, n, BLOCK):
+            block = slice(start, start + BLOCK)
+            target = grid[block, None] + shifts[cx[block] & 1, cy[block] & 1]
+            m = cell_mass[target]
+            dx = pos[block, 0, None] - com_x[target]
+            dy = pos[block, 1, None] - com_y[target]
+            factor = m / np.maximum(dx * dx + dy * dy, 1e-9)
+            force[block, 0] += (factor * dx).sum(axis=1)
+            force[block, 1] += (factor * dy).sum(axis=1)
+
+    # Near field: exact pairs between nodes of neighboring cells at the finest level
+    order = np.argsort(cell, kind='stable')
+    sorted_cells = cell[order]
+    for ox in (-1, 0, 1):
+        for oy in (-1, 0, 1):
+            tx, ty = cx + ox, cy + oy
+            inside = (tx >= 0) & (tx < side) & (ty >= 0) & (ty < side)
+            target = tx * side + ty
+            first = np.searchsorted(sorted_cells, target, side='left')
+            last = np.searchsorted(sorted_cells, target, side='right')
+            counts = np.where(inside, last - first, 0)
+            i = np.repeat(np.arange(n), counts)
+            j = order[np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+            keep = i != j
+            i, j = i[keep], j[keep]
+            dx = pos[i, 0] - pos[j, 0]
+            dy = pos[i, 1] - pos[j, 1]
+            factor = mass[j] / np.maximum(dx * dx + dy * dy, 1e-9)
+            force[:, 0] += np.bincount(i, factor * dx, minlength=n)
+            force[:, 1] += np.bincount(i, factor * dy, minlength=n)
+
+    return force * (scaling * mass)[:, None]
+
+
+def attraction(pos, src, dst, weight=None):
+    n = len(pos)
+    delta = pos[dst] - pos[src]
+    if weight is not None:
+        delta = delta * weight[:, None]
+    force = np.empty_like(pos)
+    for axis in range(2):
+        force[:, axis] = np.bincount(src, delta[:, axis], minlength=n) - np.bincount(dst, delta[:, axis], minlength=n)
+    return force
+
+
+def relax(pos, src, dst, mass, iterations, temperature, weight=None, final_temperature=None):
+    """Move nodes along the net force, each step capped by a geometrically cooling temperature."""
+    final_temperature = final_temperature if final_temperature is not None else temperature / 50
+    cooling = (final_temperature / temperature) ** (1 / max(iterations - 1, 1))
+    for _ in range(iterations):
+        force = repulsion(pos, mass) + attraction(pos, src, dst, weight) - GRAVITY * mass[:, None] * pos
+        step = force / mass[:, None]
+        length = np.sqrt((step * step).sum(axis=1))
+        pos += step * (np.minimum(length, temperature) / np.maximum(length, 1e-12))[:, None]
+        temperature *= cooling
+    return pos
+
+
+def coarsen(src, dst, n, rng, rounds=8):
+    """Node -> coarse node mapping by solar merging.
+
+    Suns form a maximal independent set chosen by degree (ties broken at
+    random), found with a few vectorized Luby rounds; every other node joins
+    an adjacent sun, so a hub swallows its leaves in one step.
+    """
+    degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+    loop = src != dst
+    a = np.concatenate([src[loop], dst[loop]])
+    b = np.concatenate([dst[loop], src[loop]])
+    priority = degree + rng.random(n)
+
+    SUN, PLANET = 1, 2
+    state = np.zeros(n, dtype=np.int8)
+    for _ in range(rounds):
+        open_edge = state[b] == 0
+        best = np.full(n, -1.0)
+        np.maximum.at(best, a[open_edge], priority[b[open_edge]])
+        undecided = state == 0
+        state[undecided & (priority > best)] = SUN
+        near_sun = np.bincount(a, weights=state[b] == SUN, minlength=n) > 0
+        state[(state == 0) & near_sun] = PLANET
+        if not (state == 0).any():
+            break
+    state[state == 0] = SUN
+
+    rep = np.arange(n)
+    joins = (state[a] == PLANET) & (state[b] == SUN)
+    rep[a[joins]] = b[joins]
+    # Isolated nodes have nothing to join; grouping them keeps them from stalling the coarsening
+    isolated = np.flatnonzero(degree == 0)
+    rep[isolated] = isolated[np.arange(len(isolated)) // 4 * 4]
+    _, mapping = np.unique(rep, return_inverse=True)
+    return mapping.astype(np.int64), int(mapping.max()) + 1 if n else 0
+
+
+def _coarse_graph(src, dst, mapping, count):
+    s, t = mapping[src], mapping[dst]
+    keep = s != t
+    key = np.unique(np.minimum(s, t)[keep] * count + np.maximum(s, t)[keep], return_counts=True)
+    return key[0] // count, key[0] % count, key[1].astype(np.float64)
+
+
+def multilevel_layout(src, dst, n, mass, rng, iterations=ITERATIONS):
+    """Layout from scratch: coarsen, lay out the coarsest graph, then refine level by level."""
+    hierarchy = []
+    cur_src, cur_dst, cur_n, cur_mass, cur_weight = src, dst, n, mass, None
+    while cur_n > COARSEST and len(hierarchy) < 40:
+        mapping, count = coarsen(cur_src, cur_dst, cur_n, rng)
+        if count > 0.9 * cur_n:
+            break
+        hierarchy.append((cur_src, cur_dst, cur_n, cur_mass, cur_weight, mapping))
+        cur_src, cur_dst, cur_weight = _coarse_graph(cur_src, cur_dst, mapping, count)
+        cur_mass = np.bincount(mapping, cur_mass, minlength=count)
+        cur_n = count
+
+    spread = np.sqrt(cur_mass.sum())
+    pos = rng.uniform(-spread, spread, size=(cur_n, 2))
+    pos = relax(pos, cur_src, cur_dst, cur_mass, COARSE_ITERATIONS, spread, cur_weight)
+
+    for level_src, level_dst, level_n, level_mass, level_weight, mapping in reversed(hierarchy):
+        extent = float(np.ptp(pos, axis=0).max()) if len(pos) > 1 else 1.0
+        jitter = extent / np.sqrt(level_n) * 0.1
+        pos = pos[mapping] + rng.normal(scale=jitter, size=(level_n, 2))
+        pos = relax(pos, level_src, level_dst, level_mass, iterations, extent * 0.05, level_weight)
+    return pos
+
+
+def warm_positions(previous, src, dst, n, rng):
+    """Positions for the current nodes from previous (NaN rows for new nodes); new nodes start next to their neighbors."""
+    pos = previous.copy()
+    fresh = np.isnan(previous[:, 0])
+    known = ~fresh
+    for _ in range(3):
+        # Average of the placed neighbors, pushed out one hop per pass
+        usable_s = known[src] & ~known[dst]
+        usable_d = known[dst] & ~known[src]
+        targets = np.concatenate([dst[usable_s], src[usable_d]])
+        sources = np.concatenate([src[usable_s], dst[usable_d]])
+        if not len(targets):
+            break
+        counts = np.bincount(targets, minlength=n)
+        placed = np.flatnonzero(counts)
+        for axis in range(2):
+            total = np.bincount(targets, pos[sources, axis], minlength=n)
+            pos[placed, axis] = total[placed] / counts[placed]
+        known[placed] = True
+
+    extent = float(np.ptp(pos[known], axis=0).max()) if known.sum() > 1 else 1.0
+    jitter = extent / np.sqrt(max(n, 1)) * 0.1
+    pos[fresh] += rng.normal(scale=jitter, size=(int(fresh.sum()), 2))
+    unplaced = ~known
+    center = pos[known].mean(axis=0) if known.any() else np.zeros(2)
+    pos[unplaced] = center + rng.normal(scale=extent / 4, size=(int(unplaced.sum()), 2))
+    return pos
+
+
+def compute_layout(bundle, previous=None, seed=42, iterations=ITERATIONS):
+    """(n, 2) positions for the bundle; previous maps node id -> (x, y) for a warm start.
+
+    iterations is the number of refinement steps per level; a warm start runs
+    WARM_ITERATIONS / ITERATIONS of it. Returns (positions, warm) where warm
+    tells whether the previous layout was reused.
+    """
+    n = bundle.node_count
+    rng = np.random.default_rng(seed)
+    src = np.asarray(bundle.edge_src, dtype=np.int64)
+    dst = np.asarray(bundle.edge_dst, dtype=np.int64)
+    mass = bundle.degree().astype(np.float64) + 1
+    if n == 0:
+        return np.zeros((0, 2)), False
+
+    prior = None
+    if previous is not None:
+        ids, xy = previous
+        found = pd.Index(ids).get_indexer([bytes(i) for i in bundle.node_ids])
+        if (found >= 0).mean() >= WARM_FRACTION:
+            prior = np.where((found >= 0)[:, None], xy[np.maximum(found, 0)], np.nan)
+
+    if prior is None:
+        return multilevel_layout(src, dst, n, mass, rng, iterations), False
+
+    pos = warm_positions(prior, src, dst, n, rng)
+    extent = float(np.ptp(pos, axis=0).max()) if n > 1 else 1.0
+    warm_iterations = max(1, iterations * WARM_ITERATIONS // ITERATIONS)
+    return relax(pos, src, dst, mass, warm_iterations, extent * 0.01), True
+
+
+def graph_digest(bundle):
+    """Content hash of the bundle's node ids and edges; unlike build_id it survives an identical rebuild."""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in ('node_ids', 'edge_src', 'edge_dst'):
+        array = np.ascontiguousarray(getattr(bundle, name))
+        digest.update(array.dtype.str.encode('ascii'))
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def load_layout(bundle_path, graph=None):
+    """(ids, xy) of the layout last written to bundle_path, or None.
+
+    With graph set, a layout written for another graph name counts as absent.
+    """
+    try:
+        with open(os.path.join(bundle_path, 'layout.json')) as f:
+            manifest = json.load(f)
+        if graph is not None and manifest.get('graph') != graph:
+            return None
+        ids = np.load(os.path.join(bundle_path, 'layout_ids.npy'))
+        xy = np.load(os.path.join(bundle_path, 'layout_xy.npy'))
+    except (FileNotFoundError, ValueError):
+        return None
+    return ids, xy
+
+
+@instrumented(name='layout', rows=lambda layout: len(layout[1]))
+def write_layout(bundle_path=BUNDLE_DIR, seed=42, warm_start=True, iterations=ITERATIONS, graph=None):
+    """Lay out the bundle at bundle_path and save the result; returns (manifest, positions).
+
+    graph names the graph being laid out (the prepare scripts pass their own
+    name); only a previous layout of the same name is reused or warm-started from.
+    """
+    started = time.perf_counter()
+    bundle = load_bundle(bundle_path)
+    digest = graph_digest(bundle)
+    previous = load_layout(bundle_path, graph) if warm_start else None
+    reused = False
+    if previous is not None:
+        with open(os.path.join(bundle_path, 'layout.json')) as f:
+            last = json.load(f)
+        reused = (last.get('digest'), last.get('seed'), last.get('iterations')) == (digest, seed, iterations)
+    if reused:
+        positions, warm = previous[1], last['warm_start']
+    else:
+        positions, warm = compute_layout(bundle, previous, seed, iterations)
+
+    retract_manifest(os.path.join(bundle_path, 'layout.json'))
+    save_array(os.path.join(bundle_path, 'layout_ids.npy'), np.asarray(bundle.node_ids))
+    save_array(os.path.join(bundle_path, 'layout_xy.npy'), positions)
+    manifest = {
+        'version': LAYOUT_VERSION,
+        'build_id': bundle.build_id,
+        'nodes': bundle.node_count,
+        'warm_start': warm,
+        'reused': reused,
+        'graph': graph,
+        'digest': digest,
+        'seed': seed,
+        'iterations': iterations,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    write_manifest(os.path.join(bundle_path, 'layout.json'), manifest)
+    return manifest, positions
+
+
+def attach_positions(nodes, bundle_path, positions):
+    """Set rounded x/y on node dicts in place, matching them to the bundle by id."""
+    bundle = load_bundle(bundle_path)
+    index = pd.Index([i.decode('utf-8') for i in bundle.node_ids])
+    found = index.get_indexer([str(n['id']) for n in nodes])
+    rounded = np.round(positions, 2).tolist()
+    for node, k in zip(nodes, found.tolist()):
+        if k >= 0:
+            node['x'], node['y'] = rounded[k]
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute the force-directed layout of a graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=ITERATIONS, help='refinement steps per level')
+    parser.add_argument('--graph', default=None, help='graph name; only a layout of the same name is reused')
+    parser.add_argument('--cold', action='store_true', help='ignore the previous layout')
+    args = parser.parse_args()
+
+    manifest, _ = write_layout(args.bundle, args.seed, not args.cold, args.iterations, args.graph)
+    start = 'reused' if manifest['reused'] else 'warm start' if manifest['warm_start'] else 'multilevel'
+    print(f"[OK] Layout of {manifest['nodes']} nodes written to {args.bundle} ({start}, {manifest['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
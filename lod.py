@@ -0,0 +1,398 @@
+"""Level-of-detail hierarchy of super-nodes over a graph bundle.
+
+Level 0 is the bundle itself. Each further level groups the nodes of the
+level below into super-nodes: the Louvain levels first (every Louvain pass
+already collapses communities into super-nodes with summed edge weights),
+then, while the top is still larger than max_top, a packing level in which
+the largest clusters stay on their own and the rest join the kept cluster
+they are most connected to, or a size-ordered bucket when they have none
+(disconnected components never merge under Louvain).
+
+Stored in the bundle directory, one archive per level k >= 1:
+
+    lod_level_<k>.npz
+        parent            int32   node of level k - 1 -> super-node of level k
+        child_offsets     int64   super-node s owns child_ids[child_offsets[s]:child_offsets[s + 1]]
+        child_ids         int32   children (nodes of level k - 1), sorted
+        src, dst, weight          edges between different super-nodes, weights summed
+        size              int64   original nodes inside each super-node
+        internal          float64 edge weight inside each super-node
+        type_counts       int64   (n, node types) original nodes per type
+        hub               int32   highest-degree original node inside, names the super-node
+        x, y              float64 size-weighted centroid of the layout (NaN without a layout)
+    lod_level_0.npz       label (node names) for expanding the first level
+
+lod.json is written last and records the bundle build_id, plus the graph
+digest (layout.graph_digest), seed and max_top the hierarchy was built
+with. When a rebuild finds them unchanged, it reuses the stored parent arrays
+instead of running Louvain again. Names, positions and the exports are still
+refreshed. The explorer gets
+one compact columnar graph per level under network_lod/ (level_<k>.json,
+plus index.json) and asks for children with expand() on demand.
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from communities import louvain_levels
+from filter_index import postings
+from graph_bundle import BUNDLE_DIR, load_bundle, retract_manifest, write_atomic, write_manifest
+from instrumentation import instrumented
+from json_export import write_json
+from layout import graph_digest, load_layout
+
+LOD_VERSION = 1
+LOD_DIR = 'network_lod'
+MAX_TOP = 300
+MIN_SHRINK = 0.9
+LOD_FORMAT = 'lod-v1'
+
+
+def aggregate_edges(src, dst, weight, parent):
+    """Edges of the level above: (src, dst, weight) between distinct parents and the internal weight per parent."""
+    count = int(parent.max()) + 1 if len(parent) else 0
+    a, b = parent[src], parent[dst]
+    inside = a == b
+    internal = np.bincount(a[inside], weights=weight[inside], minlength=count)
+    low, high = np.minimum(a, b)[~inside], np.maximum(a, b)[~inside]
+    keys, inverse = np.unique(low * max(count, 1) + high, return_inverse=True)
+    return keys // max(count, 1), keys % max(count, 1), np.bincount(inverse, weights=weight[~inside]), internal
+
+
+def pack_level(size, src, dst, weight, max_top=MAX_TOP):
+    """Parent array grouping the nodes of an oversized top level into at most max_top groups."""
+    count = len(size)
+    keep_count = max_top // 2
+    kept = np.argsort(-size, kind='stable')[:keep_count]
+    is_kept = np.zeros(count, dtype=bool)
+    is_kept[kept] = True
+    parent = np.full(count, -1, dtype=np.int64)
+    parent[kept] = np.arange(len(kept))
+
+    # A leftover cluster joins the kept cluster it shares the most weight with
+    a = np.concatenate([src, dst])
+    b = np.concatenate([dst, src])
+    w = np.concatenate([weight, weight])
+    link = ~is_kept[a] & is_kept[b]
+    a, b, w = a[link], b[link], w[link]
+    order = np.lexsort((-w, a))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = a[order][1:] != a[order][:-1]
+    parent[a[order][first]] = parent[b[order][first]]
+
+    # The rest fill buckets of similar size
+    rest = np.flatnonzero(parent < 0)
+    rest = rest[np.argsort(-size[rest], kind='stable')]
+    buckets = max(max_top - len(kept), 1)
+    per_bucket = -(-len(rest) // buckets) if len(rest) else 1
+    parent[rest] = len(kept) + np.arange(len(rest)) // per_bucket
+    return parent
+
+
+def build_hierarchy(bundle, seed=42, max_top=MAX_TOP):
+    """List of parent arrays; parents[k] maps level-k nodes to level k + 1."""
+    src = np.asarray(bundle.edge_src, dtype=np.int64)
+    dst = np.asarray(bundle.edge_dst, dtype=np.int64)
+    weight = np.ones(len(src))
+    size = np.ones(bundle.node_count, dtype=np.int64)
+    parents = []
+    for parent in louvain_levels(src, dst, bundle.node_count, seed=seed):
+        # A pass that barely shrinks the graph is folded into the level below rather than exported
+        if parents and parent.max() + 1 > MIN_SHRINK * len(size):
+            parents[-1] = parent[parents[-1]]
+        else:
+            parents.append(parent)
+        size = np.bincount(parent, weights=size).astype(np.int64)
+        src, dst, weight, _ = aggregate_edges(src, dst, weight, parent)
+    while len(size) > max_top:
+        parent = pack_level(size, src, dst, weight, max_top)
+        parents.append(parent)
+        size = np.bincount(parent, weights=size).astype(np.int64)
+        src, dst, weight, _ = aggregate_edges(src, dst, weight, parent)
+    return parents
+
+
+def _stored_parents(bundle_path, digest, seed, max_top):
+    """Parent arrays of the hierarchy in bundle_path if it was built for the same graph and settings, else None."""
+    try:
+        with open(os.path.join(bundle_path, 'lod.json')) as f:
+            manifest = json.load(f)
+        if (manifest.get('digest'), manifest.get('seed'), manifest.get('max_top')) != (digest, seed, max_top):
+            return None
+        parents = []
+        for k in range(1, len(manifest['levels'])):
+            with np.load(os.path.join(bundle_path, f'lod_level_{k}.npz')) as archive:
+                parents.append(archive['parent'].astype(np.int64))
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+    return parents
+
+
+def _centroid(parent, count, weights, values):
+    total = np.bincount(parent, weights=weights, minlength=count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.bincount(parent, weights=weights * values, minlength=count) / total
+
+
+@instrumented(name='lod', rows=lambda manifest: len(manifest['levels']))
+def write_lod(bundle_path=BUNDLE_DIR, node_ids=None, names=None, export_dir=None, seed=42, max_top=MAX_TOP,
+              compress=True):
+    """Build and store the hierarchy; with export_dir also write the per-level JSON graphs.
+
+    names are aligned with node_ids, as for write_search_index.
+    """
+    bundle = load_bundle(bundle_path)
+    n = bundle.node_count
+    digest = graph_digest(bundle)
+    parents = _stored_parents(bundle_path, digest, seed, max_top)
+    reused = parents is not None
+    if not reused:
+        parents = build_hierarchy(bundle, seed, max_top)
+    ids = pd.Index([i.decode('utf-8') for i in bundle.node_ids])
+    labels = ids.to_numpy(dtype=object).copy()
+    if names is not None:
+        named = pd.Series(list(names), index=pd.Index(pd.Series(node_ids, dtype=object).astype(str)), dtype=object)
+        named = named[~named.index.duplicated(keep='first')].reindex(ids)
+        labels = np.where(named.notna().to_numpy(), named.to_numpy(dtype=object), labels)
+    retract_manifest(os.path.join(bundle_path, 'lod.json'))
+    write_atomic(os.path.join(bundle_path, 'lod_level_0.npz'), lambda f: np.savez(f, label=labels.astype(str)))
+
+    degree = bundle.degree()
+    node_types = bundle.manifest['node_types']
+    layout = load_layout(bundle_path)
+    if layout is not None and len(layout[1]) == n and np.array_equal(layout[0], np.asarray(bundle.node_ids)):
+        x, y = layout[1][:, 0], layout[1][:, 1]
+    else:
+        x = y = np.full(n, np.nan)
+
+    src = np.asarray(bundle.edge_src, dtype=np.int64)
+    dst = np.asarray(bundle.edge_dst, dtype=np.int64)
+    weight = np.ones(len(src))
+    size = np.ones(n, dtype=np.int64)
+    type_counts = np.zeros((n, len(node_types)), dtype=np.int64)
+    type_counts[np.arange(n), np.asarray(bundle.node_type)] = 1
+    hub = np.arange(n, dtype=np.int64)
+    internal = np.zeros(n)
+
+    levels = [{'level': 0, 'nodes': n, 'edges': bundle.edge_count}]
+    for k, parent in enumerate(parents, start=1):
+        count = int(parent.max()) + 1
+        child_offsets, child_ids = postings(parent, count)
+        src, dst, weight, collapsed = aggregate_edges(src, dst, weight, parent)
+        internal = np.bincount(parent, weights=internal, minlength=count) + collapsed
+        x = _centroid(parent, count, size.astype(np.float64), x)
+        y = _centroid(parent, count, size.astype(np.float64), y)
+        size = np.bincount(parent, weights=size, minlength=count).astype(np.int64)
+        type_counts = np.stack([np.bincount(parent, weights=type_counts[:, t], minlength=count)
+                                for t in range(len(node_types))], axis=1).astype(np.int64)
+        # Children sorted by the degree of their hubs; the first of each group names the parent
+        order = np.lexsort((-degree[hub], parent))
+        starts = np.searchsorted(parent[order], np.arange(count))
+        hub = hub[order[starts]]
+
+        arrays = dict(parent=parent.astype(np.int32), child_offsets=child_offsets, child_ids=child_ids,
+                      src=src.astype(np.int32), dst=dst.astype(np.int32), weight=weight,
+                      size=size, internal=internal, type_counts=type_counts, hub=hub.astype(np.int32), x=x, y=y)
+        write_atomic(os.path.join(bundle_path, f'lod_level_{k}.npz'), lambda f: np.savez(f, **arrays))
+        levels.append({'level': k, 'nodes': count, 'edges': len(src)})
+
+    manifest = {
+        'version': LOD_VERSION,
+        'build_id': bundle.build_id,
+        'digest': digest,
+        'seed': seed,
+        'max_top': max_top,
+        'reused': reused,
+        'node_types': node_types,
+        'levels': levels,
+    }
+    write_manifest(os.path.join(bundle_path, 'lod.json'), manifest)
+
+    if export_dir:
+        write_lod_exports(LodIndex(bundle), export_dir, compress)
+    return manifest
+
+
+def _rounded(values):
+    return [None if v != v else round(v, 2) for v in np.asarray(values, dtype=np.float64).tolist()]
+
+
+class LodIndex:
+    """Read side of the hierarchy: per-level graphs and super-node expansion."""
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        with open(os.path.join(bundle.path, 'lod.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('build_id') != bundle.build_id:
+            raise ValueError(f'LOD hierarchy in {bundle.path} is stale; rebuild it with lod.py')
+        self.levels = []
+        for k in range(len(self.manifest['levels'])):
+            with np.load(os.path.join(bundle.path, f'lod_level_{k}.npz')) as archive:
+                self.levels.append({name: archive[name] for name in archive.files})
+        layout = load_layout(bundle.path)
+        self.positions = layout[1] if layout is not None and len(layout[1]) == bundle.node_count else None
+
+    @property
+    def top(self):
+        return len(self.levels) - 1
+
+    def labels(self):
+        return self.levels[0]['label']
+
+    def level_nodes(self, k, nodes=None):
+        """Columns describing nodes of level k (all of them, or the given indexes)."""
+        node_types = self.manifest['node_types']
+        if k == 0:
+            nodes = np.arange(self.bundle.node_count) if nodes is None else np.asarray(nodes)
+            types = np.asarray(self.bundle.node_type)[nodes]
+            columns = {
+                'id': [self.bundle.node_id(i) for i in nodes.tolist()],
+                'label': self.labels()[nodes].tolist(),
+                'type': [node_types[t] for t in types.tolist()],
+                'size': [1] * len(nodes),
+                'degree': self.bundle.degree()[nodes].tolist(),
+            }
+            if self.positions is not None:
+                columns['x'] = _rounded(self.positions[nodes, 0])
+                columns['y'] = _rounded(self.positions[nodes, 1])
+            return columns
+
+        level = self.levels[k]
+        nodes = np.arange(len(level['size'])) if nodes is None else np.asarray(nodes)
+        hubs = level['hub'][nodes]
+        offsets = level['child_offsets']
+        columns = {
+            'id': nodes.tolist(),
+            'label': self.labels()[hubs].tolist(),
+            'hub': [self.bundle.node_id(i) for i in hubs.tolist()],
+            'size': level['size'][nodes].tolist(),
+            'children': (offsets[nodes + 1] - offsets[nodes]).tolist(),
+            'internal_weight': level['internal'][nodes].tolist(),
+        }
+        for t, name in enumerate(node_types):
+            columns[f'{name}_count'] = level['type_counts'][nodes, t].tolist()
+        columns['x'] = _rounded(level['x'][nodes])
+        columns['y'] = _rounded(level['y'][nodes])
+        return columns
+
+    def level_edges(self, k):
+        if k == 0:
+            return (np.asarray(self.bundle.edge_src), np.asarray(self.bundle.edge_dst),
+                    np.ones(self.bundle.edge_count))
+        level = self.levels[k]
+        return level['src'], level['dst'], level['weight']
+
+    def level_graph(self, k):
+        """One level as a compact columnar graph; edges refer to node positions."""
+        if not 0 < k <= self.top:
+            raise ValueError(f'Level must be between 1 and {self.top}')
+        src, dst, weight = self.level_edges(k)
+        return {
+            'format': LOD_FORMAT,
+            'level': k,
+            'levels': self.top,
+            'build_id': self.bundle.build_id,
+            'nodes': {'length': len(self.levels[k]['size']), 'columns': self.level_nodes(k)},
+            'edges': {'length': len(src), 'columns': {
+                'source': src.tolist(), 'target': dst.tolist(), 'weight': weight.tolist()}},
+        }
+
+    def expand(self, k, node):
+        """Children of super-node `node` of level k (nodes of level k - 1) with the edges among them.
+
+        Edges from a child to the rest of the graph are summed per super-node
+        of level k, so the expanded children can be wired into the level k view.
+        """
+        if not 0 < k <= self.top:
+            raise ValueError(f'Level must be between 1 and {self.top}')
+        level = self.levels[k]
+        if not 0 <= node < len(level['size']):
+            raise ValueError(f'Level {k} has no node {node}')
+        children = level['child_ids'][level['child_offsets'][node]:level['child_offsets'][node + 1]]
+
+        src, dst, weight = self.level_edges(k - 1)
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        member = np.zeros(len(level['parent']), dtype=bool)
+        member[children] = True
+        inner = member[src] & member[dst]
+        crossing = member[src] ^ member[dst]
+
+        # Crossing edges: child -> neighboring super-node of level k, weights summed
+        child = np.where(member[src], src, dst)[crossing]
+        other = level['parent'][np.where(member[src], dst, src)[crossing]].astype(np.int64)
+        count = len(level['size'])
+        keys, inverse = np.unique(child * count + other, return_inverse=True)
+        outer_weight = np.bincount(inverse, weights=weight[crossing])
+
+        columns = self.level_nodes(k - 1, children)
+        position = dict(zip(children.tolist(), columns['id']))
+        return {
+            'level': k - 1,
+            'parent': {'level': k, 'id': int(node)},
+            'nodes': {'length': len(children), 'columns': columns},
+            'edges': {'length': int(inner.sum()), 'columns': {
+                'source': [position[i] for i in src[inner].tolist()],
+                'target': [position[i] for i in dst[inner].tolist()],
+                'weight': weight[inner].tolist()}},
+            'external': {'length': len(keys), 'columns': {
+                'source': [position[i] for i in (keys // count).tolist()],
+                'target': (keys % count).tolist(),
+                'weight': outer_weight.tolist()}},
+        }
+
+
+def write_lod_exports(index, export_dir=LOD_DIR, compress=True):
+    """level_<k>.json for every level above 0 plus index.json describing them."""
+    os.makedirs(export_dir, exist_ok=True)
+    # Drop levels of an earlier, deeper hierarchy
+    for name in os.listdir(export_dir):
+        match = re.match(r'level_(\d+)\.json', name)
+        if match and int(match.group(1)) > index.top:
+            os.remove(os.path.join(export_dir, name))
+    levels = []
+    for k in range(1, index.top + 1):
+        name = f'level_{k}.json'
+        write_json(os.path.join(export_dir, name), index.level_graph(k), compress)
+        levels.append({**index.manifest['levels'][k], 'file': name})
+    write_json(os.path.join(export_dir, 'index.json'), {
+        'format': LOD_FORMAT,
+        'build_id': index.bundle.build_id,
+        'base': {**index.manifest['levels'][0], 'file': 'network_data.json'},
+        'levels': levels,
+        'top': index.top,
+    }, compress)
+
+
+def load_lod_index(bundle=None):
+    return LodIndex(bundle if bundle is not None else load_bundle(BUNDLE_DIR))
+
+
+def _names_from_export(path):
+    with open(path) as f:
+        nodes = json.load(f)['nodes']
+    return [n['id'] for n in nodes], [n.get('name') for n in nodes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the level-of-detail hierarchy of a graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--nodes', default='network_data.json', help='export to take node names from')
+    parser.add_argument('--out', default=LOD_DIR, help='directory for the per-level JSON graphs')
+    parser.add_argument('--max-top', type=int, default=MAX_TOP, help='most super-nodes on the top level')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    node_ids, names = _names_from_export(args.nodes) if os.path.exists(args.nodes) else (None, None)
+    manifest = write_lod(args.bundle, node_ids, names, args.out, args.seed, args.max_top)
+    print(f"[OK] LOD hierarchy written to {args.bundle} and {args.out}/")
+    for level in manifest['levels']:
+        print(f"  - Level {level['level']}: {level['nodes']} nodes, {level['edges']} edges")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Bounded path queries over the CSR graph bundle.
+
+Replaces the exponential findAllPaths of /api/analysis/pathways with a
+bidirectional BFS for the shortest path and Yen's algorithm for the top-k
+simple paths. Paths are produced lazily and the number of results is hard
+capped, so a query between two hubs costs at most k * depth BFS runs.
+
+    python pathways.py f:17 c:26569 --k 10
+"""
+import argparse
+import heapq
+import itertools
+import json
+
+import numpy as np
+
+from graph_bundle import BUNDLE_DIR, load_bundle
+
+DEFAULT_K = 10
+MAX_DEPTH = 5
+
+
+def _expand(indptr, frontier):
+    # (owner, neighbor slot) pairs for every node in the frontier
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    owners = np.repeat(frontier, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+
+class PathEngine:
+    """Path queries on node indices of a GraphBundle (or any indptr/indices pair)."""
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.node_count = len(self.indptr) - 1
+        self._degree = np.diff(self.indptr)
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        return cls(bundle.indptr, bundle.indices)
+
+    def shortest_path(self, source, target, blocked=None, skip_first=(), max_depth=None):
+        """Bidirectional BFS; returns a list of node indices or None.
+
+        `blocked` is a boolean mask of nodes that may not be visited and
+        `skip_first` a collection of neighbors of `source` whose edge from
+        `source` may not be used (Yen's removed edges).
+        """
+        if source == target:
+            return [source]
+        n = self.node_count
+        dist = [np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32)]
+        parent = [np.full(n, -1, dtype=np.int64), np.full(n, -1, dtype=np.int64)]
+        dist[0][source] = 0
+        dist[1][target] = 0
+        frontier = [np.array([source]), np.array([target])]
+        depth = [0, 0]
+        skip = np.fromiter(skip_first, dtype=np.int64) if skip_first else None
+
+        while frontier[0].size and frontier[1].size:
+            if max_depth is not None and depth[0] + depth[1] >= max_depth:
+                return None
+            # Grow the side whose frontier touches fewer edges
+            side = 0 if self._degree[frontier[0]].sum() <= self._degree[frontier[1]].sum() else 1
+            other = 1 - side
+
+            owners, slots = _expand(self.indptr, frontier[side])
+            neighbors = self.indices[slots]
+            keep = dist[side][neighbors] == -1
+            if blocked is not None:
+                keep &= ~blocked[neighbors]
+            if skip is not None:
+                # The edge source-x is removed in both directions
+                at_source = (owners == source) if side == 0 else (neighbors == source)
+                far_end = neighbors if side == 0 else owners
+                keep &= ~(at_source & np.isin(far_end, skip))
+            owners, neighbors = owners[keep], neighbors[keep]
+
+            reached, first = np.unique(neighbors, return_index=True)
+            depth[side] += 1
+            dist[side][reached] = depth[side]
+            parent[side][reached] = owners[first]
+
+            met = reached[dist[other][reached] >= 0]
+            if met.size:
+                meet = int(met[np.argmin(dist[other][met])])
+                return self._join(meet, parent, source, target)
+            frontier[side] = reached
+        return None
+
+    @staticmethod
+    def _join(meet, parent, source, target):
+        forward = [meet]
+        while forward[-1] != source:
+            forward.append(int(parent[0][forward[-1]]))
+        backward = []
+        node = meet
+        while node != target:
+            node = int(parent[1][node])
+            backward.append(node)
+        return forward[::-1] + backward
+
+    def iter_paths(self, source, target, k=DEFAULT_K, max_depth=MAX_DEPTH):
+        """Yield up to `k` simple paths in order of length (Yen's algorithm)."""
+        first = self.shortest_path(source, target, max_depth=max_depth)
+        if first is None:
+            return
+        accepted = [first]
+        yield first
+
+        candidates = []
+        seen = {tuple(first)}
+        counter = itertools.count()
+        blocked = np.zeros(self.node_count, dtype=bool)
+
+        while len(accepted) < k:
+            previous = accepted[-1]
+            for i in range(len(previous) - 1):
+                spur = previous[i]
+                root = previous[:i + 1]
+                skip = {p[i + 1] for p in accepted if len(p) > i + 1 and p[:i + 1] == root}
+                blocked[root[:-1]] = True
+                spur_path = self.shortest_path(spur, target, blocked, skip, max_depth - i)
+                blocked[root[:-1]] = False
+                if spur_path is None:
+                    continue
+                candidate = root[:-1] + spur_path
+                key = tuple(candidate)
+                if key not in seen:
+                    seen.add(key)
+                    heapq.heappush(candidates, (len(candidate), next(counter), candidate))
+            if not candidates:
+                return
+            _, _, path = heapq.heappop(candidates)
+            accepted.append(path)
+            yield path
+
+
+def pathways_payload(bundle, source_id, target_id, k=DEFAULT_K, max_depth=MAX_DEPTH, engine=None):
+    """Shape results like /api/analysis/pathways: paths, shortestPathLength, allPaths, stats."""
+    engine = engine or PathEngine.from_bundle(bundle)
+    source = bundle.index_of(source_id)
+    target = bundle.index_of(target_id)
+    paths = []
+    if source >= 0 and target >= 0:
+        paths = [[bundle.node_id(i) for i in path]
+                 for path in engine.iter_paths(source, target, k, max_depth)]
+
+    return {
+        'paths': paths,
+        'shortestPathLength': min(len(p) for p in paths) if paths else None,
+        'allPaths': paths,
+        'stats': {
+            'pathCount': len(paths),
+            'avgPathLength': sum(len(p) for p in paths) / len(paths) if paths else 0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trace pathways between two nodes of the graph bundle')
+    parser.add_argument('source')
+    parser.add_argument('target')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--max-depth', type=int, default=MAX_DEPTH)
+    args = parser.parse_args()
+
+    bundle = load_bundle(args.bundle)
+    payload = pathways_payload(bundle, args.source, args.target, args.k, args.max_depth)
+    print(json.dumps(payload, indent=2))
+
+
+if __name__ == '__main__':
+    main()
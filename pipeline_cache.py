@@ -0,0 +1,162 @@
+"""On-disk stage cache for the prepare scripts.
+
+Every stage result is stored under a key derived from the input file
+fingerprints and the stage parameters, and each stage key includes the keys
+of the stages it reads from. Keys are computed before any data is loaded, so
+a run whose final stage is cached never touches the CSVs, and changing a
+parameter only recomputes the stages downstream of it.
+
+    raw load (ingested or cached Parquet) -> joined edge table -> sampled graph -> JSON export
+"""
+import glob
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+
+import pandas as pd
+
+from ingest import read_ingested
+
+CACHE_DIR = '.pipeline_cache'
+KEEP_PER_STAGE = 4
+
+HAS_PARQUET = importlib.util.find_spec('pyarrow') is not None
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class PipelineCache:
+
+    def __init__(self, root=CACHE_DIR, enabled=True):
+        self.root = root
+        self.enabled = enabled
+        self.hits = []
+        self.misses = []
+        if enabled:
+            os.makedirs(root, exist_ok=True)
+        self._fingerprint_path = os.path.join(root, 'fingerprints.json')
+        self._fingerprints = None
+
+    def _load_fingerprints(self):
+        if self._fingerprints is None:
+            self._fingerprints = {}
+            if os.path.exists(self._fingerprint_path):
+                with open(self._fingerprint_path) as f:
+                    self._fingerprints = json.load(f)
+        return self._fingerprints
+
+    def file_fingerprint(self, path):
+        """Content hash of `path`, re-hashed only when its size or mtime changes."""
+        path = os.path.abspath(path)
+        stat = _stat(path)
+        if not self.enabled:
+            return f'{path}:{stat[0]}:{stat[1]}'
+        known = self._load_fingerprints().get(path)
+        if known and known['stat'] == stat:
+            return known['sha256']
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self._fingerprints[path] = {'stat': stat, 'sha256': digest}
+        with open(self._fingerprint_path, 'w') as f:
+            json.dump(self._fingerprints, f, indent=2)
+        return digest
+
+    def key(self, stage, *upstream, **params):
+        return _digest({'stage': stage, 'upstream': upstream, 'params': params})
+
+    def raw_key(self, path, usecols=None, dtype=None):
+        return self.key('raw', self.file_fingerprint(path), usecols=usecols, dtype=dtype)
+
+    def _path(self, stage, key, suffix):
+        return os.path.join(self.root, f'{stage}-{key}{suffix}')
+
+    def _prune(self, stage):
+        entries = sorted(glob.glob(os.path.join(self.root, f'{stage}-*')), key=os.path.getmtime, reverse=True)
+        for stale in entries[KEEP_PER_STAGE:]:
+            os.remove(stale)
+
+    def _cached(self, stage, key, compute, suffix, read, write):
+        if not self.enabled:
+            return compute()
+        path = self._path(stage, key, suffix)
+        if os.path.exists(path):
+            self.hits.append(stage)
+            return read(path)
+        self.misses.append(stage)
+        result = compute()
+        tmp = f'{path}.tmp'
+        write(result, tmp)
+        os.replace(tmp, path)
+        self._prune(stage)
+        return result
+
+    def frame(self, stage, key, compute):
+        """DataFrame stage, stored as Parquet (pickle when pyarrow is not installed)."""
+        if HAS_PARQUET:
+            return self._cached(stage, key, compute, '.parquet', pd.read_parquet,
+                                lambda df, path: df.to_parquet(path, index=False))
+        return self._cached(stage, key, compute, '.pkl', pd.read_pickle,
+                            lambda df, path: df.to_pickle(path))
+
+    def value(self, stage, key, compute):
+        """Arbitrary picklable stage result."""
+        def read(path):
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+
+        def write(obj, path):
+            with open(path, 'wb') as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        return self._cached(stage, key, compute, '.pkl', read, write)
+
+    def cached_read_csv(self, path, usecols=None, dtype=None):
+        """Raw load stage: a CSV read once into typed Parquet keyed by content and columns.
+
+        Tables converted by ingest.py are read straight from their Parquet.
+        """
+        frame = read_ingested(path, usecols, dtype)
+        if frame is not None:
+            return frame
+        stage = 'raw_' + os.path.splitext(os.path.basename(path))[0]
+        return self.frame(stage, self.raw_key(path, usecols, dtype),
+                          lambda: pd.read_csv(path, usecols=usecols, dtype=dtype))
+
+    def export(self, stage, key, outputs, write):
+        """Run write() unless every output still matches the stamp of a run with `key`.
+
+        write() returns a small JSON-able summary that is kept in the stamp, so
+        a skipped export can still report what it would have written.
+        """
+        stamp_path = self._path(stage, 'stamp', '.json')
+        if self.enabled and os.path.exists(stamp_path):
+            with open(stamp_path) as f:
+                stamp = json.load(f)
+            if stamp['key'] == key and all(
+                    os.path.exists(p) and _stat(p) == stamp['outputs'].get(p) for p in outputs):
+                self.hits.append(stage)
+                return stamp['summary']
+
+        self.misses.append(stage)
+        summary = write()
+        if self.enabled:
+            stamp = {'key': key, 'outputs': {p: _stat(p) for p in outputs}, 'summary': summary}
+            with open(stamp_path, 'w') as f:
+                json.dump(stamp, f, indent=2)
+        return summary
+
+    def summary(self):
+        return f"cache hits: {', '.join(self.hits) or '-'}; recomputed: {', '.join(self.misses) or '-'}"
@@ -1,160 +1,438 @@
+import numpy as np
 import pandas as pd
-import json
+import argparse
 import os
-from datetime import datetime
-
-os.chdir(r'c:\PROJECT SNA')
-
-# Load all datasets
-investments = pd.read_csv('A kaggle dataset/investments.csv')
-people = pd.read_csv('A kaggle dataset/people.csv')
-funding_rounds = pd.read_csv('A kaggle dataset/funding_rounds.csv')
-
-# Sample 400 investments
-sample_400 = investments.sample(n=400, random_state=42)
-
-# Get unique IDs
-company_ids = sample_400['funded_object_id'].unique()
-investor_ids = sample_400['investor_object_id'].unique()
-funding_round_ids = sample_400['funding_round_id'].unique()
-
-# Filter data for our sample
-fr_sample = funding_rounds[funding_rounds['funding_round_id'].isin(funding_round_ids)].copy()
-people_sample = people.copy()
-
-# Convert dates
-fr_sample['funded_at'] = pd.to_datetime(fr_sample['funded_at'], errors='coerce')
-sample_400['created_at'] = pd.to_datetime(sample_400['created_at'], errors='coerce')
-
-# Extract funding round info
-fr_info = {}
-for _, row in fr_sample.iterrows():
-    fr_id = row['funding_round_id']
-    if pd.isna(fr_id):
-        continue
-    fr_id = str(int(fr_id))
-    fr_info[fr_id] = {
-        'type': row['funding_round_type'],
-        'raised_amount': float(row['raised_amount_usd']) if pd.notna(row['raised_amount_usd']) else None,
-        'date': row['funded_at'].strftime('%Y-%m-%d') if pd.notna(row['funded_at']) else None,
-        'pre_money_valuation': float(row['pre_money_valuation_usd']) if pd.notna(row['pre_money_valuation_usd']) else None,
-        'post_money_valuation': float(row['post_money_valuation_usd']) if pd.notna(row['post_money_valuation_usd']) else None,
-    }
 
-# Create nodes
-nodes = []
-node_map = {}
-
-# Company nodes
-for cid in company_ids:
-    node_id = str(cid)
-    node_map[node_id] = len(nodes)
-    nodes.append({
-        'id': node_id,
-        'label': node_id,
-        'type': 'company',
-        'name': f'Company {node_id}'
+from enrichment import (ACQUISITION_TYPE, acquisition_edges, attribute_counts, attribute_rows, events_key, has_events,
+                        load_events)
+from ego_network import write_ego_index
+from filter_index import write_filter_index
+from graph_bundle import BUNDLE_DIR, write_bundle
+from incremental import IncrementalStore
+from interning import IdTable
+from instrumentation import add_arguments, configure_from_args, finish, instrumented, stage
+from json_export import (SHARD_DIR, RawJSON, columnar_document, dumps, dumps_document, write_json,
+                         write_shards, write_text)
+from layout import ITERATIONS, attach_positions, write_layout
+from lod import LOD_DIR, write_lod
+from pipeline_cache import CACHE_DIR, PipelineCache
+from samplers import STRATEGIES, sample_graph
+from search_index import write_search_index
+
+BASE_PATH = r'c:\PROJECT SNA'
+SAMPLE_SIZE = 400
+
+INVESTMENT_COLUMNS = ['funding_round_id', 'funded_object_id', 'investor_object_id']
+FUNDING_ROUND_COLUMNS = [
+    'funding_round_id', 'funding_round_type', 'funded_at',
+    'raised_amount_usd', 'pre_money_valuation_usd', 'post_money_valuation_usd',
+]
+
+
+def table_path(base_path, table):
+    return os.path.join(base_path, 'A kaggle dataset', f'{table}.csv')
+
+
+@instrumented(rows=lambda tables: sum(len(t) for t in tables))
+def load_tables(base_path=BASE_PATH, cache=None):
+    cache = cache or PipelineCache(enabled=False)
+    investments = cache.cached_read_csv(table_path(base_path, 'investments'), usecols=INVESTMENT_COLUMNS)
+    funding_rounds = cache.cached_read_csv(table_path(base_path, 'funding_rounds'), usecols=FUNDING_ROUND_COLUMNS)
+    return investments, funding_rounds
+
+
+def _nullable(series):
+    # NaN/NaT -> None so the JSON export writes null
+    return series.astype(object).where(series.notna(), None)
+
+
+def _taken(column, positions, fill=None):
+    # Categorical of column[positions]; -1 positions are NaN, or `fill` when given
+    values = pd.Categorical(column)
+    codes = np.where(positions >= 0, values.codes[positions], -1)
+    categories = values.categories
+    if fill is not None:
+        if fill not in categories:
+            categories = categories.append(pd.Index([fill]))
+        codes[positions < 0] = categories.get_loc(fill)
+    taken = pd.Categorical.from_codes(codes, categories).remove_unused_categories()
+    # Same category order as astype('category') on the joined column
+    return taken.reorder_categories(taken.categories.sort_values())
+
+
+def _edge_frame(source, target, round_ids, rounds):
+    # A positional left join: round attributes are categorized per round and taken by code
+    positions = pd.Index(rounds['funding_round_id'].astype('float64')).get_indexer(round_ids.astype('float64'))
+    matched = positions >= 0
+
+    def amounts(column):
+        return np.where(matched, rounds[column].to_numpy(dtype='float64', na_value=np.nan)[positions], np.nan)
+
+    # Typed columns; missing values become None only when records are serialized
+    return pd.DataFrame({
+        'source': source,
+        'target': target,
+        'funding_round_type': _taken(rounds['funding_round_type'], positions, fill='unknown'),
+        'raised_amount': amounts('raised_amount_usd'),
+        'date': _taken(rounds['date'], positions),
+        'post_money_valuation': amounts('post_money_valuation_usd'),
     })
 
-# Investor nodes
-for inv_id in investor_ids:
-    node_id = str(inv_id)
-    node_map[node_id] = len(nodes)
-    nodes.append({
-        'id': node_id,
-        'label': node_id,
-        'type': 'investor',
-        'name': f'Investor {node_id}'
+
+@instrumented(rows=lambda result: len(result[1]))
+def build_edge_table(investments, funding_rounds, ids=None):
+    """(ids, edge table): one row per investment, joined to its funding round.
+
+    Endpoints are int32 codes into the IdTable `ids` and string attributes
+    are categoricals, so a row costs a few dozen bytes. The last row wins on
+    duplicate round ids.
+    """
+    ids = ids if ids is not None else IdTable()
+    rounds = funding_rounds.dropna(subset=['funding_round_id']).drop_duplicates('funding_round_id', keep='last')
+    rounds = rounds.assign(date=pd.to_datetime(rounds['funded_at'], errors='coerce').dt.strftime('%Y-%m-%d'))
+    source = ids.encode(investments['investor_object_id'].astype(str))
+    target = ids.encode(investments['funded_object_id'].astype(str))
+    return ids, _edge_frame(source, target, investments['funding_round_id'], rounds)
+
+
+@instrumented(rows=lambda result: len(result[1]))
+def store_edge_table(store):
+    """build_edge_table over an IncrementalStore: its investments, in id order, joined to its rounds."""
+    investments = store.investments
+    return store.ids, _edge_frame(investments['source'].to_numpy(), investments['target'].to_numpy(),
+                                  investments['funding_round_id'], store.rounds)
+
+
+@instrumented(rows=len)
+def sample_edges(edge_table, strategy='random_edge', target_nodes=None, max_edges=SAMPLE_SIZE, seed=42):
+    # With the defaults this picks the same rows as sampling 400 investments with random_state=42,
+    # since the join keeps one row per investment in order
+    _, positions = sample_graph(edge_table['target'], edge_table['source'], strategy,
+                                target_nodes=target_nodes, max_edges=max_edges, seed=seed)
+    return edge_table.iloc[positions]
+
+
+def _records(frame):
+    # Column-wise tolist() + zip is far cheaper than DataFrame.to_dict on large frames
+    columns = list(frame.columns)
+    return [dict(zip(columns, row)) for row in zip(*(frame[c].tolist() for c in columns))]
+
+
+def _edge_keys(edge_table):
+    # One int64 per (source, target) pair, standing in for the "source-target" edge id
+    return (edge_table['source'].to_numpy(dtype=np.int64) << 32) | edge_table['target'].to_numpy(dtype=np.int64)
+
+
+def _first_seen_counts(column):
+    # value -> count in order of first appearance, like groupby(sort=False, dropna=False).size()
+    codes = column.cat.codes.to_numpy()
+    values, first, counts = np.unique(codes, return_index=True, return_counts=True)
+    categories = np.append(column.cat.categories.to_numpy(dtype=object), np.nan)
+    order = np.argsort(first, kind='stable')
+    return dict(zip(categories[values[order]].tolist(), counts[order].tolist()))
+
+
+@instrumented(rows=lambda graph: len(graph['edge_table']))
+def build_graph(ids, edge_table, events=None):
+    """Columnar graph over interned ids; node and edge records are only built by write_outputs."""
+    enrichment = None
+    attributes = {}
+    if events is not None:
+        # Acquisitions touching the sampled graph become company -> company edges
+        touched = ids.decode(pd.unique(np.concatenate([edge_table['target'], edge_table['source']])))
+        acquisitions = acquisition_edges(events['acquisitions'], touched)
+        acquisitions = acquisitions.drop(columns='id').assign(
+            source=ids.encode(acquisitions['source']),
+            target=ids.encode(acquisitions['target']),
+        )
+        edge_table = pd.concat([edge_table.assign(edge_type='investment'),
+                                acquisitions.assign(edge_type=ACQUISITION_TYPE)], ignore_index=True)
+        for column in ('funding_round_type', 'date', 'edge_type'):
+            edge_table[column] = edge_table[column].astype(object).astype('category')
+        enrichment = {'acquisitions': len(acquisitions)}
+
+    acquired = edge_table['edge_type'].eq(ACQUISITION_TYPE) if 'edge_type' in edge_table else None
+    if acquired is None:
+        company_codes = pd.unique(edge_table['target'])
+        investor_codes = pd.unique(edge_table['source'])
+    else:
+        company_codes = pd.unique(np.concatenate([edge_table['target'], edge_table['source'][acquired]]))
+        investor_codes = pd.unique(edge_table['source'][~acquired])
+    node_table = pd.DataFrame({
+        'code': np.concatenate([company_codes, investor_codes]).astype(np.int32),
+        'type': pd.Categorical(['company'] * len(company_codes) + ['investor'] * len(investor_codes)),
     })
 
-# Create edges with metadata
-edges = []
-edge_data = {}
-
-for _, inv in sample_400.iterrows():
-    src = str(inv['investor_object_id'])
-    tgt = str(inv['funded_object_id'])
-    fr_id = str(int(inv['funding_round_id'])) if pd.notna(inv['funding_round_id']) else None
-    
-    fr_details = fr_info.get(fr_id, {})
-    
-    edge_key = f"{src}-{tgt}"
-    edge_data[edge_key] = {
-        'funding_round_type': fr_details.get('type', 'unknown'),
-        'raised_amount': fr_details.get('raised_amount'),
-        'date': fr_details.get('date'),
-        'post_money_valuation': fr_details.get('post_money_valuation')
+    # Edge details are keyed by source-target: first occurrence fixes the order, last one the values
+    keys = _edge_keys(edge_table)
+    _, first = np.unique(keys, return_index=True)
+    last = len(keys) - 1 - np.unique(keys[::-1], return_index=True)[1]
+    details = edge_table.iloc[last[np.argsort(first, kind='stable')]].reset_index(drop=True)
+
+    dates = details['date'].dropna().astype(object)
+    if events is not None:
+        attributes = attribute_rows(ids.decode(node_table['code']), events)
+        enrichment['ipo_nodes'], enrichment['fund_nodes'] = attribute_counts(attributes)
+
+    return {
+        'ids': ids,
+        'node_table': node_table,
+        'edge_table': edge_table,
+        'details': details,
+        'node_attributes': attributes,
+        'companies': len(company_codes),
+        'investors': len(investor_codes),
+        'funding_types': _first_seen_counts(details['funding_round_type']),
+        'date_range': {
+            'min': dates.min() if len(dates) else None,
+            'max': dates.max() if len(dates) else None,
+        },
+        'enrichment': enrichment,
     }
-    
-    edges.append({
-        'source': src,
-        'target': tgt,
-        'id': edge_key
-    })
 
-# Calculate statistics
-funding_types = {}
-for edge_id, data in edge_data.items():
-    ftype = data['funding_round_type']
-    if ftype not in funding_types:
-        funding_types[ftype] = 0
-    funding_types[ftype] += 1
-
-# Get date range
-dates = [d for d in [e.get('date') for e in edge_data.values()] if d]
-min_date = min(dates) if dates else None
-max_date = max(dates) if dates else None
-
-# Build complete network data
-network_data = {
-    'nodes': nodes,
-    'edges': edges,
-    'metadata': {
+
+def _string_edges(ids, edge_table):
+    # The export view of an edge table: string endpoints, "source-target" ids, plain object columns
+    source = pd.Series(ids.decode(edge_table['source']), dtype=object)
+    target = pd.Series(ids.decode(edge_table['target']), dtype=object)
+    frame = pd.DataFrame({'source': source, 'target': target, 'id': source + '-' + target})
+    for column in edge_table.columns.drop(['source', 'target']):
+        values = edge_table[column].reset_index(drop=True)
+        frame[column] = values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values
+    return frame
+
+
+def _node_records(ids, node_table, attributes):
+    node_ids = pd.Series(ids.decode(node_table['code']), dtype=object)
+    node_types = node_table['type'].astype(object)
+    names = np.where(node_types == 'company', 'Company ', 'Investor ').astype(object) + node_ids
+    nodes = _records(pd.DataFrame({'id': node_ids, 'label': node_ids, 'type': node_types, 'name': names}))
+    for position, values in attributes.items():
+        nodes[position].update(values)
+    return nodes
+
+
+def output_paths(base_path=BASE_PATH, layout=True, lod=True, projections=False, similarity=False):
+    paths = [
+        os.path.join(base_path, 'network_data.json'),
+        os.path.join(base_path, 'api_network_data.json'),
+        os.path.join(base_path, 'network_columns.json'),
+        os.path.join(base_path, SHARD_DIR, 'index.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'manifest.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'filters.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'ego.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'search.json'),
+    ]
+    # layout.json, the LOD index, the projections and the similarity index are only written when those steps run
+    if layout:
+        paths.append(os.path.join(base_path, BUNDLE_DIR, 'layout.json'))
+    if lod:
+        paths.append(os.path.join(base_path, LOD_DIR, 'index.json'))
+    if projections:
+        paths.append(os.path.join(base_path, BUNDLE_DIR, 'projection.json'))
+    if similarity:
+        paths.append(os.path.join(base_path, BUNDLE_DIR, 'similarity.json'))
+    return paths
+
+
+@instrumented(rows=lambda summary: summary['edges'])
+def write_outputs(graph, base_path=BASE_PATH, layout_iterations=ITERATIONS, lod=True, compress=True,
+                  projections=False, similarity=False):
+    ids = graph['ids']
+    funding_types = graph['funding_types']
+    node_table = graph['node_table']
+    # Strings exist only from here on
+    nodes = _node_records(ids, node_table, graph['node_attributes'])
+    edge_table = _string_edges(ids, graph['edge_table'])
+    edges = _records(edge_table[['source', 'target', 'id']])
+    details = _string_edges(ids, graph['details'])
+    detail_columns = ['funding_round_type', 'raised_amount', 'date', 'post_money_valuation']
+    for column in ['raised_amount', 'date', 'post_money_valuation']:
+        details[column] = _nullable(details[column])
+    edge_details = dict(zip(details['id'].tolist(), _records(details[detail_columns])))
+
+    # The bundle goes first: the layout is computed from it and lands in the JSON exports as x/y
+    bundle_path = os.path.join(base_path, BUNDLE_DIR)
+    node_ids = [n['id'] for n in nodes]
+    write_bundle(
+        bundle_path,
+        node_ids, node_table['type'].astype(object),
+        edge_table['source'], edge_table['target'],
+        funding_types=edge_table['funding_round_type'],
+        amounts=edge_table['raised_amount'],
+        dates=edge_table['date'],
+    )
+    write_filter_index(bundle_path)
+    write_ego_index(bundle_path)
+    names = [n['name'] for n in nodes]
+    write_search_index(bundle_path, node_ids, names)
+    # scipy is only needed for these two steps
+    if projections:
+        from projection import write_projections
+        write_projections(bundle_path)
+    if similarity:
+        from similarity import write_similarity_index
+        write_similarity_index(bundle_path)
+    if layout_iterations > 0:
+        _, positions = write_layout(bundle_path, iterations=layout_iterations, graph='backend')
+        attach_positions(nodes, bundle_path, positions)
+    if lod:
+        write_lod(bundle_path, node_ids, names, os.path.join(base_path, LOD_DIR), compress=compress)
+
+    # nodes/edges are shared by both documents, so encode them once
+    nodes_json = RawJSON(dumps(nodes))
+    edges_json = RawJSON(dumps(edges))
+
+    metadata = {
         'total_nodes': len(nodes),
         'total_edges': len(edges),
-        'companies': len(company_ids),
-        'investors': len(investor_ids),
+        'companies': graph['companies'],
+        'investors': graph['investors'],
         'funding_types': funding_types,
-        'date_range': {
-            'min': min_date,
-            'max': max_date
-        }
-    },
-    'edge_details': edge_data
-}
-
-# Save network data
-with open('network_data.json', 'w') as f:
-    json.dump(network_data, f, indent=2)
-
-# Create API response data
-api_data = {
-    'nodes': nodes,
-    'edges': edges,
-    'stats': {
-        'total_nodes': len(nodes),
-        'total_edges': len(edges),
-        'companies': len(company_ids),
-        'investors': len(investor_ids),
+        'date_range': graph['date_range']
+    }
+    if graph.get('enrichment'):
+        metadata['enrichment'] = graph['enrichment']
+    if graph.get('dataset'):
+        metadata['dataset'] = graph['dataset']
+
+    write_text(os.path.join(base_path, 'network_data.json'), dumps_document([
+        ('nodes', nodes_json),
+        ('edges', edges_json),
+        ('metadata', metadata),
+        ('edge_details', edge_details),
+    ]), compress)
+
+    write_text(os.path.join(base_path, 'api_network_data.json'), dumps_document([
+        ('nodes', nodes_json),
+        ('edges', edges_json),
+        ('stats', {
+            'total_nodes': len(nodes),
+            'total_edges': len(edges),
+            'companies': graph['companies'],
+            'investors': graph['investors'],
+            'funding_types': list(funding_types.keys()),
+            'funding_distribution': funding_types
+        }),
+        ('filters', {
+            'funding_types': sorted(funding_types.keys()),
+            'date_range': graph['date_range']
+        }),
+    ]), compress)
+
+    # Columnar and sharded views carry the edge attributes inline
+    edge_records = _records(edge_table.apply(_nullable))
+    write_json(os.path.join(base_path, 'network_columns.json'), columnar_document(nodes, edge_records, metadata),
+               compress)
+    write_shards(os.path.join(base_path, SHARD_DIR), nodes, edge_records, compress=compress)
+
+    return {
+        'nodes': len(nodes),
+        'edges': len(edges),
+        'companies': graph['companies'],
+        'investors': graph['investors'],
         'funding_types': list(funding_types.keys()),
-        'funding_distribution': funding_types
-    },
-    'filters': {
-        'funding_types': sorted(list(set([e.get('funding_round_type', 'unknown') for e in edge_data.values()]))),
-        'date_range': {
-            'min': min_date,
-            'max': max_date
-        }
+        'date_range': graph['date_range'],
+        'enrichment': graph.get('enrichment'),
     }
-}
-
-with open('api_network_data.json', 'w') as f:
-    json.dump(api_data, f, indent=2)
-
-print("[OK] Backend data prepared successfully")
-print(f"  - Nodes: {len(nodes)}")
-print(f"  - Edges: {len(edges)}")
-print(f"  - Companies: {len(company_ids)}")
-print(f"  - Investors: {len(investor_ids)}")
-print(f"  - Funding Types: {list(funding_types.keys())}")
-print(f"  - Date Range: {min_date} to {max_date}")
+
+
+def main(base_path=BASE_PATH, sample_size=SAMPLE_SIZE, use_cache=True,
+         strategy='random_edge', target_nodes=None, seed=42, enrich=True, incremental=False,
+         layout_iterations=ITERATIONS, lod=True, compress=True, projections=False, similarity=False):
+    cache = PipelineCache(os.path.join(base_path, CACHE_DIR), enabled=use_cache)
+    enrich = enrich and has_events(base_path)
+
+    store = None
+    if incremental:
+        # Only rows past each table's updated_at watermark are read; the edge table comes from the store
+        store = IncrementalStore(base_path)
+        with stage('incremental_refresh') as s:
+            s.rows = sum(store.refresh().values())
+        edges_key = cache.key('edges', incremental=store.key())
+    else:
+        # Stage keys come from file fingerprints and parameters only, so cached stages never load their inputs
+        edges_key = cache.key(
+            'edges',
+            cache.raw_key(table_path(base_path, 'investments'), INVESTMENT_COLUMNS),
+            cache.raw_key(table_path(base_path, 'funding_rounds'), FUNDING_ROUND_COLUMNS),
+        )
+    graph_key = cache.key('graph', edges_key, events_key(cache, base_path) if enrich else None,
+                          sample_size=sample_size, strategy=strategy, target_nodes=target_nodes, seed=seed)
+
+    def edge_table():
+        if store is not None:
+            return cache.value('edges', edges_key, lambda: store_edge_table(store))
+        return cache.value('edges', edges_key, lambda: build_edge_table(*load_tables(base_path, cache)))
+
+    def events():
+        with stage('load_events') as s:
+            tables = load_events(base_path, cache)
+            s.rows = sum(len(t) for t in tables.values())
+        return tables
+
+    def graph():
+        def compute():
+            ids, edges = edge_table()
+            result = build_graph(ids, sample_edges(edges, strategy, target_nodes, sample_size, seed),
+                                 events() if enrich else None)
+            if store is not None:
+                # Full-dataset counts kept up to date by the store, next to those of the sample
+                result['dataset'] = store.metadata()
+            return result
+        return cache.value('backend_graph', graph_key, compute)
+
+    export_key = cache.key('backend_export', graph_key, layout_iterations=layout_iterations, lod=lod,
+                           compress=compress, projections=projections, similarity=similarity)
+    summary = cache.export('backend_export', export_key,
+                           output_paths(base_path, layout_iterations > 0, lod, projections, similarity),
+                           lambda: write_outputs(graph(), base_path, layout_iterations, lod, compress, projections,
+                                                 similarity))
+
+    print("[OK] Backend data prepared successfully")
+    print(f"  - Nodes: {summary['nodes']}")
+    print(f"  - Edges: {summary['edges']}")
+    print(f"  - Companies: {summary['companies']}")
+    print(f"  - Investors: {summary['investors']}")
+    print(f"  - Funding Types: {summary['funding_types']}")
+    print(f"  - Date Range: {summary['date_range']['min']} to {summary['date_range']['max']}")
+    if summary.get('enrichment'):
+        enrichment = summary['enrichment']
+        print(f"  - Acquisitions: {enrichment['acquisitions']}, IPO nodes: {enrichment['ipo_nodes']}, "
+              f"fund nodes: {enrichment['fund_nodes']}")
+    if store is not None:
+        dataset = store.metadata()
+        print(f"  - Dataset: {dataset['total_edges']} edges, {dataset['companies']} companies, "
+              f"{dataset['investors']} investors")
+    if use_cache:
+        print(f"  - {cache.summary()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prepare backend network data from the Kaggle Crunchbase tables')
+    parser.add_argument('--base-path', default=BASE_PATH)
+    parser.add_argument('--strategy', choices=STRATEGIES, default='random_edge')
+    parser.add_argument('--target-nodes', type=int, default=None, help='stop sampling once this many nodes are in')
+    parser.add_argument('--sample-size', type=int, default=SAMPLE_SIZE, help='max sampled investments, 0 for no limit')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-cache', action='store_true', help='ignore and do not update the stage cache')
+    parser.add_argument('--no-enrich', action='store_true', help='skip acquisitions, IPOs and funds')
+    parser.add_argument('--layout-iterations', type=int, default=ITERATIONS,
+                        help='force-layout refinement steps per level; fewer is faster and coarser')
+    parser.add_argument('--no-layout', action='store_true', help='skip the precomputed layout (nodes get no x/y)')
+    parser.add_argument('--no-lod', action='store_true', help='skip the level-of-detail hierarchy')
+    parser.add_argument('--no-compress', action='store_true', help='skip the .gz/.br siblings of the JSON exports')
+    parser.add_argument('--projections', action='store_true',
+                        help='also build the co-investment projections (needs scipy; see projection.py)')
+    parser.add_argument('--similarity', action='store_true',
+                        help='also build the MinHash investor similarity index (needs scipy; see similarity.py)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='read only rows updated since the last run into the incremental store')
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    main(args.base_path, args.sample_size or None, not args.no_cache,
+         args.strategy, args.target_nodes, args.seed, not args.no_enrich, args.incremental,
+         0 if args.no_layout else args.layout_iterations, not args.no_lod, not args.no_compress, args.projections,
+         args.similarity)
+    finish(args)
@@ -1,119 +1,366 @@
+import numpy as np
 import pandas as pd
-import json
-import random
+import argparse
 import os
 
+from enrichment import acquisition_edges, attribute_rows, events_key, has_events, load_events
+from ego_network import write_ego_index
+from filter_index import write_filter_index
+from graph_bundle import BUNDLE_DIR, write_bundle
+from ingest import read_ingested
+from interning import IdTable
+from instrumentation import add_arguments, configure_from_args, finish, instrumented, stage
+from json_export import SHARD_DIR, columnar_document, write_json, write_shards
+from layout import ITERATIONS, attach_positions, write_layout
+from lod import LOD_DIR, write_lod
+from pipeline_cache import CACHE_DIR, PipelineCache
+from samplers import STRATEGIES, sample_graph
+from search_index import write_search_index
+
 base_path = r'c:\PROJECT SNA'
 
-# Load datasets
-print("Loading Kaggle datasets...")
-investments = pd.read_csv(os.path.join(base_path, 'A kaggle dataset', 'investments.csv'))
-objects = pd.read_csv(os.path.join(base_path, 'A kaggle dataset', 'objects.csv'))
-funding_rounds = pd.read_csv(os.path.join(base_path, 'A kaggle dataset', 'funding_rounds.csv'))
-
-print(f'Total investments: {len(investments)}')
-
-# Sample enough investments to get approximately 500 nodes
-# Since each investment involves 2 nodes (investor + company), we need ~250 investments for ~500 nodes
-target_sample_size = min(800, len(investments))  # Sample more to account for duplicates
-sample = investments.sample(n=target_sample_size, random_state=42)
-print(f'Sampled: {len(sample)} investments')
-
-# Get unique companies and investors
-companies = sample['funded_object_id'].unique()
-investors = sample['investor_object_id'].unique()
-
-print(f'Unique companies: {len(companies)}')
-print(f'Unique investors: {len(investors)}')
-print(f'Total unique nodes: {len(companies) + len(investors)}')
-
-# Create company name mapping from objects.csv
-company_names = {}
-for _, obj in objects.iterrows():
-    if pd.notna(obj.get('name')) and pd.notna(obj.get('id')):
-        company_names[str(obj['id'])] = str(obj['name'])
-
-# Create nodes with enhanced metadata
-nodes = []
-edges = []
-
-print("\nCreating nodes and edges...")
-
-for _, row in sample.iterrows():
-    company_id = str(row['funded_object_id'])
-    investor_id = str(row['investor_object_id'])
-
-    # Add company node if not exists
-    if not any(n['id'] == company_id for n in nodes):
-        company_name = company_names.get(company_id, f"Company {company_id}")
-        nodes.append({
-            'id': company_id,
-            'label': company_name,
-            'name': company_name,
-            'type': 'company',
-            'category': 'startup'
-        })
-
-    # Add investor node if not exists
-    if not any(n['id'] == investor_id for n in nodes):
-        investor_name = company_names.get(investor_id, f"Investor {investor_id}")
-        investor_type = 'vc' if 'fund' in investor_name.lower() or 'capital' in investor_name.lower() else 'investor'
-        nodes.append({
-            'id': investor_id,
-            'label': investor_name,
-            'name': investor_name,
-            'type': 'investor',
-            'investor_type': investor_type
-        })
-
-    # Add edge with investment details
-    edges.append({
-        'source': investor_id,
-        'target': company_id,
-        'funding_round_type': str(row.get('funding_round_type', 'unknown')),
-        'raised_amount': float(row.get('raised_amount', 0)),
-        'funded_at': str(row.get('funded_at', 'unknown'))
+TARGET_SAMPLE_SIZE = 800
+MAX_NODES = 500
+OBJECTS_CHUNK_SIZE = 200_000
+
+
+@instrumented(rows=len)
+def load_names(objects_path, wanted_ids, chunksize=OBJECTS_CHUNK_SIZE):
+    # Stream objects.csv, reading only id/name and keeping only ids present in the sample;
+    # the two ingested Parquet columns are small enough to take in one piece
+    wanted_ids = set(wanted_ids)
+    names = {}
+    ingested = read_ingested(objects_path, usecols=['id', 'name'])
+    chunks = [ingested] if ingested is not None else pd.read_csv(objects_path, usecols=['id', 'name'],
+                                                                 chunksize=chunksize)
+    for chunk in chunks:
+        chunk = chunk[chunk['id'].astype(str).isin(wanted_ids) & chunk['name'].notna()]
+        names.update(zip(chunk['id'].astype(str), chunk['name'].astype(str)))
+    return names
+
+
+def _column(frame, name, default):
+    return frame[name].reset_index(drop=True) if name in frame.columns else pd.Series([default] * len(frame))
+
+
+def _first_seen(first, second):
+    # Distinct codes in order of first appearance, taking `first` before `second` within a row
+    interleaved = np.empty(2 * len(first), dtype=np.int32)
+    interleaved[0::2] = first
+    interleaved[1::2] = second
+    codes, positions = np.unique(interleaved, return_index=True)
+    order = np.argsort(positions, kind='stable')
+    return codes[order], positions[order] % 2 == 0
+
+
+@instrumented(rows=lambda network: len(network[2]))
+def build_network(sample, company_names, ids=None):
+    """(ids, node table, edge table) for the sampled investments.
+
+    Nodes come in order of first appearance; a node first seen as the funded
+    object is a company, otherwise an investor. Endpoints are int32 codes
+    into `ids`; strings are rebuilt by write_outputs.
+    """
+    ids = ids if ids is not None else IdTable()
+    companies = ids.encode(sample['funded_object_id'].astype(str))
+    investors = ids.encode(sample['investor_object_id'].astype(str))
+
+    codes, is_company = _first_seen(companies, investors)
+    node_ids = ids.decode(codes)
+    names = pd.Series(node_ids, dtype=object).map(company_names)
+    fallback = np.where(is_company, 'Company ', 'Investor ').astype(object) + node_ids
+    names = names.where(names.notna(), pd.Series(fallback, dtype=object)).astype(object)
+    lowered = names.str.lower()
+    vc = lowered.str.contains('fund', regex=False) | lowered.str.contains('capital', regex=False)
+    nodes = pd.DataFrame({
+        'code': codes,
+        'type': pd.Categorical(np.where(is_company, 'company', 'investor'), categories=['company', 'investor']),
+        'name': names,
+        'investor_type': pd.Categorical(np.where(is_company, None, np.where(vc, 'vc', 'investor'))),
+    })
+
+    # Edge attributes as the JSON export writes them, dictionary-encoded
+    edges = pd.DataFrame({
+        'source': investors,
+        'target': companies,
+        'funding_round_type': _column(sample, 'funding_round_type', 'unknown').astype(object).map(str).astype('category'),
+        'raised_amount': _column(sample, 'raised_amount', 0).astype('float64'),
+        'funded_at': _column(sample, 'funded_at', 'unknown').astype(object).map(str).astype('category'),
     })
+    return ids, nodes, edges
+
+
+@instrumented(rows=lambda network: len(network[0]))
+def limit_nodes(nodes, edges, max_nodes=MAX_NODES):
+    if not max_nodes or len(nodes) <= max_nodes:
+        return nodes, edges
+
+    # Keep the most connected nodes; the stable sort keeps first-seen order among equal degrees
+    degree = np.bincount(np.concatenate([edges['source'], edges['target']]),
+                         minlength=int(nodes['code'].max()) + 1)
+    top = np.argsort(-degree[nodes['code']], kind='stable')[:max_nodes]
+    top_nodes = nodes.iloc[top].reset_index(drop=True)
+
+    # Filter edges to only include connections between top nodes
+    kept = np.zeros(len(degree), dtype=bool)
+    kept[top_nodes['code']] = True
+    filtered_edges = edges[kept[edges['source']] & kept[edges['target']]].reset_index(drop=True)
+
+    return top_nodes, filtered_edges
+
+
+@instrumented(rows=len)
+def sample_investments(investments, sample_size=TARGET_SAMPLE_SIZE, strategy='random_edge',
+                       target_nodes=None, seed=42):
+    # Sample enough investments to get approximately 500 nodes
+    # Since each investment involves 2 nodes (investor + company), we need ~250 investments for ~500 nodes.
+    # With the defaults this is the same as investments.sample(n=800, random_state=42)
+    _, positions = sample_graph(investments['funded_object_id'].astype(str), investments['investor_object_id'].astype(str),
+                                strategy, target_nodes=target_nodes, max_edges=sample_size, seed=seed)
+    return investments.iloc[positions]
+
+
+@instrumented(rows=lambda enriched: len(enriched[0]))
+def enrich_network(ids, nodes, edges, events):
+    """Acquisitions between companies already in the network, plus IPO/fund attributes per node row."""
+    node_ids = ids.decode(nodes['code'])
+    acquisitions = acquisition_edges(events['acquisitions'], node_ids, touching=False)
+    extra = pd.DataFrame({
+        'source': ids.encode(acquisitions['source']),
+        'target': ids.encode(acquisitions['target']),
+        'funding_round_type': 'acquisition',
+        'raised_amount': acquisitions['raised_amount'].fillna(0.0).astype('float64'),
+        'funded_at': acquisitions['date'].fillna('unknown').astype(object).map(str),
+    })
+    edges = pd.concat([edges, extra], ignore_index=True)
+    for column in ('funding_round_type', 'funded_at'):
+        edges[column] = edges[column].astype(object).astype('category')
+    return edges, attribute_rows(node_ids, events)
+
+
+def prepare_graph(investments, objects_path, sample_size=TARGET_SAMPLE_SIZE, max_nodes=MAX_NODES,
+                  strategy='random_edge', target_nodes=None, seed=42, events=None):
+    print(f'Total investments: {len(investments)}')
 
-# Limit to exactly 500 nodes if we have more
-if len(nodes) > 500:
-    # Keep the most connected nodes
-    node_degrees = {}
-    for edge in edges:
-        node_degrees[edge['source']] = node_degrees.get(edge['source'], 0) + 1
-        node_degrees[edge['target']] = node_degrees.get(edge['target'], 0) + 1
-
-    # Sort nodes by degree (connections) and keep top 500
-    sorted_nodes = sorted(nodes, key=lambda n: node_degrees.get(n['id'], 0), reverse=True)
-    top_500_nodes = sorted_nodes[:500]
-    top_500_node_ids = set(n['id'] for n in top_500_nodes)
-
-    # Filter edges to only include connections between top 500 nodes
-    filtered_edges = [e for e in edges if e['source'] in top_500_node_ids and e['target'] in top_500_node_ids]
-
-    nodes = top_500_nodes
-    edges = filtered_edges
-
-print(f'\nFinal network: {len(nodes)} nodes, {len(edges)} edges')
-
-# Create network data structure
-network_data = {
-    'nodes': nodes,
-    'edges': edges,
-    'metadata': {
-        'total_sampled_investments': len(sample),
-        'unique_companies': len([n for n in nodes if n['type'] == 'company']),
-        'unique_investors': len([n for n in nodes if n['type'] == 'investor']),
-        'dataset_source': 'kaggle_crunchbase'
+    sample = sample_investments(investments, sample_size, strategy, target_nodes, seed)
+    print(f'Sampled: {len(sample)} investments')
+
+    # Get unique companies and investors
+    companies = sample['funded_object_id'].unique()
+    investors = sample['investor_object_id'].unique()
+
+    print(f'Unique companies: {len(companies)}')
+    print(f'Unique investors: {len(investors)}')
+    print(f'Total unique nodes: {len(companies) + len(investors)}')
+
+    # Create name mapping from objects.csv for the sampled ids only
+    sampled_ids = set(map(str, companies)) | set(map(str, investors))
+    company_names = load_names(objects_path, sampled_ids)
+
+    print("\nCreating nodes and edges...")
+    ids, nodes, edges = build_network(sample, company_names)
+
+    # Limit to exactly max_nodes nodes if we have more
+    nodes, edges = limit_nodes(nodes, edges, max_nodes)
+
+    attributes = {}
+    if events is not None:
+        edges, attributes = enrich_network(ids, nodes, edges, events)
+
+    return {'sample': sample, 'ids': ids, 'nodes': nodes, 'edges': edges, 'node_attributes': attributes}
+
+
+def _node_records(ids, node_table, attributes):
+    # The node dicts of the JSON exports; strings are rebuilt from the codes here
+    nodes = []
+    for node_id, node_type, name, investor_type in zip(
+            ids.decode(node_table['code']).tolist(), node_table['type'].astype(object).tolist(),
+            node_table['name'].tolist(), node_table['investor_type'].astype(object).tolist()):
+        if node_type == 'company':
+            nodes.append({'id': node_id, 'label': name, 'name': name, 'type': 'company', 'category': 'startup'})
+        else:
+            nodes.append({'id': node_id, 'label': name, 'name': name, 'type': 'investor',
+                          'investor_type': investor_type})
+    for position, values in attributes.items():
+        nodes[position].update(values)
+    return nodes
+
+
+def _edge_records(ids, edge_table):
+    return [
+        {'source': source, 'target': target, 'funding_round_type': funding_round_type,
+         'raised_amount': raised_amount, 'funded_at': funded_at}
+        for source, target, funding_round_type, raised_amount, funded_at in zip(
+            ids.decode(edge_table['source']).tolist(), ids.decode(edge_table['target']).tolist(),
+            edge_table['funding_round_type'].astype(object).tolist(), edge_table['raised_amount'].tolist(),
+            edge_table['funded_at'].astype(object).tolist())
+    ]
+
+
+def output_paths(base_path=base_path, layout=True, lod=True, projections=False, similarity=False):
+    paths = [
+        os.path.join(base_path, 'network_data.json'),
+        os.path.join(base_path, 'network_data_sample.csv'),
+        os.path.join(base_path, 'network_columns.json'),
+        os.path.join(base_path, SHARD_DIR, 'index.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'manifest.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'filters.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'ego.json'),
+        os.path.join(base_path, BUNDLE_DIR, 'search.json'),
+    ]
+    # layout.json, the LOD index, the projections and the similarity index are only written when those steps run
+    if layout:
+        paths.append(os.path.join(base_path, BUNDLE_DIR, 'layout.json'))
+    if lod:
+        paths.append(os.path.join(base_path, LOD_DIR, 'index.json'))
+    if projections:
+        paths.append(os.path.join(base_path, BUNDLE_DIR, 'projection.json'))
+    if similarity:
+        paths.append(os.path.join(base_path, BUNDLE_DIR, 'similarity.json'))
+    return paths
+
+
+@instrumented(rows=lambda summary: summary['edges'])
+def write_outputs(graph, base_path=base_path, layout_iterations=ITERATIONS, lod=True, compress=True,
+                  projections=False, similarity=False):
+    sample, ids = graph['sample'], graph['ids']
+    nodes, edges = _node_records(ids, graph['nodes'], graph.get('node_attributes') or {}), _edge_records(ids, graph['edges'])
+
+    # The bundle goes first: the layout is computed from it and lands in the JSON exports as x/y
+    bundle_path = os.path.join(base_path, BUNDLE_DIR)
+    write_bundle(
+        bundle_path,
+        [n['id'] for n in nodes], [n['type'] for n in nodes],
+        [e['source'] for e in edges], [e['target'] for e in edges],
+        funding_types=[e['funding_round_type'] for e in edges],
+        amounts=[e['raised_amount'] for e in edges],
+        dates=[e['funded_at'] for e in edges],
+    )
+    write_filter_index(bundle_path)
+    write_ego_index(bundle_path)
+    write_search_index(bundle_path, [n['id'] for n in nodes], [n['name'] for n in nodes])
+    # scipy is only needed for these two steps
+    if projections:
+        from projection import write_projections
+        write_projections(bundle_path)
+    if similarity:
+        from similarity import write_similarity_index
+        write_similarity_index(bundle_path)
+    if layout_iterations > 0:
+        _, positions = write_layout(bundle_path, iterations=layout_iterations, graph='network')
+        attach_positions(nodes, bundle_path, positions)
+    if lod:
+        write_lod(bundle_path, [n['id'] for n in nodes], [n['name'] for n in nodes], os.path.join(base_path, LOD_DIR),
+                  compress=compress)
+
+    # Create network data structure
+    network_data = {
+        'nodes': nodes,
+        'edges': edges,
+        'metadata': {
+            'total_sampled_investments': len(sample),
+            'unique_companies': len([n for n in nodes if n['type'] == 'company']),
+            'unique_investors': len([n for n in nodes if n['type'] == 'investor']),
+            'dataset_source': 'kaggle_crunchbase'
+        }
     }
-}
 
-# Save files
-with open(os.path.join(base_path, 'network_data.json'), 'w') as f:
-    json.dump(network_data, f, indent=2)
+    # Save files
+    write_json(os.path.join(base_path, 'network_data.json'), network_data, compress)
+    write_json(os.path.join(base_path, 'network_columns.json'),
+               columnar_document(nodes, edges, network_data['metadata']), compress)
+    write_shards(os.path.join(base_path, SHARD_DIR), nodes, edges, compress=compress)
+
+    sample.to_csv(os.path.join(base_path, 'network_data_sample.csv'), index=False)
+
+    return {'nodes': len(nodes), 'edges': len(edges)}
+
+
+def main(base_path=base_path, sample_size=TARGET_SAMPLE_SIZE, max_nodes=MAX_NODES, use_cache=True,
+         strategy='random_edge', target_nodes=None, seed=42, enrich=True, layout_iterations=ITERATIONS,
+         lod=True, compress=True, projections=False, similarity=False):
+    data_dir = os.path.join(base_path, 'A kaggle dataset')
+    investments_path = os.path.join(data_dir, 'investments.csv')
+    objects_path = os.path.join(data_dir, 'objects.csv')
+    cache = PipelineCache(os.path.join(base_path, CACHE_DIR), enabled=use_cache)
+    enrich = enrich and has_events(base_path)
+
+    # Stage keys come from file fingerprints and parameters only, so cached stages never load their inputs
+    graph_key = cache.key(
+        'network_graph',
+        cache.raw_key(investments_path),
+        cache.file_fingerprint(objects_path),
+        events_key(cache, base_path) if enrich else None,
+        sample_size=sample_size,
+        max_nodes=max_nodes,
+        strategy=strategy,
+        target_nodes=target_nodes,
+        seed=seed,
+    )
+
+    def graph():
+        def compute():
+            # Load datasets
+            print("Loading Kaggle datasets...")
+            with stage('load_investments') as s:
+                investments = cache.cached_read_csv(investments_path)
+                s.rows = len(investments)
+            events = None
+            if enrich:
+                with stage('load_events') as s:
+                    events = load_events(base_path, cache)
+                    s.rows = sum(len(t) for t in events.values())
+            graph = prepare_graph(investments, objects_path, sample_size, max_nodes, strategy, target_nodes, seed,
+                                  events)
+            print(f"\nFinal network: {len(graph['nodes'])} nodes, {len(graph['edges'])} edges")
+            return graph
+        return cache.value('network_graph', graph_key, compute)
+
+    export_key = cache.key('network_export', graph_key, layout_iterations=layout_iterations, lod=lod,
+                           compress=compress, projections=projections, similarity=similarity)
+    paths = output_paths(base_path, layout_iterations > 0, lod, projections, similarity)
+    summary = cache.export('network_export', export_key, paths,
+                           lambda: write_outputs(graph(), base_path, layout_iterations, lod, compress, projections,
+                                                 similarity))
+
+    print(f"\nCreated network with {summary['nodes']} nodes and {summary['edges']} edges")
+    # Top-level files by name, the rest by their directory, in output order
+    saved = []
+    for path in paths:
+        relative = os.path.relpath(path, base_path)
+        entry = relative if os.sep not in relative else relative.split(os.sep)[0] + '/'
+        if entry not in saved:
+            saved.append(entry)
+    print(f"Files saved: {', '.join(saved)}")
+    print('Network ready for visualization with filtering capabilities!')
+    if use_cache:
+        print(cache.summary())
 
-sample.to_csv(os.path.join(base_path, 'network_data_sample.csv'), index=False)
 
-print(f'\nCreated network with {len(nodes)} nodes and {len(edges)} edges')
-print('Files saved: network_data.json, network_data_sample.csv')
-print('Network ready for visualization with filtering capabilities!')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prepare the explorer network from the Kaggle Crunchbase tables')
+    parser.add_argument('--base-path', default=base_path)
+    parser.add_argument('--strategy', choices=STRATEGIES, default='random_edge')
+    parser.add_argument('--target-nodes', type=int, default=None, help='stop sampling once this many nodes are in')
+    parser.add_argument('--sample-size', type=int, default=TARGET_SAMPLE_SIZE, help='max sampled investments, 0 for no limit')
+    parser.add_argument('--max-nodes', type=int, default=MAX_NODES, help='keep only the most connected nodes, 0 for no cap')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-cache', action='store_true', help='ignore and do not update the stage cache')
+    parser.add_argument('--no-enrich', action='store_true', help='skip acquisitions, IPOs and funds')
+    parser.add_argument('--layout-iterations', type=int, default=ITERATIONS,
+                        help='force-layout refinement steps per level; fewer is faster and coarser')
+    parser.add_argument('--no-layout', action='store_true', help='skip the precomputed layout (nodes get no x/y)')
+    parser.add_argument('--no-lod', action='store_true', help='skip the level-of-detail hierarchy')
+    parser.add_argument('--no-compress', action='store_true', help='skip the .gz/.br siblings of the JSON exports')
+    parser.add_argument('--projections', action='store_true',
+                        help='also build the co-investment projections (needs scipy; see projection.py)')
+    parser.add_argument('--similarity', action='store_true',
+                        help='also build the MinHash investor similarity index (needs scipy; see similarity.py)')
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    main(args.base_path, args.sample_size or None, args.max_nodes, not args.no_cache,
+         args.strategy, args.target_nodes, args.seed, not args.no_enrich,
+         0 if args.no_layout else args.layout_iterations, not args.no_lod, not args.no_compress, args.projections,
+         args.similarity)
+    finish(args)
@@ -0,0 +1,258 @@
+"""Co-investment projections of the bipartite graph bundle.
+
+The bundle's investor -> company edges form an incidence matrix A (investors
+x companies, one 1 per distinct pair). A @ A.T counts the companies two
+investors both backed; A.T @ A counts the investors two companies share.
+
+The product is computed in row blocks across a process pool, and each block
+keeps only the top-k weighted neighbours per row. A block grows until the
+estimated nonzeros of its product pass BLOCK_BUDGET. A hub VC whose row
+alone is larger ends its block, so no worker materializes more than one
+hub's full neighbourhood at a time.
+
+    projection_<kind>_indptr.npy     int64  bundle node -> its neighbour range (every node has a row)
+    projection_<kind>_neighbors.npy  int32  neighbour node indexes, heaviest first
+    projection_<kind>_weights.npy    int32  shared companies (investor) or shared investors (company)
+
+kind is 'investor' or 'company'. projection.json is written last and records
+the bundle build_id and k. The prepare scripts only build the projections
+with --projections; otherwise run this module on the bundle.
+
+    python projection.py --top-k 20 c:26569 f:1234
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from enrichment import ACQUISITION_TYPE
+from graph_bundle import BUNDLE_DIR, load_bundle, retract_manifest, save_array, write_manifest
+
+PROJECTION_VERSION = 1
+KINDS = ('investor', 'company')
+DEFAULT_TOP_K = 20
+BLOCK_BUDGET = 4_000_000
+_ARRAYS = ['indptr', 'neighbors', 'weights']
+
+_worker_state = None
+
+
+def incidence(bundle):
+    """(matrix, investor nodes, company nodes) for the bundle's funding edges.
+
+    matrix is a CSR investors x companies 0/1 matrix. Row i is the investor
+    at bundle node investors[i] and column j is the company at companies[j].
+    Acquisition edges (company -> company) are left out.
+    """
+    src = np.asarray(bundle.edge_src)
+    dst = np.asarray(bundle.edge_dst)
+    if ACQUISITION_TYPE in bundle.funding_types:
+        keep = np.asarray(bundle.edge_type) != bundle.funding_types.index(ACQUISITION_TYPE)
+        src, dst = src[keep], dst[keep]
+    investors, rows = np.unique(src, return_inverse=True)
+    companies, cols = np.unique(dst, return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                               shape=(len(investors), len(companies)))
+    # Conversion sums repeated rounds of the same pair; a pair counts once
+    matrix.data[:] = 1
+    return matrix, investors, companies
+
+
+def row_blocks(matrix, transpose, budget=BLOCK_BUDGET):
+    """(lo, hi) row ranges whose product with transpose stays near `budget` nonzeros."""
+    if matrix.shape[0] == 0:
+        return []
+    # Row i of the product has at most the sum of the column counts of its entries
+    costs = np.concatenate([[0], np.cumsum(np.diff(transpose.indptr)[matrix.indices], dtype=np.int64)])
+    work = np.cumsum(costs[matrix.indptr[1:]] - costs[matrix.indptr[:-1]])
+    block = np.concatenate([[0], work[:-1]]) // max(1, budget)
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(block)) + 1, [matrix.shape[0]]])
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def top_k(rows, cols, weights, k):
+    """Keep the k heaviest (row, col) pairs per row, heaviest first; ties go to the lower col.
+
+    rows are small non-negative offsets (a block's local row numbers).
+    """
+    if not len(rows):
+        return rows, cols, weights
+    # Pairs sharing a single entity make up most of a hub's row; a row that
+    # already has k heavier pairs keeps none of them, so they skip the sort
+    heavy = np.bincount(rows[weights > 1], minlength=int(rows.max()) + 1)
+    keep = (weights > 1) | (heavy[rows] < k)
+    rows, cols, weights = rows[keep], cols[keep], weights[keep]
+
+    # One sort over (row, -weight, col) packed into int64 keys instead of a lexsort
+    col_bits = int(cols.max()).bit_length()
+    weight_max = int(weights.max())
+    weight_bits = weight_max.bit_length()
+    if int(rows.max()).bit_length() + weight_bits + col_bits < 63:
+        keys = np.sort((rows.astype(np.int64) << (weight_bits + col_bits))
+                       | ((weight_max - weights.astype(np.int64)) << col_bits) | cols)
+        rows = keys >> (weight_bits + col_bits)
+        weights = weight_max - ((keys >> col_bits) & ((1 << weight_bits) - 1))
+        cols = keys & ((1 << col_bits) - 1)
+    else:
+        order = np.lexsort((cols, -weights, rows))
+        rows, cols, weights = rows[order], cols[order], weights[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    return rows[keep], cols[keep], weights[keep]
+
+
+def _init_worker(matrix, transpose, k):
+    global _worker_state
+    _worker_state = (matrix, transpose, k)
+
+
+def _project_rows(bounds):
+    matrix, transpose, k = _worker_state
+    lo, hi = bounds
+    product = matrix[lo:hi] @ transpose
+    rows = np.repeat(np.arange(hi - lo, dtype=np.int64), np.diff(product.indptr))
+    cols = product.indices.astype(np.int64)
+    weights = product.data
+    other = rows + lo != cols
+    rows, cols, weights = top_k(rows[other], cols[other], weights[other], k)
+    return (rows + lo).astype(np.int32), cols.astype(np.int32), weights.astype(np.int32)
+
+
+def project(matrix, k=DEFAULT_TOP_K, workers=None, budget=BLOCK_BUDGET):
+    """Top-k (row, neighbour row, weight) triples of matrix @ matrix.T, sorted by row."""
+    matrix = sparse.csr_matrix(matrix)
+    transpose = matrix.T.tocsr()
+    blocks = row_blocks(matrix, transpose, budget)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(blocks) <= 1:
+        _init_worker(matrix, transpose, k)
+        parts = [_project_rows(bounds) for bounds in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(matrix, transpose, k)) as pool:
+            parts = list(pool.map(_project_rows, blocks))
+    if not parts:
+        empty = np.array([], dtype=np.int32)
+        return empty, empty, empty
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def compute_projection(bundle, kind, k=DEFAULT_TOP_K, workers=None, budget=BLOCK_BUDGET):
+    """(indptr, neighbors, weights) over bundle nodes for kind 'investor' or 'company'."""
+    if kind not in KINDS:
+        raise ValueError(f'Unknown projection kind: {kind}')
+    matrix, investors, companies = incidence(bundle)
+    nodes = investors if kind == 'investor' else companies
+    rows, cols, weights = project(matrix if kind == 'investor' else matrix.T, k, workers, budget)
+
+    # Local rows follow bundle order (np.unique sorts), so triples are already grouped by node
+    indptr = np.zeros(bundle.node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nodes[rows], minlength=bundle.node_count), out=indptr[1:])
+    return indptr, nodes[cols].astype(np.int32), weights
+
+
+def write_projections(bundle_path, k=DEFAULT_TOP_K, workers=None, budget=BLOCK_BUDGET, kinds=KINDS):
+    bundle = load_bundle(bundle_path)
+    summary = {}
+    retract_manifest(os.path.join(bundle_path, 'projection.json'))
+    for kind in kinds:
+        arrays = dict(zip(_ARRAYS, compute_projection(bundle, kind, k, workers, budget)))
+        for name, array in arrays.items():
+            save_array(os.path.join(bundle_path, f'projection_{kind}_{name}.npy'), array)
+        summary[kind] = {
+            'nodes': int(np.count_nonzero(np.diff(arrays['indptr']))),
+            'pairs': len(arrays['neighbors']),
+        }
+
+    manifest = {
+        'version': PROJECTION_VERSION,
+        'build_id': bundle.build_id,
+        'top_k': k,
+        'kinds': summary,
+    }
+    write_manifest(os.path.join(bundle_path, 'projection.json'), manifest)
+    return manifest
+
+
+class Projection:
+    """Top co-investors of an investor and top co-funded companies of a company."""
+
+    def __init__(self, bundle, mmap_mode='r'):
+        self.bundle = bundle
+        with open(os.path.join(bundle.path, 'projection.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('build_id') != bundle.build_id:
+            raise ValueError(f'Projections in {bundle.path} are stale; rebuild them with projection.py')
+        self.kinds = {
+            kind: {name: np.load(os.path.join(bundle.path, f'projection_{kind}_{name}.npy'), mmap_mode=mmap_mode)
+                   for name in _ARRAYS}
+            for kind in self.manifest['kinds']
+        }
+
+    def neighbors(self, node_id, kind=None, limit=None):
+        """{id, type, kind, neighbors: [{id, type, weight}]}, heaviest first.
+
+        Without a kind, a node with co-investors gets the investor projection,
+        whatever its type: investors stored as companies (c: ids) have no row
+        in the company projection. Other nodes get the kind of their type.
+        """
+        node = self.bundle.index_of(node_id)
+        if node < 0:
+            raise ValueError(f'Unknown node: {node_id}')
+        node_types = self.bundle.manifest['node_types']
+        node_type = node_types[self.bundle.node_type[node]]
+        if kind is None:
+            investor = self.kinds.get('investor')
+            has_row = investor is not None and investor['indptr'][node + 1] > investor['indptr'][node]
+            kind = 'investor' if has_row else node_type
+        if kind not in self.kinds:
+            raise ValueError(f'No {kind} projection; expected one of {sorted(self.kinds)}')
+
+        arrays = self.kinds[kind]
+        start, end = int(arrays['indptr'][node]), int(arrays['indptr'][node + 1])
+        if limit is not None:
+            end = min(end, start + limit)
+        return {
+            'id': node_id,
+            'type': node_type,
+            'kind': kind,
+            'neighbors': [
+                {'id': self.bundle.node_id(other), 'type': node_types[self.bundle.node_type[other]],
+                 'weight': int(weight)}
+                for other, weight in zip(arrays['neighbors'][start:end].tolist(),
+                                         arrays['weights'][start:end].tolist())
+            ],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the co-investment projections of a graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--no-build', action='store_true', help='query the existing projections')
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='neighbours kept per node')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--budget', type=int, default=BLOCK_BUDGET, help='target nonzeros per block product')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('node_id', nargs='*')
+    args = parser.parse_args()
+
+    if not args.no_build:
+        manifest = write_projections(args.bundle, args.top_k, args.workers, args.budget, args.kinds)
+        print(f"[OK] Projections written to {args.bundle} (top {args.top_k})")
+        for kind, counts in manifest['kinds'].items():
+            print(f"  - {kind}: {counts['nodes']} nodes, {counts['pairs']} neighbour pairs")
+
+    projection = Projection(load_bundle(args.bundle))
+    for node_id in args.node_id:
+        result = projection.neighbors(node_id, limit=args.limit)
+        print(f"{node_id} ({result['type']}):")
+        for neighbor in result['neighbors']:
+            print(f"  {neighbor['id']:<14} {neighbor['type']:<9} shared {neighbor['weight']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Graph samplers over an edge table.
+
+Every sampler works on integer-coded endpoint arrays (see encode_endpoints),
+never on per-node Python objects, and is reproducible from `seed`. A sampler
+returns (nodes, edges): node codes in output order and the row positions of
+the selected edges in the edge table.
+
+    random_edge   shuffled edge prefix; with max_edges only, this picks the
+                  same rows as DataFrame.sample(n=max_edges, random_state=seed)
+    top_k_degree  the target_nodes highest-degree nodes (heap) and their edges
+    snowball      BFS waves from seed nodes until target_nodes are reached
+    forest_fire   Leskovec & Faloutsos forest-fire burning
+
+With max_edges, the node-based samplers trim by node, not by edge: they keep
+the longest prefix of their node order (degree rank, BFS wave, burn order)
+whose induced edges fit the budget, with all of those edges. A trimmed
+sample is the sample of a smaller target, so no selected node is left
+without the edge that brought it in.
+"""
+import heapq
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ('random_edge', 'top_k_degree', 'snowball', 'forest_fire')
+
+
+def encode_endpoints(first, second):
+    """Integer codes for two endpoint columns.
+
+    Codes follow first appearance in row order, taking `first` before
+    `second` within a row, so code order matches building nodes row by row.
+    Integer columns (already-coded ids) are factorized as int64, not boxed
+    into Python objects.
+    """
+    first, second = np.asarray(first), np.asarray(second)
+    dtype = np.int64 if first.dtype.kind in 'iu' and second.dtype.kind in 'iu' else object
+    first, second = first.astype(dtype, copy=False), second.astype(dtype, copy=False)
+    interleaved = np.empty(2 * len(first), dtype=dtype)
+    interleaved[0::2] = first
+    interleaved[1::2] = second
+    codes, uniques = pd.factorize(interleaved)
+    return codes[0::2].astype(np.int64), codes[1::2].astype(np.int64), len(uniques)
+
+
+def _first_seen(a, b, positions):
+    # Node codes in order of first appearance along the selected edges
+    interleaved = np.empty(2 * len(positions), dtype=np.int64)
+    interleaved[0::2] = a[positions]
+    interleaved[1::2] = b[positions]
+    _, first = np.unique(interleaved, return_index=True)
+    return interleaved[np.sort(first)]
+
+
+def _induced(a, b, selected, node_count):
+    mask = np.zeros(node_count, dtype=bool)
+    mask[selected] = True
+    return np.flatnonzero(mask[a] & mask[b])
+
+
+def _trim(a, b, nodes, positions, node_count, max_edges):
+    # Longest prefix of `nodes` whose induced edges fit in max_edges; an edge
+    # enters the sample with the later-ranked of its two endpoints
+    if max_edges is None or len(positions) <= max_edges:
+        return nodes, positions
+    rank = np.full(node_count, len(nodes), dtype=np.int64)
+    rank[nodes] = np.arange(len(nodes))
+    added = np.maximum(rank[a[positions]], rank[b[positions]])
+    kept = np.searchsorted(np.cumsum(np.bincount(added, minlength=len(nodes))), max_edges, side='right')
+    return nodes[:kept], positions[added < kept]
+
+
+def _csr(a, b, node_count):
+    rows = np.concatenate([a, b])
+    cols = np.concatenate([b, a])
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=node_count), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def random_edge(a, b, node_count, target_nodes=None, max_edges=None, seed=42):
+    order = np.random.RandomState(seed).permutation(len(a))
+    cut = len(order)
+    if max_edges is not None:
+        cut = min(cut, max_edges)
+    if target_nodes is not None:
+        # Shortest shuffled prefix that touches target_nodes distinct nodes
+        interleaved = np.empty(2 * len(order), dtype=np.int64)
+        interleaved[0::2] = a[order]
+        interleaved[1::2] = b[order]
+        _, first = np.unique(interleaved, return_index=True)
+        first.sort()
+        if target_nodes < len(first):
+            cut = min(cut, int(first[target_nodes]) // 2)
+    positions = order[:cut]
+    return _first_seen(a, b, positions), positions
+
+
+def top_k_degree(a, b, node_count, target_nodes=None, max_edges=None, seed=42):
+    degree = np.bincount(a, minlength=node_count) + np.bincount(b, minlength=node_count)
+    k = node_count if target_nodes is None else min(target_nodes, node_count)
+    # nlargest is stable, so ties keep code (first appearance) order, like sorted(..., reverse=True)
+    nodes = np.array(heapq.nlargest(k, range(node_count), key=degree.__getitem__), dtype=np.int64)
+    positions = _induced(a, b, nodes, node_count)
+    return _trim(a, b, nodes, positions, node_count, max_edges)
+
+
+def snowball(a, b, node_count, target_nodes=None, max_edges=None, seed=42, seeds=None, n_seeds=1):
+    """BFS waves from `seeds` (default: random nodes drawn from `seed`)."""
+    rng = np.random.default_rng(seed)
+    target = node_count if target_nodes is None else min(target_nodes, node_count)
+    indptr, indices = _csr(a, b, node_count)
+    seen = np.zeros(node_count, dtype=bool)
+    restarts = iter(rng.permutation(node_count).tolist())
+    if seeds is None:
+        seeds = rng.choice(node_count, size=min(n_seeds, node_count), replace=False)
+    frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+    picked = []
+    total = 0
+
+    while total < target:
+        if not frontier.size:
+            # Exhausted a component: restart from a random unseen node
+            restart = next((r for r in restarts if not seen[r]), None)
+            if restart is None:
+                break
+            frontier = np.array([restart], dtype=np.int64)
+        frontier = frontier[~seen[frontier]]
+        if total + frontier.size > target:
+            frontier = rng.permutation(frontier)[:target - total]
+        seen[frontier] = True
+        picked.append(frontier)
+        total += frontier.size
+
+        starts, ends = indptr[frontier], indptr[frontier + 1]
+        counts = ends - starts
+        slots = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        neighbors = indices[slots]
+        frontier = np.unique(neighbors[~seen[neighbors]])
+
+    nodes = np.concatenate(picked) if picked else np.array([], dtype=np.int64)
+    positions = _induced(a, b, nodes, node_count)
+    return _trim(a, b, nodes, positions, node_count, max_edges)
+
+
+def forest_fire(a, b, node_count, target_nodes=None, max_edges=None, seed=42, p_forward=0.7):
+    """Burn from random seeds; each burning node ignites Geometric(1 - p_forward) - 1 unburnt neighbors."""
+    rng = np.random.default_rng(seed)
+    target = node_count if target_nodes is None else min(target_nodes, node_count)
+    indptr, indices = _csr(a, b, node_count)
+    burnt = np.zeros(node_count, dtype=bool)
+    starts = iter(rng.permutation(node_count).tolist())
+    order = []
+
+    while len(order) < target:
+        start = next((s for s in starts if not burnt[s]), None)
+        if start is None:
+            break
+        burnt[start] = True
+        order.append(start)
+        queue = deque([start])
+        while queue and len(order) < target:
+            node = queue.popleft()
+            neighbors = indices[indptr[node]:indptr[node + 1]]
+            neighbors = np.unique(neighbors[~burnt[neighbors]])
+            if not neighbors.size:
+                continue
+            spread = min(rng.geometric(1.0 - p_forward) - 1, neighbors.size, target - len(order))
+            if spread <= 0:
+                continue
+            ignited = rng.choice(neighbors, size=spread, replace=False).tolist()
+            burnt[ignited] = True
+            order.extend(ignited)
+            queue.extend(ignited)
+
+    nodes = np.array(order, dtype=np.int64)
+    positions = _induced(a, b, nodes, node_count)
+    return _trim(a, b, nodes, positions, node_count, max_edges)
+
+
+_SAMPLERS = {
+    'random_edge': random_edge,
+    'top_k_degree': top_k_degree,
+    'snowball': snowball,
+    'forest_fire': forest_fire,
+}
+
+
+def sample_graph(first, second, strategy='random_edge', target_nodes=None, max_edges=None, seed=42, **options):
+    """Sample an edge table given its two endpoint columns.
+
+    Returns (node_codes, edge_positions); node codes refer to
+    encode_endpoints(first, second).
+    """
+    if strategy not in _SAMPLERS:
+        raise ValueError(f"Unknown sampling strategy: {strategy} (choose from {', '.join(STRATEGIES)})")
+    a, b, node_count = encode_endpoints(first, second)
+    nodes, positions = _SAMPLERS[strategy](a, b, node_count, target_nodes, max_edges, seed, **options)
+    return nodes, positions
@@ -0,0 +1,330 @@
+"""Offline-built node search index over a graph bundle.
+
+Replaces the linear name scan with two lookups, both answered from
+memory-mapped arrays:
+
+    search_rank_nodes.npy     int32  node index per degree rank (rank 0 = highest degree)
+    search_id_keys.npy        S<n>   lowercased node ids, sorted, for prefix ranges
+    search_id_ranks.npy       int32  degree rank per entry of search_id_keys
+    search_name_bytes.npy     uint8  lowercased UTF-8 names, concatenated in rank order
+    search_name_offsets.npy   int64  rank r owns name_bytes[offsets[r]:offsets[r + 1]]
+    search_label_bytes.npy    uint8  names as given (original case), concatenated in rank order
+    search_label_offsets.npy  int64  rank r owns label_bytes[offsets[r]:offsets[r + 1]]
+    search_trigram_keys.npy   int32  sorted byte trigrams (b0 << 16 | b1 << 8 | b2)
+    search_trigram_offsets.npy int64 trigram k owns trigram_ranks[offsets[k]:offsets[k + 1]]
+    search_trigram_ranks.npy  int32  sorted degree ranks of the names containing trigram k
+
+Posting lists hold degree ranks rather than node indexes, so an intersection
+comes out already ordered by degree and top-k is its first k verified hits.
+Each name is followed by two zero bytes before taking trigrams, so every
+byte of a name starts a trigram, its last one included. One- and two-byte
+queries are then answered from the trigrams they start.
+
+Only the lowercased names are matched against; results carry the label,
+the name as it appears in objects.csv.
+
+search.json is written last and records the bundle build_id it was built
+from.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from filter_index import intersect_sorted, postings
+from graph_bundle import BUNDLE_DIR, load_bundle, retract_manifest, save_array, write_manifest
+
+INDEX_VERSION = 3
+DEFAULT_LIMIT = 10
+CHUNK = 1024
+_ARRAYS = [
+    'rank_nodes', 'id_keys', 'id_ranks', 'name_bytes', 'name_offsets', 'label_bytes', 'label_offsets',
+    'trigram_keys', 'trigram_offsets', 'trigram_ranks',
+]
+
+
+def normalize(text):
+    return str(text).strip().lower()
+
+
+def trigram_keys(data):
+    """Distinct byte-trigram keys of a UTF-8 byte string (no padding)."""
+    grams = np.frombuffer(data, dtype=np.uint8).astype(np.int32)
+    return np.unique((grams[:-2] << 16) | (grams[1:-1] << 8) | grams[2:])
+
+
+def name_trigrams(encoded):
+    """(name position, trigram key) pairs, distinct, over names followed by two zero bytes.
+
+    All names are laid out in one padded buffer, so every trigram is taken in
+    one vectorized pass; a trigram belongs to the name holding its first byte.
+    """
+    lengths = np.array([len(data) for data in encoded], dtype=np.int64)
+    buffer = np.frombuffer(b''.join(data + b'\0\0' for data in encoded), dtype=np.uint8).astype(np.int32)
+    if len(buffer) < 3:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    owner = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths + 2)[:len(buffer) - 2]
+    keys = (buffer[:-2] << 16) | (buffer[1:-1] << 8) | buffer[2:]
+    # Trigrams starting in the padding are not part of any name
+    starts = np.concatenate([[0], np.cumsum(lengths + 2)[:-1]])
+    inside = np.arange(len(keys)) - starts[owner] < lengths[owner]
+    pairs = np.sort((owner[inside] << 24) | keys[inside])
+    pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])] if len(pairs) else pairs
+    return pairs >> 24, (pairs & 0xFFFFFF).astype(np.int32)
+
+
+def write_search_index(bundle_path, node_ids, names):
+    """Build the index for the bundle at bundle_path; names are aligned with node_ids.
+
+    Nodes of the bundle without a name are searchable by id only.
+    """
+    bundle = load_bundle(bundle_path)
+    count = bundle.node_count
+
+    # Stable sort keeps the bundle order among nodes of equal degree
+    rank_nodes = np.argsort(-bundle.degree(), kind='stable').astype(np.int32)
+    ranks = np.empty(count, dtype=np.int32)
+    ranks[rank_nodes] = np.arange(count, dtype=np.int32)
+
+    ids = np.char.lower(np.asarray(bundle.node_ids))
+    id_order = np.argsort(ids, kind='stable')
+
+    # Names by node index; the first name given for an id wins, as in the bundle
+    named = pd.Series(list(names), index=pd.Index(pd.Series(node_ids, dtype=object).astype(str)), dtype=object)
+    named = named[~named.index.duplicated(keep='first')]
+    bundle_ids = pd.Index([i.decode('utf-8') for i in bundle.node_ids])
+    by_node = named.reindex(bundle_ids).to_numpy(dtype=object)
+    labels = [str(name).strip() if name is not None and name == name else '' for name in by_node[rank_nodes]]
+    encoded = [normalize(label).encode('utf-8') for label in labels]
+    # Lowercasing can change a name's byte length, so labels keep their own offsets
+    label_encoded = [label.encode('utf-8') for label in labels]
+
+    name_offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=name_offsets[1:])
+    name_bytes = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    label_offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in label_encoded], out=label_offsets[1:])
+    label_bytes = np.frombuffer(b''.join(label_encoded), dtype=np.uint8)
+
+    gram_ranks, gram_values = name_trigrams(encoded)
+    keys, codes = np.unique(gram_values, return_inverse=True)
+    trigram_offsets, slots = postings(codes, len(keys))
+
+    arrays = {
+        'rank_nodes': rank_nodes,
+        'id_keys': ids[id_order],
+        'id_ranks': ranks[id_order],
+        'name_bytes': name_bytes,
+        'name_offsets': name_offsets,
+        'label_bytes': label_bytes,
+        'label_offsets': label_offsets,
+        'trigram_keys': keys.astype(np.int32),
+        'trigram_offsets': trigram_offsets,
+        'trigram_ranks': gram_ranks[slots].astype(np.int32),
+    }
+    retract_manifest(os.path.join(bundle_path, 'search.json'))
+    for name, array in arrays.items():
+        save_array(os.path.join(bundle_path, f'search_{name}.npy'), array)
+
+    manifest = {
+        'version': INDEX_VERSION,
+        'build_id': bundle.build_id,
+        'nodes': count,
+        'named_nodes': int(sum(1 for data in encoded if data)),
+        'trigrams': len(keys),
+    }
+    write_manifest(os.path.join(bundle_path, 'search.json'), manifest)
+    return manifest
+
+
+class SearchIndex:
+    """Id-prefix and name-substring search over a bundle, ranked by degree."""
+
+    def __init__(self, bundle, mmap_mode='r'):
+        self.bundle = bundle
+        with open(os.path.join(bundle.path, 'search.json')) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('build_id') != bundle.build_id or self.manifest.get('version') != INDEX_VERSION:
+            raise ValueError(f'Search index in {bundle.path} is stale; rebuild it with search_index.py')
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(bundle.path, f'search_{name}.npy'), mmap_mode=mmap_mode))
+        self.degree = bundle.degree()
+
+    def name(self, rank):
+        # Lowercased, as matched against
+        return bytes(self.name_bytes[self.name_offsets[rank]:self.name_offsets[rank + 1]]).decode('utf-8')
+
+    def label(self, rank):
+        # As given, for display
+        return bytes(self.label_bytes[self.label_offsets[rank]:self.label_offsets[rank + 1]]).decode('utf-8')
+
+    def _trigram_heads(self, lo, hi, limit):
+        # The `limit` smallest ranks over the posting lists of trigram keys in [lo, hi);
+        # each list is sorted, so only its first `limit` entries can qualify
+        start, end = np.searchsorted(self.trigram_keys, [lo, hi])
+        starts = np.asarray(self.trigram_offsets[start:end])
+        counts = np.minimum(np.asarray(self.trigram_offsets[start + 1:end + 1]) - starts, limit)
+        slots = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return np.unique(np.asarray(self.trigram_ranks[slots]))[:limit]
+
+    def exact_rank(self, query):
+        """Degree rank of the node whose id is exactly query, or -1."""
+        key = query.encode('utf-8')
+        if not key or len(key) > self.id_keys.dtype.itemsize:
+            return -1
+        position = np.searchsorted(self.id_keys, key)
+        if position < len(self.id_keys) and self.id_keys[position] == key:
+            return int(self.id_ranks[position])
+        return -1
+
+    def id_ranks_for(self, prefix, limit):
+        """The `limit` best-ranked nodes whose id starts with prefix."""
+        key = prefix.encode('utf-8')
+        if not key or len(key) > self.id_keys.dtype.itemsize:
+            return np.array([], dtype=np.int32)
+        # UTF-8 never contains 0xff, so bumping the last byte bounds the prefix range
+        start, end = np.searchsorted(self.id_keys, [key, key[:-1] + bytes([key[-1] + 1])])
+        found = np.asarray(self.id_ranks[start:end])
+        if len(found) > limit:
+            found = np.partition(found, limit - 1)[:limit]
+        return np.sort(found)
+
+    def name_ranks_for(self, query, limit):
+        """The `limit` best-ranked nodes whose name contains query."""
+        data = query.encode('utf-8')
+        if not data:
+            return np.array([], dtype=np.int32)
+        if len(data) < 3:
+            # A short query is the start of every trigram that follows one of its occurrences
+            shift = 8 * (3 - len(data))
+            value = int.from_bytes(data, 'big') << shift
+            return self._trigram_heads(value, value + (1 << shift), limit).astype(np.int32)
+
+        grams = trigram_keys(data)
+        positions = np.searchsorted(self.trigram_keys, grams)
+        positions[positions == len(self.trigram_keys)] = 0
+        if not np.array_equal(np.asarray(self.trigram_keys[positions]), grams):
+            return np.array([], dtype=np.int32)
+        lists = sorted((self.trigram_ranks[self.trigram_offsets[p]:self.trigram_offsets[p + 1]] for p in positions),
+                       key=len)
+
+        # Walk the shortest list in rank-ordered chunks and stop once `limit` names match,
+        # so a common query only touches the head of its posting lists
+        found = []
+        for start in range(0, len(lists[0]), CHUNK):
+            candidates = np.asarray(lists[0][start:start + CHUNK])
+            for posting in lists[1:]:
+                if not len(candidates):
+                    break
+                candidates = intersect_sorted(candidates, np.asarray(posting))
+            # Sharing every trigram does not make a substring, so each candidate is checked
+            for rank in candidates.tolist():
+                if query in self.name(rank):
+                    found.append(rank)
+                    if len(found) == limit:
+                        return np.array(found, dtype=np.int32)
+        return np.array(found, dtype=np.int32)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Top matches for query: an exact id first, then id-prefix and name matches by degree.
+
+        Returns [{id, name, type, degree, match}], match being 'id' or 'name'.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        id_ranks = self.id_ranks_for(query, limit)
+        name_ranks = self.name_ranks_for(query, limit)
+        ranks = np.union1d(id_ranks, name_ranks)[:limit].tolist()
+        exact = self.exact_rank(query)
+        if exact >= 0:
+            ranks = [exact] + [r for r in ranks if r != exact][:limit - 1]
+
+        id_set = set(id_ranks.tolist())
+        node_types = self.bundle.manifest['node_types']
+        results = []
+        for rank in ranks:
+            node = int(self.rank_nodes[rank])
+            results.append({
+                'id': self.bundle.node_id(node),
+                'name': self.label(rank) or None,
+                'type': node_types[self.bundle.node_type[node]],
+                'degree': int(self.degree[node]),
+                'match': 'id' if rank in id_set or rank == exact else 'name',
+            })
+        return results
+
+
+def brute_force_name_ranks(index, query, limit):
+    """The `limit` best-ranked nodes whose name contains query, by scanning every name."""
+    found = []
+    for rank in range(index.bundle.node_count):
+        if query in index.name(rank):
+            found.append(rank)
+            if len(found) == limit:
+                break
+    return np.array(found, dtype=np.int32)
+
+
+def verify(index, queries=(), limit=DEFAULT_LIMIT):
+    """Queries whose name matches differ from a brute-force scan.
+
+    Besides `queries`, every distinct one- and two-byte substring of the
+    names is checked, since those are answered from trigram prefixes.
+    """
+    names = [index.name(rank) for rank in range(index.bundle.node_count)]
+    short = {name[i:i + size] for name in names for size in (1, 2) for i in range(len(name) - size + 1)}
+    mismatches = []
+    for query in sorted(short) + [normalize(q) for q in queries]:
+        expected = brute_force_name_ranks(index, query, limit)
+        if not np.array_equal(index.name_ranks_for(query, limit), expected):
+            mismatches.append(query)
+    return mismatches
+
+
+def load_search_index(bundle=None):
+    return SearchIndex(bundle if bundle is not None else load_bundle(BUNDLE_DIR))
+
+
+def _names_from_export(path):
+    with open(path) as f:
+        nodes = json.load(f)['nodes']
+    return [n['id'] for n in nodes], [n.get('name') for n in nodes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the node search index of a graph bundle')
+    parser.add_argument('--bundle', default=BUNDLE_DIR)
+    parser.add_argument('--build', action='store_true', help='(re)build the index before querying')
+    parser.add_argument('--nodes', default='network_data.json', help='export to take node names from when building')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    parser.add_argument('--verify', action='store_true',
+                        help='compare name matches with a brute-force scan for all 1-2 byte substrings and the queries')
+    parser.add_argument('query', nargs='*')
+    args = parser.parse_args()
+
+    if args.build:
+        manifest = write_search_index(args.bundle, *_names_from_export(args.nodes))
+        print(f"[OK] Search index written to {args.bundle} "
+              f"({manifest['named_nodes']} named nodes, {manifest['trigrams']} trigrams)")
+
+    index = load_search_index(load_bundle(args.bundle))
+    if args.verify:
+        mismatches = verify(index, args.query, args.limit)
+        if mismatches:
+            raise SystemExit(f"[FAILED] {len(mismatches)} queries differ from a brute-force scan: {mismatches[:20]}")
+        print("[OK] Name matches agree with a brute-force scan")
+    for query in args.query:
+        started = time.perf_counter()
+        results = index.search(query, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{query!r}: {len(results)} matches in {elapsed:.3f} ms")
+        for result in results:
+            print(f"  {result['id']:<14} {result['type']:<9} degree {result['degree']:<5} {result['name']}")
+
+
+if __name__ == '__main__':
+    main()
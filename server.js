@@ -21,6 +21,27 @@ try {
   console.error('[ERROR] Failed to load network data:', error.message);
 }
 
+// Serve the precompressed .br/.gz siblings written by the Python export stage when the client accepts them
+app.use((req, res, next) => {
+  if (req.method !== 'GET' || !req.path.endsWith('.json')) return next();
+
+  const acceptEncoding = req.headers['accept-encoding'] || '';
+  const filePath = path.resolve(__dirname, '.' + req.path);
+  if (!filePath.startsWith(__dirname + path.sep)) return next();
+
+  for (const [encoding, suffix] of [['br', '.br'], ['gzip', '.gz']]) {
+    if (acceptEncoding.includes(encoding) && fs.existsSync(filePath + suffix)) {
+      res.set({
+        'Content-Type': 'application/json; charset=utf-8',
+        'Content-Encoding': encoding,
+        'Vary': 'Accept-Encoding'
+      });
+      return res.sendFile(filePath + suffix);
+    }
+  }
+  next();
+});
+
 app.use(express.static(path.join(__dirname)));
 
 app.get('/api/network', (req, res) => {
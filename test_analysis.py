@@ -2,11 +2,27 @@ import requests
 import json
 
 BASE_URL = 'http://localhost:5000'
+SERVICE_URL = 'http://localhost:5001'  # analysis_service.py
 
 print("=" * 60)
 print("[TEST] Analysis Endpoints")
 print("=" * 60)
 
+# Test Analysis Service Health
+print("\n[0] Analysis Service Health")
+try:
+    resp = requests.get(f'{SERVICE_URL}/api/health')
+    print(f"Status: {resp.status_code}")
+    data = resp.json()
+    print(f"Success: {data.get('success')}")
+    print(f"Nodes: {data.get('nodes')}, Edges: {data.get('edges')}")
+    if resp.status_code == 200 and data.get('success'):
+        print("[PASSED]")
+    else:
+        print(f"[FAILED] {data.get('error')}")
+except Exception as e:
+    print(f"[FAILED] {e}")
+
 # Test Centrality Analysis
 print("\n[1] Centrality Analysis")
 try:
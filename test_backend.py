@@ -1,142 +1,346 @@
-import requests
+"""Concurrent load test for the LinkUp backend.
+
+Drives a weighted mix of requests against a running server.js (or the
+analysis service) from asyncio workers, each holding one keep-alive
+connection, and reports per-endpoint throughput, p50/p95/p99 latency and
+error rates. Several --concurrency levels run one after another, which shows
+where the server tips over. Results are written as JSON; pass a previous
+results file with --compare to see the change in p95 and throughput.
+
+    python test_backend.py --concurrency 1 8 32 --duration 20
+    python test_backend.py --mix network=1,pathways=1 --compare load_results.json
+"""
+import argparse
+import asyncio
 import json
+import random
+import sys
 import time
+from urllib.parse import urlencode, urlsplit
 
 BASE_URL = 'http://localhost:5000'
+RESULTS_PATH = 'load_results.json'
+TIMEOUT = 30.0
+
+FUNDING_TYPES = ['angel', 'series-a', 'series-b', 'series-c+', 'venture', 'private-equity', 'other']
+NODE_TYPES = ['company', 'investor']
+TIME_PERIODS = ['2024', '2023', '2022', 'last-12-months', 'last-6-months']
+SEARCH_TERMS = ['c:', 'f:', 'tech', 'capital', 'ventures']
+STATIC_PAGES = ['/', '/pages/network_explorer.html', '/pages/analytics_dashboard.html', '/pages/homepage.html']
+
+# Request mix: name -> weight. Dashboard traffic is mostly filtered network reads
+DEFAULT_MIX = {
+    'health': 1,
+    'network': 3,
+    'network_filtered': 6,
+    'centrality': 1,
+    'communities': 1,
+    'pathways': 2,
+    'static': 2,
+}
+
+
+def network_filters(rng):
+    """A random combination of /api/network query filters."""
+    params = {}
+    if rng.random() < 0.7:
+        params['fundingType'] = rng.choice(FUNDING_TYPES)
+    if rng.random() < 0.4:
+        params['nodeType'] = rng.choice(NODE_TYPES)
+    if rng.random() < 0.3:
+        params['timePeriod'] = rng.choice(TIME_PERIODS)
+    if rng.random() < 0.3:
+        params['search'] = rng.choice(SEARCH_TERMS)
+    if not params:
+        params['fundingType'] = rng.choice(FUNDING_TYPES)
+    return params
+
+
+def build_request(name, rng, node_ids):
+    """(method, path, json body or None) for one request of the mix."""
+    if name == 'health':
+        return 'GET', '/api/health', None
+    if name == 'network':
+        return 'GET', '/api/network', None
+    if name == 'network_filtered':
+        return 'GET', '/api/network?' + urlencode(network_filters(rng)), None
+    if name in ('centrality', 'communities'):
+        return 'POST', f'/api/analysis/{name}', {}
+    if name == 'pathways':
+        source, target = rng.sample(node_ids, 2) if len(node_ids) > 1 else ('c:1', 'c:2')
+        return 'POST', '/api/analysis/pathways', {'sourceId': source, 'targetId': target}
+    if name == 'static':
+        return 'GET', rng.choice(STATIC_PAGES), None
+    raise ValueError(f'Unknown request type: {name}')
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client over asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Accept-Encoding: identity',
+                'Connection: keep-alive', f'Content-Length: {len(payload)}']
+        if body is not None:
+            head.append('Content-Type: application/json')
+        self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if method == 'HEAD' or status in (204, 304):
+            size = 0
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            size = 0
+            while True:
+                chunk_size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(chunk_size + 2)
+                size += chunk_size
+                if chunk_size == 0:
+                    break
+        elif 'content-length' in headers:
+            size = len(await self.reader.readexactly(int(headers['content-length'])))
+        else:
+            size = len(await self.reader.read())
+            await self.close()
+            return status, size
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, size
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.bytes = 0
+        self.status = {}
+
+    def record(self, seconds, status, size):
+        self.latencies.append(seconds)
+        self.bytes += size
+        self.status[str(status)] = self.status.get(str(status), 0) + 1
+        if status >= 400:
+            self.errors += 1
+
+    def fail(self, seconds, error):
+        self.latencies.append(seconds)
+        self.errors += 1
+        key = type(error).__name__
+        self.status[key] = self.status.get(key, 0) + 1
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(stats, elapsed):
+    latencies = sorted(stats.latencies)
+    count = len(latencies)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'requests': count,
+        'errors': stats.errors,
+        'errorRate': stats.errors / count if count else 0,
+        'throughput': count / elapsed if elapsed else 0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / count) if count else None,
+        'max_ms': ms(latencies[-1]) if count else None,
+        'bytes': stats.bytes,
+        'status': stats.status,
+    }
+
+
+async def fetch_node_ids(host, port, limit=200):
+    # Pathway requests need real node ids; take them from the unfiltered network
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f'GET /api/network HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        body = raw.split(b'\r\n\r\n', 1)[1]
+        return [n['id'] for n in json.loads(body)['data']['nodes'][:limit]]
+    except (OSError, ValueError, KeyError, IndexError):
+        return []
+
+
+async def run_level(host, port, concurrency, mix, duration=None, total=None, timeout=TIMEOUT,
+                    node_ids=(), seed=42):
+    """Run one concurrency level; stops after `duration` seconds or `total` requests."""
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    stats = {name: Stats() for name in names}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+    node_ids = list(node_ids)
+
+    def next_request():
+        nonlocal issued
+        if total is not None and issued >= total:
+            return False
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        issued += 1
+        return True
+
+    async def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        connection = Connection(host, port)
+        while next_request():
+            name = rng.choices(names, weights)[0]
+            method, path, body = build_request(name, rng, node_ids)
+            start = time.perf_counter()
+            try:
+                status, size = await asyncio.wait_for(connection.request(method, path, body), timeout)
+                stats[name].record(time.perf_counter() - start, status, size)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError) as error:
+                stats[name].fail(time.perf_counter() - start, error)
+                await connection.close()
+        await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    combined = Stats()
+    for s in stats.values():
+        combined.latencies.extend(s.latencies)
+        combined.errors += s.errors
+        combined.bytes += s.bytes
+        for key, count in s.status.items():
+            combined.status[key] = combined.status.get(key, 0) + count
+
+    return {
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'total': summarize(combined, elapsed),
+        'endpoints': {name: summarize(s, elapsed) for name, s in stats.items() if s.latencies},
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown request type {name!r} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def print_level(level):
+    print(f"\n[concurrency {level['concurrency']}] {level['elapsed']:.1f}s")
+    print(f"  {'endpoint':<18}{'reqs':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    rows = list(level['endpoints'].items()) + [('TOTAL', level['total'])]
+    for name, s in rows:
+        print(f"  {name:<18}{s['requests']:>8}{s['throughput']:>9.1f}{s['p50_ms'] or 0:>10.1f}"
+              f"{s['p95_ms'] or 0:>10.1f}{s['p99_ms'] or 0:>10.1f}{s['errorRate']:>8.1%}")
+
+
+def print_comparison(results, previous):
+    levels = {level['concurrency']: level for level in previous.get('levels', [])}
+    print('\n[COMPARE] p95 latency and throughput against the previous run')
+    for level in results['levels']:
+        old = levels.get(level['concurrency'])
+        if not old:
+            continue
+        for name, s in level['endpoints'].items():
+            o = old['endpoints'].get(name)
+            if not o or not o['p95_ms'] or not s['p95_ms']:
+                continue
+            print(f"  c={level['concurrency']:<4}{name:<18} p95 {o['p95_ms']:.1f} -> {s['p95_ms']:.1f} ms "
+                  f"({s['p95_ms'] / o['p95_ms'] - 1:+.0%}), rps {o['throughput']:.1f} -> {s['throughput']:.1f}")
+
+
+async def main_async(args):
+    url = urlsplit(args.base_url)
+    host, port = url.hostname, url.port or 80
+    node_ids = await fetch_node_ids(host, port) if 'pathways' in args.mix else []
+
+    results = {
+        'base_url': args.base_url,
+        'mix': args.mix,
+        'duration': args.duration,
+        'requests': args.requests,
+        'levels': [],
+    }
+    for concurrency in args.concurrency:
+        level = await run_level(host, port, concurrency, args.mix, args.duration, args.requests,
+                                args.timeout, node_ids, args.seed)
+        results['levels'].append(level)
+        print_level(level)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test for the LinkUp backend')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8], help='one run per level')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--requests', type=int, default=None, help='stop each level after this many requests')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='e.g. network=3,pathways=1')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=RESULTS_PATH)
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    args = parser.parse_args()
+    if args.requests:
+        args.duration = None
+
+    print('[LOAD TEST] LinkUp Backend API')
+    print('=' * 60)
+    results = asyncio.run(main_async(args))
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'\n[OK] Results written to {args.out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+    total_errors = sum(level['total']['errors'] for level in results['levels'])
+    if total_errors:
+        print(f'[WARN] {total_errors} failed requests')
+        sys.exit(1)
+
 
-print("[TEST SUITE] LinkUp Backend API Integration")
-print("=" * 60)
-
-# Test 1: Health Check
-print("\n[1] Health Check")
-try:
-    resp = requests.get(f'{BASE_URL}/api/health')
-    data = resp.json()
-    print(f"  Status: {resp.status_code}")
-    print(f"  Message: {data['message']}")
-    assert resp.status_code == 200
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 2: Get Network Stats
-print("\n[2] Get Network Statistics")
-try:
-    resp = requests.get(f'{BASE_URL}/api/network/stats')
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Total Nodes: {data['total_nodes']}")
-    print(f"  Total Edges: {data['total_edges']}")
-    print(f"  Companies: {data['companies']}")
-    print(f"  Investors: {data['investors']}")
-    print(f"  Funding Types: {list(data['funding_types'].keys())}")
-    print(f"  Date Range: {data['date_range']['min']} to {data['date_range']['max']}")
-    
-    assert data['total_nodes'] == 740
-    assert data['total_edges'] == 400
-    assert data['companies'] == 390
-    assert data['investors'] == 350
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 3: Get Available Filters
-print("\n[3] Get Available Filters")
-try:
-    resp = requests.get(f'{BASE_URL}/api/filters')
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Funding Types: {data['funding_types']}")
-    print(f"  Node Types: {data['node_types']}")
-    assert 'series-a' in data['funding_types']
-    assert 'angel' in data['funding_types']
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 4: Get Network Data
-print("\n[4] Get Full Network Data")
-try:
-    resp = requests.get(f'{BASE_URL}/api/network')
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Nodes: {len(data['nodes'])}")
-    print(f"  Edges: {len(data['edges'])}")
-    assert len(data['nodes']) == 740
-    assert len(data['edges']) == 400
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 5: Filter by Angel Funding
-print("\n[5] Filter by Angel Funding Type")
-try:
-    resp = requests.post(f'{BASE_URL}/api/network/filter', 
-                        json={'funding_type': 'angel'})
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Filtered Nodes: {data['stats']['total_nodes']}")
-    print(f"  Filtered Edges: {data['stats']['total_edges']}")
-    assert data['stats']['total_edges'] > 0
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 6: Filter by Series A
-print("\n[6] Filter by Series A Funding Type")
-try:
-    resp = requests.post(f'{BASE_URL}/api/network/filter', 
-                        json={'funding_type': 'series-a'})
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Filtered Nodes: {data['stats']['total_nodes']}")
-    print(f"  Filtered Edges: {data['stats']['total_edges']}")
-    assert data['stats']['total_edges'] > 0
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 7: Search Functionality
-print("\n[7] Search Nodes")
-try:
-    resp = requests.get(f'{BASE_URL}/api/search?q=c:26569')
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Results Found: {len(data)}")
-    if len(data) > 0:
-        print(f"  First Result: {data[0]['id']}")
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 8: Get Node Details
-print("\n[8] Get Node Details")
-try:
-    resp = requests.get(f'{BASE_URL}/api/node/c:26569')
-    data = resp.json()['data']
-    print(f"  Status: {resp.status_code}")
-    print(f"  Node ID: {data['node']['id']}")
-    print(f"  Node Type: {data['node']['type']}")
-    print(f"  Connected Nodes: {len(data['connected_nodes'])}")
-    print(f"  Connected Edges: {len(data['connected_edges'])}")
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-# Test 9: Static File Serving
-print("\n[9] Static Files - Network Explorer Page")
-try:
-    resp = requests.head(f'{BASE_URL}/pages/network_explorer.html')
-    print(f"  Status: {resp.status_code}")
-    print(f"  Content-Type: {resp.headers.get('Content-Type')}")
-    assert resp.status_code == 200
-    print("  [PASSED]")
-except Exception as e:
-    print(f"  [FAILED] {e}")
-
-print("\n" + "=" * 60)
-print("[SUMMARY] All tests completed!")
-print("Backend Integration Status: OPERATIONAL")
-print("\nAccess LinkUp at:")
-print("  - Homepage: http://localhost:5000")
-print("  - Network Explorer: http://localhost:5000/pages/network_explorer.html")
+if __name__ == '__main__':
+    main()